@@ -0,0 +1,43 @@
+import unittest
+from memcomponents.access_sequence import MemoryAccess
+from memcomponents.cache import LRUCache
+
+
+class AddressDecodeTest(unittest.TestCase):
+
+    def test_parse_address_32(self):
+        access = MemoryAccess(0, 'r', 0b1011_0110_1101_0011, 0)
+        # 16 sets, 8 byte blocks
+        self.assertEqual(access.parse_address(16, 8), (0b1011_0110_1, 0b1010, 0b011))
+
+    def test_parse_address_wide(self):
+        for addr_size in [48, 64]:
+            address = (1 << addr_size) - 3
+            access = MemoryAccess(0, 'w', address, 0)
+            tag, index, offset = access.parse_address(64, 64, addr_size)
+            self.assertEqual(tag, address >> 12)
+            self.assertEqual(index, 63)
+            self.assertEqual(offset, 61)
+
+    def test_parse_address_too_wide(self):
+        access = MemoryAccess(0, 'r', 1 << 40, 0)
+        self.assertRaises(ValueError, access.parse_address, 16, 64)
+
+    def test_decode_matches_parse(self):
+        caches = [LRUCache("L0", 64, 4096, 4, 1, addr_size=64),
+                  LRUCache("L1", 16, 1024, 1, 1, addr_size=64),
+                  LRUCache("L2", 64, 4096, 64, 1, addr_size=64)]
+        for address in [0, 1, 4095, 2657855438, (1 << 48) - 1, (1 << 64) - 1]:
+            access = MemoryAccess(0, 'r', address, 0)
+            for cache in caches:
+                tag, index, offset = access.parse_address(cache.total_sets, cache.block_size_bytes, 64)
+                self.assertEqual(access.decode(cache.geometry), (tag, index))
+
+    def test_shared_geometry(self):
+        first = LRUCache("L0", 64, 4096, 4, 1)
+        second = LRUCache("L1", 64, 4096, 4, 10)
+        self.assertIs(first.geometry, second.geometry)
+
+
+if __name__ == '__main__':
+    unittest.main()
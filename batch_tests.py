@@ -0,0 +1,54 @@
+import random
+import unittest
+from memcomponents.access_sequence import MemoryAccess
+from memcomponents.heirarchy import create_heirarchy
+
+try:
+    import numpy
+    from memcomponents.batch import BatchEngine
+except ImportError:
+    numpy = None
+
+
+def make_trace(count=4000, seed=3):
+    rand = random.Random(seed)
+    modes, addresses = [], []
+    for num in range(count):
+        modes.append(1 if rand.random() < 0.4 else 0)
+        addresses.append(rand.randrange(0, 1 << 13) if rand.random() < 0.8 else rand.randrange(0, 1 << 32))
+    return modes, addresses
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class BatchEngineTest(unittest.TestCase):
+
+    def assert_matches_reference(self, **config):
+        modes, addresses = make_trace()
+        reference = create_heirarchy(max_misses=0, cache_view=0, **config)
+        for num, (mode, address) in enumerate(zip(modes, addresses)):
+            reference.access(MemoryAccess(num, 'rw'[mode], address, num))
+
+        # Small chunks so the per set state has to carry over between them
+        batch = BatchEngine(create_heirarchy(max_misses=0, cache_view=0, **config), chunk_len=333)
+        batch.run(numpy.array(modes, numpy.uint8), numpy.array(addresses, numpy.uint64))
+        self.assertEqual([(cache.num_accesses, cache.num_hits) for cache in batch.heirarchy.cache_layers],
+                         [(cache.num_accesses, cache.num_hits) for cache in reference.cache_layers])
+
+    def test_matches_reference(self):
+        for write_policy in ["wb+wa", "wt+nwa"]:
+            self.assert_matches_reference(block_size=16, num_layers=3, sizes=[256, 1024, 4096], cycles=[1, 10, 50],
+                                          associativity=[1, 2, 8], write_policy=write_policy)
+            self.assert_matches_reference(block_size=64, num_layers=2, sizes=[2048, 8192], cycles=[1, 10],
+                                          associativity=[4, 1], write_policy=write_policy)
+            self.assert_matches_reference(block_size=32, num_layers=1, sizes=[1024], cycles=[1],
+                                          associativity=[32], write_policy=write_policy)
+
+    def test_wide_addresses_raise(self):
+        batch = BatchEngine(create_heirarchy(block_size=16, num_layers=1, sizes=[256], cycles=[1], associativity=[2],
+                                             write_policy="wb+wa", max_misses=0, cache_view=0))
+        with self.assertRaises(ValueError):
+            batch.run(numpy.array([0, 1], numpy.uint8), numpy.array([16, 1 << 32], numpy.uint64))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+from memcomponents.utilities import *
+from memcomponents.heirarchy import STORAGE_ENGINES
+from memcomponents.benchmark import BENCHMARK_CONFIGS, run_suite, compare_results, results_table, \
+    comparison_table
+
+
+def args_as_sizes(s):
+    # Comma separated access counts, 1e6 style is accepted
+    try:
+        return [int(float(size)) for size in s.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError("Argument \"%s\" is not a list of sizes" % (s))
+
+
+def verify_args(args):
+    if any(size < 1 for size in args.sizes):
+        show_error_and_exit("--sizes must all be at least 1!")
+    for config_name in args.configs:
+        if config_name not in BENCHMARK_CONFIGS:
+            show_error_and_exit("--configs must be from: " + ", ".join(BENCHMARK_CONFIGS))
+    if args.repeat < 1:
+        show_error_and_exit("--repeat must be at least 1!")
+    if args.tolerance < 0:
+        show_error_and_exit("--tolerance must be a number greater than or equal to 0!")
+    if args.trace_format not in ["text", "binary"]:
+        show_error_and_exit("--trace-format must be text or binary!")
+    if args.storage not in STORAGE_ENGINES:
+        show_error_and_exit("--storage must be one of: " + ", ".join(STORAGE_ENGINES))
+    if args.baseline and not os.path.exists(args.baseline):
+        show_error_and_exit("The baseline: " + str(args.baseline) + " does not exist!")
+
+
+if __name__ == "__main__":
+    # Add our program arguments
+    parser = argparse.ArgumentParser(description='Throughput benchmarks for the COE1541 Project 2 cache simulator')
+    parser.add_argument('-n', '--sizes', dest='sizes', action='store',
+                        default=[100000, 1000000], type=args_as_sizes,
+                        help='Comma separated numbers of accesses of the synthetic traces, e.g. 1e5,1e6,1e7')
+    parser.add_argument('-C', '--configs', dest='configs', action='store',
+                        default=list(BENCHMARK_CONFIGS), type=lambda s: s.split(','),
+                        help='Comma separated heirarchies to run. Options <' + ','.join(BENCHMARK_CONFIGS) + '>')
+    parser.add_argument('-r', '--repeat', dest='repeat', action='store',
+                        default=1, type=int,
+                        help='Run every benchmark this many times and keep the fastest')
+    parser.add_argument('--seed', dest='seed', action='store',
+                        default=0, type=int,
+                        help='Seed of the synthetic traces')
+    parser.add_argument('-F', '--trace-format', dest='trace_format', action='store',
+                        default='text', type=str,
+                        help='Format of the synthetic traces. Options <text,binary>')
+    parser.add_argument('-e', '--storage', dest='storage', action='store',
+                        default='dict', type=str,
+                        help='How each cache stores its blocks. Options <dict,array>')
+    parser.add_argument('-T', '--trace-dir', dest='trace_dir', action='store',
+                        default='traces/benchmark', type=str,
+                        help='Directory the synthetic traces are generated in and reused from')
+    parser.add_argument('-o', '--output', dest='out_file', default='', type=str,
+                        help='Optional JSON file to write the results to, e.g. to use as a baseline later')
+    parser.add_argument('-B', '--baseline', dest='baseline', default='', type=str,
+                        help='JSON results of an earlier run to compare against, regressions exit with an error')
+    parser.add_argument('--tolerance', dest='tolerance', action='store',
+                        default=0.1, type=float,
+                        help='Fraction throughput may drop or peak RSS may grow before it is a regression')
+    # Parse the arguments
+    args = parser.parse_args()
+
+    # Verify they are correct
+    verify_args(args)
+
+    if not os.path.isdir(args.trace_dir):
+        os.makedirs(args.trace_dir)
+
+    results = run_suite(args.trace_dir, args.sizes, args.configs, args.repeat, args.seed, args.trace_format,
+                        args.storage)
+    print(results_table(results))
+
+    if args.out_file:
+        with open(args.out_file, 'w') as w_file:
+            json.dump(results, w_file, indent=1)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as b_file:
+            baseline = json.load(b_file)
+        rows, regressions = compare_results(results, baseline, args.tolerance)
+        print(comparison_table(rows))
+        if not rows:
+            show_error_and_exit("No benchmark in this run is in the baseline " + str(args.baseline) + "!")
+        if regressions:
+            show_error_and_exit(str(len(regressions)) + " benchmark(s) regressed: " +
+                                "; ".join(name + " (" + ", ".join(problems) + ")" for name, problems in regressions))
@@ -0,0 +1,50 @@
+import copy
+import os
+import tempfile
+import unittest
+from memcomponents.benchmark import BENCHMARK_CONFIGS, synthetic_records, synthetic_trace, run_benchmark, \
+    compare_results
+
+
+class BenchmarkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_synthetic_deterministic(self):
+        self.assertEqual(list(synthetic_records(500, 3)), list(synthetic_records(500, 3)))
+        self.assertNotEqual(list(synthetic_records(500, 3)), list(synthetic_records(500, 4)))
+
+        trace_file = synthetic_trace(self.tmp_dir.name, 500, 3)
+        with open(trace_file) as t_file:
+            self.assertEqual(len(t_file.readlines()), 500)
+        self.assertEqual(synthetic_trace(self.tmp_dir.name, 500, 3), trace_file)
+
+    def test_text_and_binary_agree(self):
+        results = []
+        for trace_format in ["text", "binary"]:
+            trace_file = synthetic_trace(self.tmp_dir.name, 2000, 1, trace_format)
+            results.append(run_benchmark("three_level", trace_file, BENCHMARK_CONFIGS["three_level"]))
+        self.assertEqual(results[0]["counters"], results[1]["counters"])
+        self.assertEqual(results[0]["accesses"], 2000)
+        self.assertEqual(results[0]["counters"][0][0], 2000)
+
+    def test_compare_results(self):
+        trace_file = synthetic_trace(self.tmp_dir.name, 1000, 0)
+        baseline = {"results": [run_benchmark("two_level", trace_file, BENCHMARK_CONFIGS["two_level"])]}
+
+        results = copy.deepcopy(baseline)
+        rows, regressions = compare_results(results, baseline, 0.1)
+        self.assertEqual((len(rows), regressions), (1, []))
+
+        results["results"][0]["accesses_per_second"] *= 0.5
+        results["results"][0]["counters"][0][1] += 1
+        rows, regressions = compare_results(results, baseline, 0.1)
+        self.assertEqual(regressions, [("two_level", ["throughput", "counters"])])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,45 +3,67 @@
 import ast
 import time
 import argparse
-import os
+import sys
 from memcomponents.utilities import *
 from memcomponents.access_sequence import AccessSequence
+from memcomponents.trace_format import trace_exists, STDIN_TRACE
 from memcomponents.heirarchy import *
+from memcomponents.sharding import run_sharded
+from memcomponents.events import EventTracer
+from memcomponents.checkpoint import save_checkpoint, restore_checkpoint
+from memcomponents.sampling import sample_sets, sample_time, estimate_table
+from memcomponents.profiling import profile_report, write_profile, heatmap_string
+from memcomponents.result_cache import ResultCache, heirarchy_result
+from memcomponents.miss_stream import is_miss_stream, record_miss_stream, read_miss_stream
 
 
 class CacheSimulator(object):
     def __init__(self, sequence, heirarchy):
         self.sequence = sequence
         self.heirarchy = heirarchy
+        self.checkpoint_position = None
 
-    def run(self, debug=1):
+    def run(self, debug=1, checkpoint_file=None, checkpoint_at=None):
         # Record execution time
         start_time = time.time()
 
-        # Execute the memory trace
+        # Execute the memory trace, saving a checkpoint once checkpoint_at accesses are done
+        position = self.sequence.start
         for mem_access in self.sequence:
             self.heirarchy.access(mem_access)
+            position = mem_access.num + 1
+            if position == checkpoint_at:
+                self.save_checkpoint(checkpoint_file, position)
 
             if debug > 1:
                 print("\n\n<<<<<<<<<<< Instruction Access >>>>>>>>>>>>>>")
                 print("\n" + str(mem_access))
-                print("\n" + str(cache_heirarchy))
+                print("\n" + str(self.heirarchy))
+
+        # Without a position the checkpoint is taken at the end of the run
+        if checkpoint_file and checkpoint_at is None:
+            self.save_checkpoint(checkpoint_file, position)
 
         if debug > 0:
             print("\n\n************** Final Results ******************")
             print("\n" + str(self.heirarchy) + "\n")
-            print("\n" + str(self.sequence) + "\n")
+            if self.sequence.retain:
+                print("\n" + str(self.sequence) + "\n")
 
             # Write our execution time
             hours, rem = divmod(time.time() - start_time, 3600)
             minutes, seconds = divmod(rem, 60)
             print("Program Finished In Time {:0>2}:{:0>2}:{:05.2f}\n".format(int(hours), int(minutes), seconds))
 
+    def save_checkpoint(self, checkpoint_file, position):
+        save_checkpoint(self.heirarchy, checkpoint_file, position)
+        self.checkpoint_position = position
+
 
 def verify_args(args):
     num_layers = int(args.cache_layers)
-    if not os.path.exists(args.trace_file):
-        show_error_and_exit("The tracefile: " + str(args.tracefile) + " does not exist!")
+    if not trace_exists(args.trace_file):
+        show_error_and_exit("The tracefile: " + str(args.trace_file) + " does not exist!")
     if len(args.cache_sizes) != num_layers:
         show_error_and_exit("Length of --cache-sizes must equal the number of layers: " + str(num_layers))
     if len(args.cache_cycles) != num_layers:
@@ -56,7 +78,122 @@ def verify_args(args):
         show_error_and_exit("--debug argument must be 0, 1, or 2!")
     if args.cache_view not in [0,1,2,3]:
         show_error_and_exit("--cache-view argument must be 0, 1, 2, or 3!")
+    if args.shards < 1:
+        show_error_and_exit("--shards must be at least 1!")
+    if args.shards > 1 and (args.debug_level > 1 or args.access_summary):
+        show_error_and_exit("--shards only reports final counters, it cannot be used with -d 2 or -S!")
+    if args.jobs is not None and (args.jobs < 1 or args.shards < 2):
+        show_error_and_exit("--jobs must be at least 1 and needs --shards!")
+    if args.engine not in ["reference", "batch"]:
+        show_error_and_exit("--engine must be reference or batch!")
+    if args.engine == "batch" and (args.debug_level > 1 or args.access_summary or args.shards > 1):
+        show_error_and_exit("--engine batch only reports final counters, it cannot be used with -d 2, -S or --shards!")
+    if args.storage not in STORAGE_ENGINES:
+        show_error_and_exit("--storage must be one of: " + ", ".join(STORAGE_ENGINES))
+    verify_replacement_policies(args, num_layers)
+    if any(policy != "lru" for policy in args.replacement_policy) and \
+            (args.storage != "dict" or args.engine != "reference"):
+        show_error_and_exit("Only lru replacement works with --storage array and --engine batch!")
+    if "random" in args.replacement_policy and args.shards > 1:
+        show_error_and_exit("random replacement draws victims in trace order, it cannot be sharded!")
+    if args.addr_size not in [32,48,64]:
+        show_error_and_exit("--address-size argument must be 32, 48, or 64!")
+    if args.event_format not in ["jsonl", "binary"]:
+        show_error_and_exit("--event-format must be jsonl or binary!")
+    if args.event_every < 1:
+        show_error_and_exit("--event-every must be at least 1!")
+    if (args.save_checkpoint or args.restore_checkpoint) and (args.shards > 1 or args.engine == "batch"):
+        show_error_and_exit("Checkpoints hold the full heirarchy state, they cannot be used with --shards or "
+                            "--engine batch!")
+    if args.checkpoint_at is not None and (not args.save_checkpoint or args.checkpoint_at < 1):
+        show_error_and_exit("--checkpoint-at needs --save-checkpoint and a number of accesses of at least 1!")
+    if args.reset_counters and not args.restore_checkpoint:
+        show_error_and_exit("--reset-counters only applies to a run resumed with --restore-checkpoint!")
+    if args.stop_at is not None and args.stop_at < 0:
+        show_error_and_exit("--stop-at must be a number greater than or equal to 0!")
+    if args.sample_sets is not None and not 0 < args.sample_sets <= 1:
+        show_error_and_exit("--sample-sets must be a fraction greater than 0 and at most 1!")
+    if (args.sample_window is None) != (args.sample_period is None):
+        show_error_and_exit("--sample-period and --sample-window must be given together!")
+    if args.sample_period is not None:
+        warmup = args.sample_warmup if args.sample_warmup is not None else args.sample_period - args.sample_window
+        if args.sample_window < 1 or warmup < 0 or args.sample_window + warmup > args.sample_period:
+            show_error_and_exit("--sample-window plus --sample-warmup must fit in --sample-period!")
+    elif args.sample_warmup is not None:
+        show_error_and_exit("--sample-warmup needs --sample-period and --sample-window!")
+    sampling = args.sample_sets is not None or args.sample_period is not None
+    if sampling and (args.sample_sets is not None) == (args.sample_period is not None):
+        show_error_and_exit("Use either --sample-sets or --sample-period, not both!")
+    if sampling and (args.debug_level > 1 or args.access_summary or args.shards > 1 or args.engine == "batch" or
+                     args.event_trace or args.save_checkpoint or args.restore_checkpoint):
+        show_error_and_exit("Sampled runs only report estimates, they cannot be used with -d 2, -S, --shards, "
+                            "--engine batch, --event-trace or checkpoints!")
+    if args.event_trace and (args.shards > 1 or args.engine == "batch"):
+        show_error_and_exit("--event-trace follows single accesses, it cannot be used with --shards or --engine batch!")
+    if (args.profile or args.heatmap) and (args.shards > 1 or args.engine == "batch" or sampling):
+        show_error_and_exit("--profile and --heatmap count every access, they cannot be used with --shards, "
+                            "--engine batch or sampling!")
+    if args.profile and args.restore_checkpoint and not args.reset_counters:
+        show_error_and_exit("--profile adds cycles up from counters that start at zero, it needs --reset-counters "
+                            "with --restore-checkpoint!")
+    if args.classify_misses and (args.shards > 1 or args.engine == "batch" or sampling or args.restore_checkpoint):
+        show_error_and_exit("--classify-misses follows every block from the start of the trace, it cannot be used "
+                            "with --shards, --engine batch, sampling or --restore-checkpoint!")
+    if args.result_cache and (args.trace_file == STDIN_TRACE or args.shards > 1 or args.engine == "batch" or
+                              sampling or args.debug_level > 1 or args.access_summary or args.event_trace or
+                              args.save_checkpoint or args.restore_checkpoint or args.stop_at is not None or
+                              args.profile or args.heatmap or args.classify_misses):
+        show_error_and_exit("--result-cache only stores whole runs of a trace file, it cannot be used with stdin, "
+                            "--shards, --engine batch, sampling, -d 2, -S, --event-trace, checkpoints, --stop-at, "
+                            "--profile, --heatmap or --classify-misses!")
+    if args.result_cache_size <= 0:
+        show_error_and_exit("--result-cache-size must be a number greater than 0!")
+    if args.hot_sets < 0:
+        show_error_and_exit("--hot-sets must be a number greater than or equal to 0!")
+    miss_stream = is_miss_stream(args.trace_file)
+    if (args.record_miss_stream or miss_stream) and (args.shards > 1 or args.engine == "batch" or sampling or
+                                                     args.debug_level > 1 or args.access_summary or
+                                                     args.event_trace or args.save_checkpoint or
+                                                     args.restore_checkpoint or args.stop_at is not None or
+                                                     args.profile or args.heatmap or args.classify_misses):
+        show_error_and_exit("Miss streams cover whole runs of the top layers, they cannot be used with --shards, "
+                            "--engine batch, sampling, -d 2, -S, --event-trace, checkpoints, --stop-at, "
+                            "--profile, --heatmap or --classify-misses!")
+    if args.record_miss_stream and (miss_stream or args.result_cache):
+        show_error_and_exit("--record-miss-stream needs a trace and cannot be used with --result-cache!")
+    checking = args.check_invariants or args.check_inclusion
+    if checking and (args.shards > 1 or args.engine == "batch" or sampling or args.restore_checkpoint or
+                     args.result_cache or args.record_miss_stream or miss_stream):
+        show_error_and_exit("Invariant checking follows every access from empty caches, it cannot be used with "
+                            "--shards, --engine batch, sampling, --restore-checkpoint, --result-cache or miss streams!")
+    if not 1 <= args.stream_layers <= num_layers:
+        show_error_and_exit("--stream-layers must be between 1 and the number of layers: " + str(num_layers))
+
+
+def verify_replacement_policies(args, num_layers):
+    # Expands a single policy to every layer, also used by multicore.py
+    if len(args.replacement_policy) not in [1, num_layers]:
+        show_error_and_exit("--replacement-policy needs one policy or one per layer: " + str(num_layers))
+    if len(args.replacement_policy) == 1:
+        args.replacement_policy = args.replacement_policy * num_layers
+    for policy, ways in zip(args.replacement_policy, args.set_associativity):
+        if policy not in REPLACEMENT_POLICIES:
+            show_error_and_exit("Replacement policies must be one of: " + ", ".join(REPLACEMENT_POLICIES))
+        if policy == "plru" and ways & (ways - 1):
+            show_error_and_exit("plru replacement needs a power of two associativity!")
+
+
+def args_as_policies(s):
+    return s.split(',')
+
 
+def args_as_window(s):
+    # start:stop range of access numbers, either end may be left out
+    try:
+        start, stop = s.split(':')
+        return int(start or 0), int(stop) if stop else None
+    except ValueError:
+        raise argparse.ArgumentTypeError("Argument \"%s\" is not a start:stop window" % (s))
 
 
 def args_as_list(s):
@@ -70,7 +207,8 @@ if __name__ == "__main__":
     # Add our program arguments
     parser = argparse.ArgumentParser(description='Cache Simulator for COE1541 Project 2')
     parser.add_argument('-t', '--tracefile', dest='trace_file', default='', type=str,
-                        help='The path to the tracefile for the memory accesses')
+                        help='The path to the tracefile for the memory accesses. Files ending in .gz, .xz or '
+                             '.zst are decompressed as they are read, - reads the trace from stdin')
     parser.add_argument('-b', '--block-size', dest='block_size', action='store',
                         default=64, type=int,
                         help='Block size in bytes')
@@ -101,23 +239,272 @@ if __name__ == "__main__":
                         default=2, type=int,
                         help='How to display the contents of each cache. 0 = Stats Only, '
                              '1 = Dirty Sets Only, 2 = Valid Sets Only,3 = All Sets')
+    parser.add_argument('-w', '--address-size', dest='addr_size', action='store',
+                        default=32, type=int,
+                        help='Width of the memory addresses in bits. Options <32,48,64>')
+    parser.add_argument('-S', '--access-summary', dest='access_summary', action='store_true',
+                        help='Keep every access in memory and print a per-access summary table at the end')
+    parser.add_argument('--shards', dest='shards', action='store',
+                        default=1, type=int,
+                        help='Split the sets into this many shards simulated in parallel processes. '
+                             'Counters are exact but access timing is not simulated')
+    parser.add_argument('-j', '--jobs', dest='jobs', action='store',
+                        default=None, type=int,
+                        help='Number of worker processes for --shards, defaults to one per core')
+    parser.add_argument('-E', '--engine', dest='engine', action='store',
+                        default='reference', type=str,
+                        help='Simulation engine. reference = one access at a time with timing, '
+                             'batch = NumPy batches, counters only')
+    parser.add_argument('-r', '--replacement-policy', dest='replacement_policy', action='store',
+                        default=['lru'], type=args_as_policies,
+                        help='Replacement policy for every layer, or a comma separated policy per layer. '
+                             'Options <lru,plru,fifo,random,srrip>')
+    parser.add_argument('-e', '--storage', dest='storage', action='store',
+                        default='dict', type=str,
+                        help='How each cache stores its blocks. dict = OrderedDict of blocks per set, '
+                             'array = flat preallocated arrays, smaller for large caches')
+    parser.add_argument('--event-trace', dest='event_trace', action='store',
+                        default='', type=str,
+                        help='Stream hit, miss, fill, evict and writeback events for every access to this file')
+    parser.add_argument('--event-format', dest='event_format', action='store',
+                        default='jsonl', type=str,
+                        help='Format of the event trace. Options <jsonl,binary>')
+    parser.add_argument('--event-every', dest='event_every', action='store',
+                        default=1, type=int,
+                        help='Only trace every Nth access')
+    parser.add_argument('--event-window', dest='event_window', action='store',
+                        default=None, type=args_as_window,
+                        help='Only trace accesses numbered in start:stop')
+    parser.add_argument('--profile', dest='profile', action='store',
+                        default='', type=str,
+                        help='Write per level read/write hits and misses, dirty evictions, memory traffic, '
+                             'cycles and per set counts to this file, JSON if it ends in .json and CSV otherwise')
+    parser.add_argument('--heatmap', dest='heatmap', action='store_true',
+                        help='Print a heatmap of the misses of every set and the hottest sets of each level')
+    parser.add_argument('--hot-sets', dest='hot_sets', action='store',
+                        default=10, type=int,
+                        help='Number of hottest sets listed under each heatmap')
+    parser.add_argument('--classify-misses', dest='classify_misses', action='store_true',
+                        help='Split the misses of every layer into compulsory, capacity and conflict misses')
+    parser.add_argument('--check-invariants', dest='check_invariants', action='store_true',
+                        help='Check the hits, misses, fills, evictions, writebacks, dirty blocks and replacement '
+                             'order of every level after every access and stop at the first broken invariant')
+    parser.add_argument('--check-inclusion', dest='check_inclusion', action='store_true',
+                        help='Also check that every layer holds all the blocks of the layer above it, implies '
+                             '--check-invariants')
+    parser.add_argument('--result-cache', dest='result_cache', action='store',
+                        default='', type=str,
+                        help='Directory of stored results keyed by the trace contents and the heirarchy. A '
+                             'stored result is printed instead of running, new results are stored')
+    parser.add_argument('--result-cache-size', dest='result_cache_size', action='store',
+                        default=256, type=float,
+                        help='Megabytes the result cache may use, least recently used results are deleted first')
+    parser.add_argument('--record-miss-stream', dest='record_miss_stream', action='store',
+                        default='', type=str,
+                        help='Only simulate the top --stream-layers layers and record what they send to the '
+                             'layers below to this file. Given to -t here or to sweep.py, it stands in for the '
+                             'trace of any heirarchy with the same top layers')
+    parser.add_argument('--stream-layers', dest='stream_layers', action='store',
+                        default=1, type=int,
+                        help='Number of top layers simulated by --record-miss-stream')
+    parser.add_argument('--save-checkpoint', dest='save_checkpoint', action='store',
+                        default='', type=str,
+                        help='Save the state of the whole heirarchy to this file, at the end of the run '
+                             'or after --checkpoint-at accesses')
+    parser.add_argument('--checkpoint-at', dest='checkpoint_at', action='store',
+                        default=None, type=int,
+                        help='Number of trace accesses after which the checkpoint is saved, the run continues')
+    parser.add_argument('--restore-checkpoint', dest='restore_checkpoint', action='store',
+                        default='', type=str,
+                        help='Start from a saved checkpoint and resume the trace where it was taken. The '
+                             'cache geometry must match, latencies and the miss limit may differ')
+    parser.add_argument('--reset-counters', dest='reset_counters', action='store_true',
+                        help='Zero the counters after restoring, to only measure the rest of the run')
+    parser.add_argument('--stop-at', dest='stop_at', action='store',
+                        default=None, type=int,
+                        help='Stop before the trace access with this number')
+    parser.add_argument('--sample-sets', dest='sample_sets', action='store',
+                        default=None, type=float,
+                        help='Only simulate this fraction of the sets and estimate hit rates with 95%% '
+                             'confidence intervals. Access timing is not simulated')
+    parser.add_argument('--sample-seed', dest='sample_seed', action='store',
+                        default=0, type=int,
+                        help='Seed for choosing the sampled sets')
+    parser.add_argument('--sample-period', dest='sample_period', action='store',
+                        default=None, type=int,
+                        help='Only simulate a window of every period accesses and estimate hit rates with '
+                             '95%% confidence intervals')
+    parser.add_argument('--sample-window', dest='sample_window', action='store',
+                        default=None, type=int,
+                        help='Accesses simulated and counted at the end of every --sample-period')
+    parser.add_argument('--sample-warmup', dest='sample_warmup', action='store',
+                        default=None, type=int,
+                        help='Accesses before each window that only warm the caches, the rest are skipped. '
+                             'Defaults to the whole gap, shorter warm ups are faster but can understate '
+                             'hit rates of large caches')
     # Parse the arguments
     args = parser.parse_args()
 
     # Verify they are correct
     verify_args(args)
 
+    heirarchy_args = dict(block_size=args.block_size,
+                          num_layers=args.cache_layers, sizes=args.cache_sizes, cycles=args.cache_cycles,
+                          associativity=args.set_associativity, write_policy=args.write_policy,
+                          max_misses=args.max_misses,cache_view=args.cache_view,
+                          addr_size=args.addr_size, storage=args.storage,
+                          replacement_policy=args.replacement_policy)
+
+    # Simulate slices of the sets in parallel if asked to
+    if args.shards > 1:
+        try:
+            cache_heirarchy = run_sharded(args.trace_file, heirarchy_args, args.shards, args.jobs)
+        except ValueError as e:
+            show_error_and_exit(str(e) + "!")
+        if cache_heirarchy is not None:
+            if args.debug_level > 0:
+                print("\n\n************** Final Results ******************")
+                print("\n" + str(cache_heirarchy) + "\n")
+                print("Counters merged from sharded run, access timing was not simulated\n")
+            sys.exit(0)
+        print("\nThe smallest cache has a single set and cannot be sharded, running serially\n")
+
+    # Estimate hit rates from a sample of the sets or of the trace
+    if args.sample_sets is not None or args.sample_period is not None:
+        try:
+            if args.sample_sets is not None:
+                estimates = sample_sets(args.trace_file, heirarchy_args, args.sample_sets, args.sample_seed)
+            else:
+                estimates = sample_time(args.trace_file, heirarchy_args, args.sample_period, args.sample_window,
+                                        args.sample_warmup)
+        except ValueError as e:
+            show_error_and_exit(str(e) + "!")
+        if args.sample_sets is not None:
+            if estimates is None:
+                show_error_and_exit("The smallest cache has a single set and cannot be set sampled!")
+            description = "Estimated from " + str(args.sample_sets * 100) + "% of the sets"
+        else:
+            description = "Estimated from windows of " + str(args.sample_window) + " accesses every " + \
+                          str(args.sample_period)
+        if args.debug_level > 0:
+            print("\n\n************** Sampled Results ******************")
+            print("\n" + estimate_table(estimates) + "\n")
+            print(description + ", access timing was not reported\n")
+        sys.exit(0)
+
+    # Counters only run through the NumPy batch engine, imported here so NumPy stays optional
+    if args.engine == "batch":
+        from memcomponents.batch import BatchEngine
+        try:
+            cache_heirarchy = BatchEngine(create_heirarchy(**dict(heirarchy_args, cache_view=0))).run_trace(
+                args.trace_file)
+        except ValueError as e:
+            show_error_and_exit(str(e) + "!")
+        if args.debug_level > 0:
+            print("\n\n************** Final Results ******************")
+            print("\n" + str(cache_heirarchy) + "\n")
+            print("Counters from the batch engine, access timing was not simulated\n")
+        sys.exit(0)
+
+    # Reuse the results of an identical earlier run if there are any
+    if args.result_cache:
+        result_cache = ResultCache(args.result_cache, int(args.result_cache_size * (1 << 20)))
+        result_key = result_cache.key(args.trace_file, heirarchy_args)
+        cached_result = result_cache.get(result_key)
+        if cached_result is not None:
+            if args.debug_level > 0:
+                print("\n\n************** Final Results ******************")
+                print("\n" + cached_result["report"] + "\n")
+                print("Results from the result cache in " + str(args.result_cache) + "\n")
+            sys.exit(0)
+
+    # Simulate the top layers once, for any number of runs of the layers below them
+    if args.record_miss_stream:
+        start_time = time.time()
+        try:
+            cache_heirarchy = record_miss_stream(AccessSequence(args.trace_file), args.record_miss_stream,
+                                                 heirarchy_args, args.stream_layers)
+        except ValueError as e:
+            show_error_and_exit(str(e) + "!")
+        if args.debug_level > 0:
+            print("\n\n************** Recorded Layers ******************")
+            print("\n" + "\n".join(cache.stat_string() for cache in cache_heirarchy.cache_layers) + "\n")
+            print("Miss stream written to " + str(args.record_miss_stream) + " in {:.2f} seconds\n".format(
+                time.time() - start_time))
+        sys.exit(0)
+
+    # Replay a miss stream through the layers below its top layers
+    if is_miss_stream(args.trace_file):
+        start_time = time.time()
+        try:
+            cache_heirarchy = create_heirarchy(**dict(heirarchy_args, cache_view=0))
+            read_miss_stream(args.trace_file).replay(cache_heirarchy)
+        except ValueError as e:
+            show_error_and_exit(str(e) + "!")
+        if args.result_cache:
+            result_cache.put(result_key, heirarchy_result(cache_heirarchy))
+        if args.debug_level > 0:
+            print("\n\n************** Final Results ******************")
+            print("\n" + str(cache_heirarchy) + "\n")
+            print("Replayed from the miss stream " + str(args.trace_file) + " in {:.2f} seconds\n".format(
+                time.time() - start_time))
+        sys.exit(0)
+
+    # Create cache heirarchy, the geometry may not fit in the address size
+    try:
+        cache_heirarchy = create_heirarchy(**heirarchy_args)
+    except ValueError as e:
+        show_error_and_exit(str(e) + "!")
+
+    # Warm start from a checkpoint if asked to
+    start = 0
+    if args.restore_checkpoint:
+        try:
+            start = restore_checkpoint(cache_heirarchy, args.restore_checkpoint)
+        except (IOError, OSError, ValueError) as e:
+            show_error_and_exit("Could not restore checkpoint: " + str(e))
+        if args.reset_counters:
+            cache_heirarchy.reset_counters()
+
     # Create memory access sequence
-    memory_trace = AccessSequence(args.trace_file)
+    memory_trace = AccessSequence(args.trace_file, retain=args.access_summary, start=start, stop=args.stop_at)
+
+    # Stream events to a file if asked to
+    if args.event_trace:
+        cache_heirarchy.set_tracer(EventTracer(args.event_trace, args.event_format, args.event_every, args.event_window))
 
-    # Create cache heirarchy
-    cache_heirarchy = create_heirarchy(block_size=args.block_size,
-                                       num_layers=args.cache_layers, sizes=args.cache_sizes, cycles=args.cache_cycles,
-                                       associativity=args.set_associativity, write_policy=args.write_policy,
-                                       max_misses=args.max_misses,cache_view=args.cache_view)
+    # Count per level and per set if asked to, after any counter reset
+    if args.profile or args.heatmap:
+        cache_heirarchy.set_profiling(True)
+
+    if args.classify_misses:
+        cache_heirarchy.set_miss_classification(True)
+
+    # After the event tracer, which keeps getting the events
+    if args.check_invariants or args.check_inclusion:
+        cache_heirarchy.set_invariant_checking(True, args.check_inclusion)
 
     # Create simulator
     cache_sim = CacheSimulator(memory_trace, cache_heirarchy)
 
     # Run simulator
-    cache_sim.run(args.debug_level)
+    try:
+        cache_sim.run(args.debug_level, args.save_checkpoint or None, args.checkpoint_at)
+    except ValueError as e:
+        show_error_and_exit(str(e) + "!")
+    finally:
+        # Write out the buffered events even when a broken invariant stops the run
+        if cache_heirarchy.tracer is not None:
+            cache_heirarchy.tracer.close()
+    if args.result_cache:
+        result_cache.put(result_key, heirarchy_result(cache_heirarchy))
+    if cache_heirarchy.checker is not None and args.debug_level > 0:
+        print("Invariants" + (" and inclusion" if args.check_inclusion else "") + " held for " +
+              str(cache_heirarchy.checker.num_checked) + " accesses\n")
+    if args.save_checkpoint and cache_sim.checkpoint_position is None:
+        print("\nThe run ended before access " + str(args.checkpoint_at) + ", no checkpoint was saved\n")
+
+    if args.heatmap:
+        print(heatmap_string(cache_heirarchy, args.hot_sets))
+    if args.profile:
+        write_profile(args.profile, profile_report(cache_heirarchy))
@@ -0,0 +1,99 @@
+import os
+import random
+import tempfile
+import unittest
+from memcomponents.access_sequence import MemoryAccess
+from memcomponents.heirarchy import create_heirarchy
+from memcomponents.checkpoint import save_checkpoint, restore_checkpoint
+
+
+def make_heirarchy(storage="dict", replacement_policy="lru", sizes=None, associativity=None):
+    return create_heirarchy(block_size=16, num_layers=2, sizes=sizes or [256, 2048], cycles=[1, 10],
+                            associativity=associativity or [2, 4], write_policy="wb+wa", max_misses=3, cache_view=3,
+                            storage=storage, replacement_policy=replacement_policy)
+
+
+def make_accesses(count=2000):
+    rand = random.Random(11)
+    return [('w' if rand.random() < 0.3 else 'r', rand.randrange(0, 1 << 13), num * 2) for num in range(count)]
+
+
+def run(heirarchy, accesses, start=0, stop=None):
+    finish_times = []
+    for num in range(start, len(accesses) if stop is None else stop):
+        mode, address, arrival = accesses[num]
+        mem_access = MemoryAccess(num, mode, address, arrival)
+        heirarchy.access(mem_access)
+        finish_times.append(mem_access.finish_time())
+    return finish_times
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.checkpoint_file = os.path.join(self.tmp_dir.name, "warm.ckpt")
+        self.accesses = make_accesses()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_resume_matches_uninterrupted(self):
+        for save_storage, restore_storage, policy in [("dict", "dict", "lru"), ("array", "dict", "lru"),
+                                                      ("dict", "array", "lru"), ("dict", "dict", "srrip"),
+                                                      ("dict", "dict", "random")]:
+            full = make_heirarchy(save_storage, policy)
+            full_times = run(full, self.accesses)
+
+            warm = make_heirarchy(save_storage, policy)
+            run(warm, self.accesses, stop=700)
+            save_checkpoint(warm, self.checkpoint_file, 700)
+
+            resumed = make_heirarchy(restore_storage, policy)
+            position = restore_checkpoint(resumed, self.checkpoint_file)
+            self.assertEqual(position, 700)
+            self.assertEqual(run(resumed, self.accesses, start=position), full_times[700:])
+            self.assertEqual(str(resumed), str(full))
+
+    def test_wide_policy_state(self):
+        # Tree and prediction bit vectors of sets with more than 64 ways
+        for policy in ["plru", "srrip"]:
+            geometry = dict(replacement_policy=policy, sizes=[2048, 8192], associativity=[128, 256])
+            full = make_heirarchy(**geometry)
+            full_times = run(full, self.accesses)
+
+            warm = make_heirarchy(**geometry)
+            run(warm, self.accesses, stop=1500)
+            self.assertGreater(max(warm.cache_layers[0].sets[0].policy_state()), 1 << 64)
+            save_checkpoint(warm, self.checkpoint_file, 1500)
+
+            resumed = make_heirarchy(**geometry)
+            restore_checkpoint(resumed, self.checkpoint_file)
+            self.assertEqual([cache_set.policy_state() for cache_set in resumed.cache_layers[1].sets],
+                             [cache_set.policy_state() for cache_set in warm.cache_layers[1].sets])
+            self.assertEqual(run(resumed, self.accesses, start=1500), full_times[1500:])
+            self.assertEqual(str(resumed), str(full))
+
+    def test_geometry_mismatch(self):
+        warm = make_heirarchy()
+        run(warm, self.accesses, stop=100)
+        save_checkpoint(warm, self.checkpoint_file, 100)
+        with self.assertRaises(ValueError):
+            restore_checkpoint(make_heirarchy(sizes=[256, 4096]), self.checkpoint_file)
+        with self.assertRaises(ValueError):
+            restore_checkpoint(make_heirarchy(replacement_policy="fifo"), self.checkpoint_file)
+
+    def test_invalidate_matches_new(self):
+        for storage, policy in [("dict", "lru"), ("array", "lru"), ("dict", "plru"), ("dict", "fifo")]:
+            reused = make_heirarchy(storage, policy)
+            run(reused, self.accesses, stop=1000)
+            reused.invalidate()
+            reused_times = run(reused, self.accesses)
+
+            fresh = make_heirarchy(storage, policy)
+            self.assertEqual(reused_times, run(fresh, self.accesses))
+            self.assertEqual(str(reused), str(fresh))
+
+
+if __name__ == '__main__':
+    unittest.main()
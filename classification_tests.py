@@ -0,0 +1,77 @@
+import random
+import unittest
+from memcomponents.access_sequence import MemoryAccess
+from memcomponents.heirarchy import create_heirarchy
+
+
+def make_heirarchy(associativity, write_policy="wb+wa", storage="dict"):
+    heirarchy = create_heirarchy(block_size=16, num_layers=2, sizes=[256, 1024], cycles=[1, 10],
+                                 associativity=associativity, write_policy=write_policy, max_misses=0,
+                                 cache_view=0, storage=storage)
+    heirarchy.set_miss_classification(True)
+    return heirarchy
+
+
+def run(heirarchy, accesses):
+    for num, (mode, address) in enumerate(accesses):
+        heirarchy.access(MemoryAccess(num, mode, address, num))
+
+
+def make_accesses(count=4000):
+    rand = random.Random(3)
+    return [('w' if rand.random() < 0.3 else 'r', rand.randrange(0, 1 << 12)) for num in range(count)]
+
+
+class MissClassificationTest(unittest.TestCase):
+
+    def test_classes_add_up(self):
+        for write_policy in ["wb+wa", "wt+nwa"]:
+            for storage in ["dict", "array"]:
+                heirarchy = make_heirarchy([2, 4], write_policy, storage)
+                run(heirarchy, make_accesses())
+                for cache in heirarchy.cache_layers:
+                    stats = cache.stats()
+                    self.assertEqual(stats["compulsory"] + stats["capacity"] + stats["conflict"], stats["misses"])
+                    self.assertGreater(stats["capacity"], 0)
+
+    def test_compulsory_misses(self):
+        heirarchy = make_heirarchy([2, 4])
+        accesses = make_accesses()
+        run(heirarchy, accesses)
+        blocks = set(address >> 4 for mode, address in accesses)
+        self.assertEqual(heirarchy.cache_layers[0].classifier.breakdown()["compulsory"], len(blocks))
+
+    def test_fully_associative_has_no_conflicts(self):
+        heirarchy = make_heirarchy([16, 64])
+        run(heirarchy, make_accesses())
+        for cache in heirarchy.cache_layers:
+            self.assertEqual(cache.total_sets, 1)
+            self.assertEqual(cache.classifier.breakdown()["conflict"], 0)
+
+    def test_conflicts(self):
+        # Two blocks fighting over one set of a direct mapped cache with room for both
+        heirarchy = make_heirarchy([1, 4])
+        run(heirarchy, [('r', 0), ('r', 256)] * 10)
+        self.assertEqual(heirarchy.cache_layers[0].classifier.breakdown(),
+                         {"compulsory": 2, "capacity": 0, "conflict": 18})
+        self.assertIn("Conflict: 18 (90%)", heirarchy.cache_layers[0].stat_string())
+
+    def test_reset_and_invalidate(self):
+        heirarchy = make_heirarchy([1, 4])
+        run(heirarchy, [('r', 0), ('r', 256)] * 2)
+        heirarchy.reset_counters()
+        run(heirarchy, [('r', 0), ('r', 256)])
+        self.assertEqual(heirarchy.cache_layers[0].classifier.breakdown(),
+                         {"compulsory": 0, "capacity": 0, "conflict": 2})
+
+        heirarchy.invalidate()
+        run(heirarchy, [('r', 0), ('r', 256)])
+        self.assertEqual(heirarchy.cache_layers[0].classifier.breakdown(),
+                         {"compulsory": 2, "capacity": 0, "conflict": 0})
+
+        heirarchy.set_miss_classification(False)
+        self.assertNotIn("compulsory", heirarchy.cache_layers[0].stats())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import json
+import random
+import tempfile
+import unittest
+from memcomponents.access_sequence import MemoryAccess
+from memcomponents.heirarchy import create_heirarchy
+from memcomponents.events import EventTracer, read_binary_events
+
+
+def run_traced(event_file, event_format, every=1, window=None, write_policy="wb+wa"):
+    heirarchy = create_heirarchy(block_size=16, num_layers=2, sizes=[256, 1024], cycles=[1, 10],
+                                 associativity=[2, 4], write_policy=write_policy, max_misses=0)
+    heirarchy.set_tracer(EventTracer(event_file, event_format, every, window, buffer_len=64))
+    rand = random.Random(3)
+    for num in range(500):
+        heirarchy.access(MemoryAccess(num, 'w' if rand.random() < 0.4 else 'r', rand.randrange(0, 1 << 12), num))
+    heirarchy.tracer.close()
+    return heirarchy
+
+
+class EventTraceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.jsonl_file = os.path.join(self.tmp_dir.name, "events.jsonl")
+        self.binary_file = os.path.join(self.tmp_dir.name, "events.bin")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_counts_match_caches(self):
+        heirarchy = run_traced(self.jsonl_file, "jsonl")
+        with open(self.jsonl_file) as e_file:
+            events = [json.loads(line) for line in e_file]
+
+        self.assertEqual(sum(event["event"] == "access" for event in events), 500)
+        for cache in heirarchy.cache_layers:
+            level_events = [event["event"] for event in events if event.get("level") == cache.level]
+            self.assertEqual(level_events.count("hit"), cache.num_hits)
+            self.assertEqual(level_events.count("miss"), cache.num_accesses - cache.num_hits)
+
+    def test_binary_matches_jsonl(self):
+        for write_policy in ["wb+wa", "wt+nwa"]:
+            run_traced(self.jsonl_file, "jsonl", write_policy=write_policy)
+            run_traced(self.binary_file, "binary", write_policy=write_policy)
+            with open(self.jsonl_file) as e_file:
+                json_kinds = [json.loads(line)["event"] for line in e_file]
+            self.assertEqual([event[0] for event in read_binary_events(self.binary_file)], json_kinds)
+
+    def test_sampling(self):
+        run_traced(self.binary_file, "binary", every=7, window=(100, 300))
+        traced = sorted(set(event[3] for event in read_binary_events(self.binary_file)))
+        self.assertEqual(traced, list(range(100, 300, 7)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import random
+import unittest
+from memcomponents.access_sequence import MemoryAccess
+from memcomponents.heirarchy import create_heirarchy
+
+
+def run_accesses(max_misses, arrivals):
+    heirarchy = create_heirarchy(block_size=64, num_layers=1, sizes=[1024], cycles=[10],
+                                 associativity=[2], write_policy="wb+wa", max_misses=max_misses)
+    accesses = []
+    for num, arrival in enumerate(arrivals):
+        # Distinct blocks so every access misses and takes 10 + 10 + 100 cycles
+        mem_access = MemoryAccess(num, 'r', num * 64, arrival)
+        heirarchy.access(mem_access)
+        accesses.append(mem_access)
+    return heirarchy, accesses
+
+
+class OutstandingMissTest(unittest.TestCase):
+
+    def test_sequential(self):
+        heirarchy, accesses = run_accesses(0, [0, 0, 0])
+        self.assertEqual([a.serve_time for a in accesses], [0, 121, 242])
+        self.assertEqual((heirarchy.num_stalls, heirarchy.stall_cycles), (2, 121 + 242))
+        self.assertEqual(heirarchy.peak_occupancy, 1)
+
+    def test_miss_limit(self):
+        heirarchy, accesses = run_accesses(2, [0, 1, 2, 3, 500])
+        self.assertEqual([a.serve_time for a in accesses], [0, 1, 121, 122, 500])
+        self.assertEqual(heirarchy.num_stalls, 2)
+        self.assertEqual(heirarchy.peak_occupancy, 2)
+
+    def test_retires_completed(self):
+        # Everything before the last arrival has completed, so nothing stalls
+        heirarchy, accesses = run_accesses(3, [0, 0, 0, 1000, 1001, 1002])
+        self.assertEqual([a.serve_time for a in accesses], [0, 0, 0, 1000, 1001, 1002])
+        self.assertEqual(heirarchy.num_stalls, 0)
+        self.assertEqual(len(heirarchy.access_buffer), 3)
+
+
+class StorageEngineTest(unittest.TestCase):
+
+    def run_engine(self, storage, write_policy):
+        heirarchy = create_heirarchy(block_size=16, num_layers=3, sizes=[256, 1024, 4096], cycles=[1, 10, 50],
+                                     associativity=[1, 2, 8], write_policy=write_policy, max_misses=4,
+                                     cache_view=3, storage=storage)
+        rand = random.Random(5)
+        finish_times = []
+        for num in range(3000):
+            address = rand.randrange(0, 1 << 13) if rand.random() < 0.8 else rand.randrange(0, 1 << 32)
+            mem_access = MemoryAccess(num, 'w' if rand.random() < 0.4 else 'r', address, num)
+            heirarchy.access(mem_access)
+            finish_times.append(mem_access.finish_time())
+        return heirarchy, finish_times
+
+    def test_array_matches_dict(self):
+        for write_policy in ["wb+wa", "wt+nwa"]:
+            dict_heirarchy, dict_times = self.run_engine("dict", write_policy)
+            array_heirarchy, array_times = self.run_engine("array", write_policy)
+            self.assertEqual(array_times, dict_times)
+            self.assertEqual(str(array_heirarchy), str(dict_heirarchy))
+            for dict_cache, array_cache in zip(dict_heirarchy.cache_layers, array_heirarchy.cache_layers):
+                self.assertEqual(len(array_cache.get_valid_sets(True)), len(dict_cache.get_valid_sets(True)))
+
+    def test_valid_set_indexes(self):
+        for storage in ["dict", "array"]:
+            for write_policy in ["wb+wa", "wt+nwa"]:
+                heirarchy, finish_times = self.run_engine(storage, write_policy)
+                for cache in heirarchy.cache_layers:
+                    for dirty_required in [False, True]:
+                        scanned = [cache_set.index for cache_set in cache.sets
+                                   if cache_set.get_valid_blocks(dirty_required)]
+                        tracked = [cache_set.index for cache_set in cache.get_valid_sets(dirty_required)]
+                        self.assertEqual(tracked, scanned)
+
+
+if __name__ == '__main__':
+    unittest.main()
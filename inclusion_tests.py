@@ -1,26 +1,31 @@
 import unittest
 import os
+import tempfile
 from memcomponents import heirarchy, access_sequence
+from testutils import write_trace
 
 
 def create_test_components(write_policy="wb+wa", trace_file="traces/basic.trace"):
     full_file_path = os.path.join(os.getcwd(), trace_file)
     test_heirarachy = heirarchy.create_heirarchy(block_size=4,
                                                  num_layers=3, sizes=[256, 512, 1024], cycles=[10, 20, 50],
-                                                 associativity=[1, 2, 4], write_policy=write_policy)
+                                                 associativity=[1, 2, 4], write_policy=write_policy, max_misses=0)
     mem_sequence = access_sequence.AccessSequence(full_file_path)
     return (mem_sequence, test_heirarachy)
 
 
-def make_block_pool(cache_sets):
-    valid_blocks = []
-    for cache_set in cache_sets:
-        valid_blocks.extend(cache_set.get_valid_blocks())
+def make_block_pool(cache):
+    # Block numbers, tags alone differ between levels with different numbers of sets
+    valid_blocks = set()
+    for cache_set in cache.get_valid_sets():
+        for block in cache_set.get_valid_blocks():
+            valid_blocks.add(block.data >> cache.num_bits_offset)
+    return valid_blocks
 
 
 def is_subset(child_cache, parent_cache):
-    parent_blocks = make_block_pool(parent_cache.get_valid_sets())
-    child_blocks = make_block_pool(child_cache.get_valid_sets())
+    parent_blocks = make_block_pool(parent_cache)
+    child_blocks = make_block_pool(child_cache)
 
     for c_elem in child_blocks:
         if c_elem not in parent_blocks:
@@ -49,6 +54,31 @@ class InclusionTest(unittest.TestCase):
                 subset_result = is_subset(c_heirarchy.cache_layers[cache_num], c_heirarchy.cache_layers[cache_num + 1])
                 self.assertTrue(subset_result)
 
+    def test_inclusion_checked_incrementally(self):
+        # Hits in a level do not refresh the levels below, so even with the same sets and more
+        # ways below, lru eventually evicts a block the level above still holds. The checker has
+        # to stop at the same access as the full comparison
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            trace_file = os.path.join(tmp_dir, "inclusion.trace")
+            write_trace(trace_file, 6000, seed=1, address_bits=12)
+            for write_policy in ["wb+wa", "wt+nwa"]:
+                mem_seq, c_heirarchy = create_test_components(write_policy, trace_file)
+                first_broken = None
+                for access in mem_seq:
+                    c_heirarchy.access(access)
+                    pools = [make_block_pool(cache) for cache in c_heirarchy.cache_layers]
+                    if not all(child <= parent for child, parent in zip(pools, pools[1:])):
+                        first_broken = access.num
+                        break
+                self.assertIsNotNone(first_broken)
+
+                mem_seq, c_heirarchy = create_test_components(write_policy, trace_file)
+                c_heirarchy.set_invariant_checking(True, inclusion=True)
+                with self.assertRaisesRegex(ValueError, "access " + str(first_broken) + " .*held by the level above"):
+                    for access in mem_seq:
+                        c_heirarchy.access(access)
+                self.assertEqual(c_heirarchy.checker.num_checked, first_broken)
+
 
 if __name__ == '__main__':
     unittest.main()
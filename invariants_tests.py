@@ -0,0 +1,82 @@
+import unittest
+from memcomponents.access_sequence import AccessSequence
+from memcomponents.heirarchy import create_heirarchy
+from memcomponents.events import EventTracer
+from testutils import TempDirTest, write_trace
+
+CONFIG = dict(block_size=16, num_layers=3, sizes=[256, 1024, 4096], cycles=[1, 4, 10], associativity=[2, 4, 8],
+              max_misses=2, cache_view=0)
+
+
+class InvariantTest(TempDirTest):
+
+    def setUp(self):
+        super().setUp()
+        self.trace_file = self.tmp_path("test.trace")
+        write_trace(self.trace_file, 4000, seed=7)
+
+    def run_checked(self, heirarchy):
+        for mem_access in AccessSequence(self.trace_file):
+            heirarchy.access(mem_access)
+
+    def test_every_policy_holds(self):
+        for write_policy in ["wb+wa", "wt+nwa"]:
+            for policy, storage in [("lru", "dict"), ("lru", "array"), ("fifo", "dict"), ("plru", "dict"),
+                                    ("srrip", "dict"), ("random", "dict")]:
+                heirarchy = create_heirarchy(write_policy=write_policy, storage=storage, replacement_policy=policy,
+                                             **CONFIG)
+                heirarchy.set_invariant_checking(True)
+                self.run_checked(heirarchy)
+                self.assertEqual(heirarchy.checker.num_checked, 4000)
+
+    def test_broken_caches_are_caught(self):
+        # Hits that forget to refresh the lru order
+        heirarchy = create_heirarchy(write_policy="wb+wa", **CONFIG)
+        cache = heirarchy.cache_layers[1]
+        cache.lookup = lambda index, tag: cache.sets[index].get(tag)
+        heirarchy.set_invariant_checking(True)
+        with self.assertRaisesRegex(ValueError, "in L1: evicted tag"):
+            self.run_checked(heirarchy)
+
+        # Writes that never mark the block dirty
+        heirarchy = create_heirarchy(write_policy="wb+wa", **CONFIG)
+        heirarchy.cache_layers[0].mark_dirty = lambda index, block: False
+        heirarchy.set_invariant_checking(True)
+        with self.assertRaisesRegex(ValueError, "in L0: set .* dirty blocks but holds 1"):
+            self.run_checked(heirarchy)
+
+    def test_start_and_reset(self):
+        heirarchy = create_heirarchy(write_policy="wb+wa", **CONFIG)
+        self.run_checked(heirarchy)
+        with self.assertRaises(ValueError):
+            heirarchy.set_invariant_checking(True)
+
+        # Emptying the caches empties the shadows with them, counters may be reset at any time
+        heirarchy.invalidate()
+        heirarchy.set_invariant_checking(True)
+        self.run_checked(heirarchy)
+        heirarchy.reset_counters()
+        heirarchy.invalidate()
+        self.run_checked(heirarchy)
+        self.assertEqual(heirarchy.checker.num_checked, 8000)
+
+        heirarchy.set_invariant_checking(False)
+        self.assertIsNone(heirarchy.checker)
+        self.assertIsNone(heirarchy.tracer)
+
+    def test_events_pass_through(self):
+        counts = []
+        for checking in [False, True]:
+            event_file = self.tmp_path("events" + str(checking) + ".jsonl")
+            heirarchy = create_heirarchy(write_policy="wb+wa", **CONFIG)
+            heirarchy.set_tracer(EventTracer(event_file, every=3))
+            heirarchy.set_invariant_checking(checking)
+            self.run_checked(heirarchy)
+            heirarchy.tracer.close()
+            with open(event_file) as e_file:
+                counts.append(e_file.read())
+        self.assertEqual(counts[0], counts[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,12 @@
+from array import array
 from memcomponents.utilities import *
+from memcomponents.trace_format import BinaryTrace, is_binary_trace, open_text_trace, MODE_CODES, MODE_NAMES
 
 
 class MemoryAccess(object):
+    # Slots keep each in-flight access small, no per instance dict
+    __slots__ = ['num', 'mode', 'arrival_time', 'serve_time', 'address', 'execution_time', 'geometry', 'decoded']
+
     def __init__(self, num, mode, address, time):
         self.num = num
         self.mode = mode.lower()
@@ -9,21 +14,32 @@ class MemoryAccess(object):
         self.serve_time = time
         self.address = address
         self.execution_time = 0
+        self.geometry = None
+        self.decoded = None
+
+    def decode(self, geometry):
+        # Only split the address again if the last level had a different shape
+        if geometry is not self.geometry:
+            offset_shift, index_mask, tag_shift = geometry
+            self.decoded = (self.address >> tag_shift, (self.address >> offset_shift) & index_mask)
+            self.geometry = geometry
+        return self.decoded
 
     def parse_address(self, num_sets, block_size, addr_size=32, debug=False):
         num_bits_index = bits_required(num_sets)
         num_bits_offset = bits_required(block_size)
         num_bits_tag = addr_size - (num_bits_index + num_bits_offset)
 
-        bin_string = '{:032b}'.format(self.address)
+        if self.address >> addr_size or num_bits_tag < 0:
+            raise ValueError("Address " + str(self.address) + " does not fit in " + str(addr_size) + " bits")
 
-        # Tag is num_bits_tag MSB
-        tag = int(bin_string[0:num_bits_tag], 2)
-        index = int(bin_string[num_bits_tag:-num_bits_offset], 2)
-        offset = int(bin_string[-num_bits_offset:], 2)
+        tag = self.address >> (num_bits_offset + num_bits_index)
+        index = (self.address >> num_bits_offset) & ((1 << num_bits_index) - 1)
+        offset = self.address & ((1 << num_bits_offset) - 1)
 
         # If we need to debug
         if debug:
+            bin_string = '{:0{}b}'.format(self.address, addr_size)
             print(self)
             print("Sets: " + str(num_sets))
             print("Block Size: " + str(block_size))
@@ -33,8 +49,8 @@ class MemoryAccess(object):
             print()
             print("Binary Address: " + str(bin_string))
             print("Tag: " + bin_string[0:num_bits_tag])
-            print("Index: " + bin_string[num_bits_tag:-num_bits_offset])
-            print("Offset: " + bin_string[-num_bits_offset:])
+            print("Index: " + bin_string[num_bits_tag:addr_size - num_bits_offset])
+            print("Offset: " + bin_string[addr_size - num_bits_offset:])
 
         # Return split address
         return (tag, index, offset)
@@ -67,38 +83,128 @@ class MemoryAccess(object):
 
 class AccessSequence(object):
 
-    def __init__(self, trace_file):
-        # Initialize our trace sequence
+    def __init__(self, trace_file, retain=False, chunk_size=1 << 20, start=0, stop=None):
+        # Accesses are streamed from the file in chunks of roughly chunk_size bytes. They are
+        # only kept around after being simulated if retain is set, for the summary table.
+        # Only accesses numbered in [start, stop) are produced, e.g. to resume from a checkpoint
+        self.trace_file = trace_file
+        self.retain = retain
+        self.chunk_size = chunk_size
+        self.start = start
+        self.stop = stop
         self.mem_sequence = []
-        self.curr_index = 0
 
-        # Read in our traces
-        t_file = open(trace_file, 'r')
-        line_num = 0
-        for line in t_file.readlines():
-            tokens = line.split()
-            mem_access = MemoryAccess(line_num, tokens[0], int(tokens[1]), int(tokens[2]))
-            self.mem_sequence.append(mem_access)
-            line_num += 1
-        t_file.close()
+        # Binary traces are mapped straight from disk instead of parsed
+        self.binary = is_binary_trace(trace_file)
 
     def __iter__(self):
-        self.curr_index = 0
-        return self
+        if self.retain:
+            self.mem_sequence = []
 
-    def __next__(self):
-        if self.curr_index < len(self.mem_sequence):
-            mem_access = self.mem_sequence[self.curr_index]
-            self.curr_index += 1
-            return mem_access
-        else:
-            raise StopIteration
+        if self.binary:
+            return self.read_binary()
+        return self.read_text()
+
+    def read_text(self):
+        # Read in our traces lazily
+        line_num = 0
+        start, stop = self.start, self.stop
+        with open_text_trace(self.trace_file) as t_file:
+            lines = t_file.readlines(self.chunk_size)
+            while lines:
+                for line in lines:
+                    tokens = line.split()
+                    if not tokens:
+                        continue
+                    if line_num < start:
+                        line_num += 1
+                        continue
+                    if stop is not None and line_num >= stop:
+                        return
+                    mem_access = MemoryAccess(line_num, tokens[0], int(tokens[1]), int(tokens[2]))
+                    if self.retain:
+                        self.mem_sequence.append(mem_access)
+                    line_num += 1
+                    yield mem_access
+                lines = t_file.readlines(self.chunk_size)
+
+    def read_binary(self):
+        with BinaryTrace(self.trace_file) as trace:
+            modes, addresses, times = trace.columns()
+            modes, addresses, times = (modes[self.start:self.stop], addresses[self.start:self.stop],
+                                       times[self.start:self.stop])
+            line_num = self.start
+            for mode, address, time in zip(modes, addresses, times):
+                mem_access = MemoryAccess(line_num, MODE_NAMES[mode], address, time)
+                if self.retain:
+                    self.mem_sequence.append(mem_access)
+                line_num += 1
+                yield mem_access
+
+            # Drop the views so the mapping can be closed
+            del modes, addresses, times
 
     def __repr__(self):
+        seq_str = "--- Memory Access Summary ---\n"
+        if not self.retain:
+            return seq_str + "Accesses were not retained for the summary"
+
         table = PrettyTable(
             ["Instruction Num", "Mode", "Address", "Arrival Time", "Serve Time", "Finish Time", "Access Time"])
-        seq_str = "--- Memory Access Summary ---\n"
         for mem_access in self.mem_sequence:
             table.add_row(mem_access.as_table_entry())
 
         return seq_str + str(table)
+
+
+class ColumnSequence(object):
+    # Replays a trace already held in (modes, addresses, arrival times) columns, e.g. arrays
+    # shared read-only between sweep workers. Modes are 0 for reads and 1 for writes
+    def __init__(self, modes, addresses, times):
+        self.modes = modes
+        self.addresses = addresses
+        self.times = times
+        self.retain = False
+
+    def __iter__(self):
+        line_num = 0
+        for mode, address, time in zip(self.modes, self.addresses, self.times):
+            yield MemoryAccess(line_num, MODE_NAMES[mode], address, time)
+            line_num += 1
+
+    def __len__(self):
+        return len(self.modes)
+
+    def __repr__(self):
+        return "--- Memory Access Summary ---\n" + str(len(self)) + " accesses held in columns"
+
+
+def read_records(trace_file, chunk_size=1 << 20):
+    # Yields (mode, address, arrival time) for every access without building MemoryAccess
+    # objects, for callers that only simulate some of them
+    if is_binary_trace(trace_file):
+        with BinaryTrace(trace_file) as trace:
+            modes, addresses, times = trace.columns()
+            for mode, address, time in zip(modes, addresses, times):
+                yield MODE_NAMES[mode], address, time
+            del modes, addresses, times
+        return
+
+    with open_text_trace(trace_file) as t_file:
+        lines = t_file.readlines(chunk_size)
+        while lines:
+            for line in lines:
+                tokens = line.split()
+                if tokens:
+                    yield tokens[0].lower(), int(tokens[1]), int(tokens[2])
+            lines = t_file.readlines(chunk_size)
+
+
+def read_columns(trace_file):
+    # Parse a text or binary trace once into compact columns
+    modes, addresses, times = array('B'), array('Q'), array('Q')
+    for mem_access in AccessSequence(trace_file):
+        modes.append(MODE_CODES[mem_access.mode])
+        addresses.append(mem_access.address)
+        times.append(mem_access.arrival_time)
+    return modes, addresses, times
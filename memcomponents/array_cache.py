@@ -0,0 +1,153 @@
+from array import array
+from memcomponents.cache import LRUCache, Block
+
+
+class ArrayLRUCache(LRUCache):
+    # LRUCache keeping every block in flat preallocated arrays indexed by
+    # set * ways + way instead of an OrderedDict of Block objects per set.
+    # LRU order is kept as an age stamp per way, the oldest valid way is evicted
+    def make_sets(self):
+        num_blocks = self.total_sets * self.blocks_per_set
+        self.tags = array('Q', bytes(8 * num_blocks))
+        self.data = array('Q', bytes(8 * num_blocks))
+        self.ages = array('Q', bytes(8 * num_blocks))
+        self.valid = bytearray(num_blocks)
+        self.dirty = bytearray(num_blocks)
+        self.clock = 1
+
+        # A single record reused for every eviction, read it before the next fill
+        self.victim = Block()
+
+        return ArraySets(self)
+
+    def lookup(self, index, tag):
+        # Returns the slot of the block, or None on a miss
+        base = index * self.blocks_per_set
+        stop = base + self.blocks_per_set
+        tags = self.tags
+        try:
+            slot = tags.index(tag, base, stop)
+            while not self.valid[slot]:
+                slot = tags.index(tag, slot + 1, stop)
+        except ValueError:
+            return None
+
+        self.ages[slot] = self.clock
+        self.clock += 1
+        return slot
+
+    def fill(self, index, tag, dirty, data):
+        base = index * self.blocks_per_set
+        stop = base + self.blocks_per_set
+
+        # Use an empty way if there is one, otherwise evict the least recently used
+        evicted_block = None
+        slot = self.valid.find(0, base, stop)
+        if slot < 0:
+            ages = self.ages
+            slot = base
+            for way in range(base + 1, stop):
+                if ages[way] < ages[slot]:
+                    slot = way
+
+            evicted_block = self.victim
+            evicted_block.tag = self.tags[slot]
+            evicted_block.valid_bit = True
+            evicted_block.dirty_bit = bool(self.dirty[slot])
+            evicted_block.data = self.data[slot]
+
+        self.tags[slot] = tag
+        self.data[slot] = data
+        self.valid[slot] = 1
+        self.dirty[slot] = dirty
+        self.ages[slot] = self.clock
+        self.clock += 1
+        return evicted_block
+
+    def mark_dirty(self, index, slot):
+        was_clean = not self.dirty[slot]
+        self.dirty[slot] = 1
+        return was_clean
+
+    def clear_sets(self):
+        # Stale tags, data and ages are overwritten by the next fill of their way
+        num_blocks = len(self.valid)
+        self.valid[:] = bytes(num_blocks)
+        self.dirty[:] = bytes(num_blocks)
+        self.clock = 1
+
+    def set_slots(self, index):
+        return ArraySet(self, index).blocks()
+
+    def set_policy_state(self, index):
+        return ()
+
+    def load_set(self, index, blocks, policy_state):
+        # Blocks come least recently used first, so they take ages in order
+        slot = index * self.blocks_per_set
+        for block in blocks:
+            if block is None:
+                continue
+            self.tags[slot] = block.tag
+            self.data[slot] = block.data
+            self.valid[slot] = 1
+            self.dirty[slot] = block.dirty_bit
+            self.ages[slot] = self.clock
+            self.clock += 1
+            slot += 1
+
+
+class ArraySets(object):
+    # Read only view of the arrays as a list of sets, used to render the cache tables
+    def __init__(self, cache):
+        self.cache = cache
+
+    def __getitem__(self, index):
+        if index < 0 or index >= self.cache.total_sets:
+            raise IndexError("set index out of range")
+        return ArraySet(self.cache, index)
+
+    def __len__(self):
+        return self.cache.total_sets
+
+    def __iter__(self):
+        for index in range(self.cache.total_sets):
+            yield ArraySet(self.cache, index)
+
+
+class ArraySet(object):
+    __slots__ = ['cache', 'index']
+
+    def __init__(self, cache, index):
+        self.cache = cache
+        self.index = index
+
+    def slots(self):
+        # Valid ways from least to most recently used, the same order as an LRUSet
+        cache = self.cache
+        base = self.index * cache.blocks_per_set
+        valid_slots = [slot for slot in range(base, base + cache.blocks_per_set) if cache.valid[slot]]
+        return sorted(valid_slots, key=cache.ages.__getitem__)
+
+    def blocks(self):
+        cache = self.cache
+        return [Block(cache.tags[slot], True, bool(cache.dirty[slot]), cache.data[slot]) for slot in self.slots()]
+
+    def get_valid_blocks(self, dirty_required=False):
+        return [block for block in self.blocks() if block.dirty_bit or not dirty_required]
+
+    def as_table_entry(self):
+        block_list = [self.index]
+
+        blocks = self.blocks()
+        for block in blocks:
+            block_list += block.as_table_entry()
+
+        # Fill remaining space with empty blocks
+        for i in range(self.cache.blocks_per_set - len(blocks)):
+            block_list += Block().as_table_entry()
+
+        return block_list
+
+    def __len__(self):
+        return len(self.slots())
@@ -0,0 +1,145 @@
+import numpy
+from memcomponents.access_sequence import read_columns
+from memcomponents.trace_format import BinaryTrace, is_binary_trace
+
+# Batch engine for hit and miss counters. Whole chunks of the trace are decoded with
+# NumPy, grouped by set, and each level only sees the accesses the level above would
+# have sent down: misses for wb+wa, and read misses plus every write for wt+nwa.
+# Timing is not modelled, the counters match LRUCache exactly.
+
+
+class BatchLevel(object):
+    def __init__(self, cache):
+        if cache.replacement_policy != "lru":
+            raise ValueError("The batch engine only supports lru replacement, " + str(cache.name) +
+                             " uses " + str(cache.replacement_policy))
+        self.cache = cache
+        self.ways = cache.blocks_per_set
+        self.offset_bits = cache.num_bits_offset
+        self.index_bits = cache.num_bits_index
+        self.index_mask = (1 << cache.num_bits_index) - 1
+
+        # Direct mapped sets only need the resident tag, wider sets keep an LRU list per
+        # set with the most recently used tag last, like LRUSet
+        if self.ways == 1:
+            self.resident_tags = numpy.zeros(cache.total_sets, numpy.uint64)
+            self.resident_valid = numpy.zeros(cache.total_sets, bool)
+        else:
+            self.stacks = [[] for set_index in range(cache.total_sets)]
+
+    def run(self, is_write, addresses):
+        # Returns which of the accesses hit, in trace order
+        blocks = addresses >> numpy.uint64(self.offset_bits)
+        indexes = (blocks & numpy.uint64(self.index_mask)).astype(numpy.intp)
+        tags = blocks >> numpy.uint64(self.index_bits)
+
+        # Group by set, keeping trace order within each set
+        order = numpy.argsort(indexes, kind='stable')
+        set_indexes = indexes[order]
+        set_tags = tags[order]
+        set_writes = is_write[order]
+
+        # Only reads fill on wt+nwa, every access does on wb+wa
+        fills = numpy.ones(len(order), bool) if self.cache.wb_wa else ~set_writes
+        if self.ways == 1:
+            set_hits = self.run_direct_mapped(set_indexes, set_tags, fills)
+        else:
+            set_hits = self.run_associative(set_indexes, set_tags, fills)
+
+        hits = numpy.empty(len(order), bool)
+        hits[order] = set_hits
+
+        self.cache.num_accesses += len(hits)
+        self.cache.num_hits += int(numpy.count_nonzero(hits))
+        return hits
+
+    def run_direct_mapped(self, set_indexes, set_tags, fills):
+        # The resident tag is whatever the last filling access to the set brought in, so
+        # every access is a hit exactly when it matches the tag of that access
+        n = len(set_indexes)
+        positions = numpy.arange(n)
+        new_run = numpy.ones(n, bool)
+        new_run[1:] = set_indexes[1:] != set_indexes[:-1]
+        run_starts = numpy.maximum.accumulate(numpy.where(new_run, positions, 0))
+
+        last_fill = numpy.maximum.accumulate(numpy.where(fills, positions, -1))
+        prev_fill = numpy.empty(n, numpy.intp)
+        prev_fill[:1] = -1
+        prev_fill[1:] = last_fill[:-1]
+        in_chunk = prev_fill >= run_starts
+
+        resident_tags = numpy.where(in_chunk, set_tags[numpy.maximum(prev_fill, 0)], self.resident_tags[set_indexes])
+        resident_valid = in_chunk | self.resident_valid[set_indexes]
+        hits = resident_valid & (resident_tags == set_tags)
+
+        # Carry the last fill of each set over to the next chunk
+        run_ends = numpy.flatnonzero(numpy.append(new_run[1:], True))
+        filled = last_fill[run_ends] >= run_starts[run_ends]
+        last_fills = last_fill[run_ends][filled]
+        self.resident_tags[set_indexes[last_fills]] = set_tags[last_fills]
+        self.resident_valid[set_indexes[last_fills]] = True
+        return hits
+
+    def run_associative(self, set_indexes, set_tags, fills):
+        ways = self.ways
+        stacks = self.stacks
+        hits = []
+        stack = None
+        prev_index = -1
+        for set_index, tag, fill in zip(set_indexes.tolist(), set_tags.tolist(), fills.tolist()):
+            if set_index != prev_index:
+                stack = stacks[set_index]
+                prev_index = set_index
+            if tag in stack:
+                stack.remove(tag)
+                stack.append(tag)
+                hits.append(True)
+            else:
+                if fill:
+                    stack.append(tag)
+                    if len(stack) > ways:
+                        del stack[0]
+                hits.append(False)
+        return numpy.array(hits, bool)
+
+
+class BatchEngine(object):
+
+    def __init__(self, heirarchy, chunk_len=1 << 20):
+        # Counters are added to the LRUCache objects of the heirarchy so it prints as usual
+        self.heirarchy = heirarchy
+        self.chunk_len = chunk_len
+        self.levels = [BatchLevel(cache) for cache in heirarchy.cache_layers]
+
+    def run(self, modes, addresses):
+        # modes are 0 for reads and 1 for writes
+        modes = numpy.asarray(modes)
+        addresses = numpy.asarray(addresses, numpy.uint64)
+        for start in range(0, len(addresses), self.chunk_len):
+            self.run_chunk(modes[start:start + self.chunk_len], addresses[start:start + self.chunk_len])
+
+    def run_chunk(self, modes, addresses):
+        if self.heirarchy.addr_size < 64 and numpy.any(addresses >> numpy.uint64(self.heirarchy.addr_size)):
+            raise ValueError("Trace has addresses that do not fit in " + str(self.heirarchy.addr_size) + " bits")
+
+        is_write = modes != 0
+        for level in self.levels:
+            if not len(addresses):
+                break
+            hits = level.run(is_write, addresses)
+
+            # Only misses go down on wb+wa, write through also sends every write down
+            sent_down = ~hits if level.cache.wb_wa else ~hits | is_write
+            addresses = addresses[sent_down]
+            is_write = is_write[sent_down]
+
+    def run_trace(self, trace_file):
+        if is_binary_trace(trace_file):
+            with BinaryTrace(trace_file) as trace:
+                modes, addresses, times = trace.as_arrays()
+                self.run(modes, addresses)
+                del modes, addresses, times
+        else:
+            modes, addresses, times = read_columns(trace_file)
+            self.run(numpy.frombuffer(modes, numpy.uint8), numpy.frombuffer(addresses, numpy.uint64))
+        return self.heirarchy
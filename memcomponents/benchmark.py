@@ -0,0 +1,190 @@
+import os
+import sys
+import time
+import random
+import platform
+import multiprocessing
+from memcomponents.utilities import *
+from memcomponents.access_sequence import AccessSequence
+from memcomponents.trace_format import write_binary_trace
+from memcomponents.heirarchy import create_heirarchy
+
+# Throughput benchmarks. Each benchmark runs one heirarchy over one deterministic synthetic
+# trace in a fresh process, so its peak RSS is its own, and times three phases:
+#   parse:    streaming the trace without simulating it
+#   simulate: streaming and simulating, less the parse time
+#   report:   rendering the final results like -d 1 does
+# Results are compared against a saved baseline, slower throughput or more memory than the
+# tolerance allows, or different counters, are regressions.
+
+BENCHMARK_VERSION = 1
+
+# The heirarchies of run_examples.sh
+BENCHMARK_CONFIGS = {
+    "two_level": dict(block_size=64, num_layers=2, sizes=[512, 2048], cycles=[1, 4], associativity=[4, 4],
+                      write_policy="wb+wa", max_misses=5),
+    "three_level": dict(block_size=64, num_layers=3, sizes=[512, 2048, 6500], cycles=[1, 10, 15],
+                        associativity=[1, 2, 4], write_policy="wb+wa", max_misses=0),
+    "seven_level": dict(block_size=64, num_layers=7, sizes=[512, 2048, 6500, 10000, 2000000, 10000000, 4000000],
+                        cycles=[1, 10, 15, 20, 25, 30, 35], associativity=[1, 1, 2, 2, 4, 4, 4],
+                        write_policy="wb+wa", max_misses=10),
+}
+
+
+def synthetic_records(num_accesses, seed=0):
+    # Yields (mode, address, time) with a mix of reuse of recent addresses, sequential
+    # walks and random addresses, the same sequence for the same seed on every platform
+    rand = random.Random(seed)
+    recent = [rand.getrandbits(32) for i in range(4096)]
+    address = recent[0]
+    time = 0
+    for i in range(num_accesses):
+        choice = rand.random()
+        if choice < 0.5:
+            address = recent[rand.getrandbits(12)]
+        elif choice < 0.8:
+            address = (address + 64) & 0xFFFFFFFF
+        else:
+            address = rand.getrandbits(32)
+        recent[i & 4095] = address
+        yield 'w' if rand.random() < 0.3 else 'r', address, time
+        time += 1 + rand.getrandbits(2)
+
+
+def synthetic_trace(trace_dir, num_accesses, seed=0, trace_format="text"):
+    # Returns the path of the trace, only generating it if it is not there already
+    name = "synthetic-" + str(num_accesses) + "-" + str(seed) + (".btrace" if trace_format == "binary" else ".trace")
+    trace_file = os.path.join(trace_dir, name)
+    if os.path.exists(trace_file):
+        return trace_file
+
+    tmp_file = trace_file + ".tmp"
+    if trace_format == "binary":
+        write_binary_trace(tmp_file, synthetic_records(num_accesses, seed))
+    else:
+        with open(tmp_file, 'w') as w_file:
+            lines = []
+            for mode, address, time in synthetic_records(num_accesses, seed):
+                lines.append(mode + " " + str(address) + " " + str(time) + "\n")
+                if len(lines) >= 1 << 16:
+                    w_file.write(''.join(lines))
+                    lines = []
+            w_file.write(''.join(lines))
+    os.replace(tmp_file, trace_file)
+    return trace_file
+
+
+def peak_rss_kb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_benchmark(name, trace_file, config, storage="dict"):
+    heirarchy = create_heirarchy(cache_view=2, storage=storage, **config)
+
+    start_time = time.perf_counter()
+    num_accesses = 0
+    for mem_access in AccessSequence(trace_file):
+        num_accesses += 1
+    parse_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for mem_access in AccessSequence(trace_file):
+        heirarchy.access(mem_access)
+    run_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    report = str(heirarchy)
+    report_seconds = time.perf_counter() - start_time
+
+    simulate_seconds = max(0.0, run_seconds - parse_seconds)
+    total_seconds = run_seconds + report_seconds
+    return {"name": name,
+            "trace": os.path.basename(trace_file),
+            "accesses": num_accesses,
+            "storage": storage,
+            "parse_seconds": parse_seconds,
+            "simulate_seconds": simulate_seconds,
+            "report_seconds": report_seconds,
+            "total_seconds": total_seconds,
+            "accesses_per_second": num_accesses / run_seconds if run_seconds else 0.0,
+            "peak_rss_kb": peak_rss_kb(),
+            "report_bytes": len(report),
+            "counters": [[cache.num_accesses, cache.num_hits] for cache in heirarchy.cache_layers]}
+
+
+def _run_benchmark(job):
+    return run_benchmark(*job)
+
+
+def run_suite(trace_dir, sizes, config_names, repeat=1, seed=0, trace_format="text", storage="dict"):
+    # Runs every config on every trace size, keeping the fastest of repeat runs
+    results = []
+    context = multiprocessing.get_context('fork')
+    for num_accesses in sizes:
+        trace_file = synthetic_trace(trace_dir, num_accesses, seed, trace_format)
+        for config_name in config_names:
+            job = (config_name + "-" + str(num_accesses), trace_file, BENCHMARK_CONFIGS[config_name], storage)
+            best = None
+            for i in range(repeat):
+                # A process per run so the peak RSS belongs to this benchmark alone
+                with context.Pool(1) as pool:
+                    result = pool.apply(_run_benchmark, (job,))
+                if best is None or result["total_seconds"] < best["total_seconds"]:
+                    best = result
+            results.append(best)
+    return {"version": BENCHMARK_VERSION,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "trace_format": trace_format,
+            "results": results}
+
+
+def compare_results(results, baseline, tolerance=0.1):
+    # Returns (rows, regressions) for every benchmark in both runs. A benchmark regresses if
+    # its throughput drops, or its peak RSS grows, by more than tolerance, or its counters change
+    baseline_results = dict((result["name"], result) for result in baseline["results"])
+    rows = []
+    regressions = []
+    for result in results["results"]:
+        base = baseline_results.get(result["name"])
+        if base is None:
+            continue
+
+        speedup = result["accesses_per_second"] / base["accesses_per_second"] if base["accesses_per_second"] else 0.0
+        memory = float(result["peak_rss_kb"]) / base["peak_rss_kb"] if base["peak_rss_kb"] else 0.0
+        problems = []
+        if speedup < 1.0 - tolerance:
+            problems.append("throughput")
+        if memory > 1.0 + tolerance:
+            problems.append("memory")
+        if result["counters"] != base["counters"]:
+            problems.append("counters")
+
+        rows.append([result["name"], int(base["accesses_per_second"]), int(result["accesses_per_second"]),
+                     "{:.2f}x".format(speedup), base["peak_rss_kb"], result["peak_rss_kb"],
+                     ", ".join(problems) or "ok"])
+        if problems:
+            regressions.append((result["name"], problems))
+    return rows, regressions
+
+
+def results_table(results):
+    table = PrettyTable(["Benchmark", "Accesses", "Parse (s)", "Simulate (s)", "Report (s)", "Accesses/s",
+                         "Peak RSS (KB)"])
+    for result in results["results"]:
+        table.add_row([result["name"], result["accesses"], "{:.3f}".format(result["parse_seconds"]),
+                       "{:.3f}".format(result["simulate_seconds"]), "{:.3f}".format(result["report_seconds"]),
+                       int(result["accesses_per_second"]), result["peak_rss_kb"]])
+    return str(table)
+
+
+def comparison_table(rows):
+    table = PrettyTable(["Benchmark", "Baseline Accesses/s", "Accesses/s", "Speedup", "Baseline RSS (KB)",
+                         "RSS (KB)", "Status"])
+    for row in rows:
+        table.add_row(row)
+    return str(table)
@@ -1,7 +1,9 @@
 import csv
 import os
 import collections
+from array import array
 from memcomponents.utilities import *
+from memcomponents.events import HIT, MISS, FILL, EVICT, WRITEBACK
 
 
 class Block(object):
@@ -36,7 +38,10 @@ class LRUCache(object):
                  total_size_bytes, blocks_per_set, latency, wb_wa=True,
                  upper=None,
                  lower=None,
-                 debug=2):
+                 debug=2,
+                 addr_size=32,
+                 set_factory=None,
+                 replacement_policy="lru"):
         self.name = name
         self.latency = latency
         self.block_size_bytes = block_size_bytes
@@ -50,7 +55,35 @@ class LRUCache(object):
         self.num_accesses = 0
         self.num_hits = 0
         self.debug = debug
-        self.sets = [LRUSet(set_index,self.blocks_per_set) for set_index in range(self.total_sets)]
+        self.addr_size = addr_size
+
+        # Position in the heirarchy, the event tracer, the profiling counters and the miss
+        # classifier, set by CacheHeirarchy
+        self.level = 0
+        self.tracer = None
+        self.profile = None
+        self.classifier = None
+
+        # Precompute how addresses split into tag, index and offset for this cache
+        self.geometry = address_geometry(self.total_sets, self.block_size_bytes)
+        self.num_bits_offset = bits_required(self.block_size_bytes)
+        self.num_bits_index = bits_required(self.total_sets)
+        self.num_bits_tag = self.addr_size - (self.num_bits_index + self.num_bits_offset)
+        if self.num_bits_tag < 0:
+            raise ValueError("Cache " + str(self.name) + " needs more than " + str(self.addr_size) + " address bits")
+
+        # Sets are built by set_factory(index, ways), which picks the replacement policy
+        self.set_factory = set_factory or LRUSet
+        self.replacement_policy = replacement_policy
+        self.sets = self.make_sets()
+
+        # Sets holding any block, and the number of dirty blocks in each set holding a dirty
+        # block, kept up to date on fills, evictions and writes for the cache views
+        self.valid_set_indexes = set()
+        self.dirty_set_counts = {}
+
+    def make_sets(self):
+        return [self.set_factory(set_index,self.blocks_per_set) for set_index in range(self.total_sets)]
 
     def set_lower(self, cache):
         self.lower = cache
@@ -59,17 +92,77 @@ class LRUCache(object):
         self.upper = cache
 
     def get_valid_sets(self, dirty_required=False):
-        valid_sets = []
-        for cache_set in self.sets:
-            valid_blocks = cache_set.get_valid_blocks(dirty_required)
-            if valid_blocks:
-                valid_sets.append(cache_set)
-        return valid_sets
+        set_indexes = self.dirty_set_counts if dirty_required else self.valid_set_indexes
+        return [self.sets[index] for index in sorted(set_indexes)]
 
-    def invalidate(self):
+    def reset_counters(self):
         self.num_accesses = 0
         self.num_hits = 0
-        self.sets = [LRUSet(self.blocks_per_set) for i in range(self.total_sets)]
+        if self.profile is not None:
+            self.profile.reset()
+        if self.classifier is not None:
+            self.classifier.reset_counters()
+
+    def invalidate(self):
+        # Empties the sets in place instead of building new ones
+        self.reset_counters()
+        self.clear_sets()
+        if self.classifier is not None:
+            self.classifier.invalidate()
+        self.valid_set_indexes = set()
+        self.dirty_set_counts = {}
+
+    def dump_blocks(self):
+        # The contents of every set holding blocks as columns: the set indexes and slots per set,
+        # then valid, dirty, tag and data for each slot in the order load_set takes them back, and
+        # the replacement state of each set flattened into one array. State values are bit vectors
+        # as wide as the set, so each one is split into 64 bit words
+        set_indexes, counts = array('I'), array('I')
+        valid, dirty, tags, data = bytearray(), bytearray(), array('Q'), array('Q')
+        policy_state = array('Q')
+        state_words = self.state_words()
+        for index in sorted(self.valid_set_indexes):
+            slots = self.set_slots(index)
+            set_indexes.append(index)
+            counts.append(len(slots))
+            for block in slots:
+                valid.append(block is not None)
+                dirty.append(block is not None and block.dirty_bit)
+                tags.append(block.tag if block is not None else 0)
+                data.append(block.data if block is not None else 0)
+            for value in self.set_policy_state(index):
+                for word in range(state_words):
+                    policy_state.append(value >> (64 * word) & 0xFFFFFFFFFFFFFFFF)
+        return set_indexes, counts, valid, dirty, tags, data, policy_state
+
+    def load_blocks(self, set_indexes, counts, valid, dirty, tags, data, policy_state):
+        # Replaces the contents of the cache with columns from dump_blocks, counters are kept
+        self.clear_sets()
+        self.valid_set_indexes = set()
+        self.dirty_set_counts = {}
+
+        state_len = len(policy_state) // len(set_indexes) if len(set_indexes) else 0
+        state_words = self.state_words()
+        slot = 0
+        for n, (index, count) in enumerate(zip(set_indexes, counts)):
+            if index >= self.total_sets or count > self.blocks_per_set:
+                raise ValueError("Set " + str(index) + " with " + str(count) + " blocks does not fit in cache " +
+                                 str(self.name))
+            blocks = [Block(tags[s], True, bool(dirty[s]), data[s]) if valid[s] else None
+                      for s in range(slot, slot + count)]
+            words = policy_state[n * state_len:(n + 1) * state_len]
+            self.load_set(index, blocks, tuple(sum(words[start + word] << (64 * word) for word in range(state_words))
+                                               for start in range(0, state_len, state_words)))
+
+            self.valid_set_indexes.add(index)
+            dirty_count = sum(dirty[slot:slot + count])
+            if dirty_count:
+                self.dirty_set_counts[index] = dirty_count
+            slot += count
+
+    def state_words(self):
+        # 64 bit words per replacement state value in dump_blocks
+        return (self.blocks_per_set + 63) >> 6
 
     def access(self, mem_access):
 
@@ -79,30 +172,61 @@ class LRUCache(object):
         # Add our latency
         mem_access.add_time(self.latency)
 
-        # Parse the address to get our set index
-        tag, index, offset = mem_access.parse_address(self.total_sets, self.block_size_bytes)
+        # Split the address to get our set index
+        tag, index = mem_access.decode(self.geometry)
+
+        # Attempt to access the block we need, note on hit it will become the most recently used
+        block = self.lookup(index, tag)
 
-        # Get the set we are interested in
-        found_set = self.sets[index]
+        tracer = self.tracer
+        tracing = tracer is not None and tracer.active
+        if tracing:
+            tracer.record(HIT if block is not None else MISS, self.level, mem_access.mode == 'w', mem_access.num,
+                          index, tag)
 
-        # Attempt to access the block we need, note on hit it will be moved to the front
-        block = found_set.__getitem__(tag)
+        profile = self.profile
+        if profile is not None:
+            profile.set_accesses[index] += 1
+            if block is None:
+                profile.set_misses[index] += 1
+            profile.outcomes[(mem_access.mode == 'w') << 1 | (block is None)] += 1
+
+        if self.classifier is not None:
+            self.classifier.access(mem_access.address, block is None, mem_access.mode == 'r' or self.wb_wa)
 
         # A null block is the equivalent of valid_bit = 0
-        if not is_hit(block):
+        if block is None:
 
             # Load from lower level on read miss or write miss and
             # write allocate. If we miss on wt_nwa write, we do nothing
             if mem_access.mode == 'r' or self.wb_wa:
                 # Simulate load for cache miss
-                block = self.simulate_load_from(tag, mem_access)
+                self.simulate_load_from(tag, mem_access)
+
+                # Bring the block in and get the evicted block if any
+                evicted_block = self.fill(index, tag, mem_access.mode == 'w', mem_access.address)
 
-                # Get evicted block if any
-                evicted_block = found_set.__setitem__(tag, block)
+                # Keep the valid and dirty set indexes up to date
+                self.valid_set_indexes.add(index)
+                dirty_change = (mem_access.mode == 'w') - bool(evicted_block and evicted_block.dirty_bit)
+                if dirty_change:
+                    self.count_dirty(index, dirty_change)
+
+                if tracing:
+                    tracer.record(FILL, self.level, mem_access.mode == 'w', mem_access.num, index, tag)
+                    if evicted_block:
+                        tracer.record(EVICT, self.level, evicted_block.dirty_bit, mem_access.num, index,
+                                      evicted_block.tag)
+                if profile is not None and evicted_block and evicted_block.dirty_bit:
+                    profile.dirty_evictions += 1
 
                 # Write straight to memory if using write back #TODO: do we need to account for latency here?
                 if self.wb_wa and evicted_block and evicted_block.dirty_bit:
-                    mem_access.add_time(self.get_memory_latency())
+                    writeback_latency = self.get_memory_latency()
+                    mem_access.add_time(writeback_latency)
+                    if tracing:
+                        tracer.record(WRITEBACK, self.level, 0, mem_access.num, index, evicted_block.tag,
+                                      writeback_latency)
 
             # Write miss for write through - we still need to check other levels
             else:
@@ -114,14 +238,73 @@ class LRUCache(object):
 
             # It is a write operation and write through policy
             if mem_access.mode == 'w':
-                block.dirty_bit = True
+                if self.mark_dirty(index, block):
+                    self.count_dirty(index, 1)
 
                 # If doing write through we need to write diry at all layers
                 if not self.wb_wa:
                     self.simulate_store_to(mem_access)
 
-        # Update our sets
-        self.sets[index] = found_set
+    def warm(self, mem_access):
+        # Functional warm up: the same changes to the cache contents as access, without
+        # counting, timing or events
+        tag, index = mem_access.decode(self.geometry)
+        block = self.lookup(index, tag)
+
+        if block is None:
+            if mem_access.mode == 'r' or self.wb_wa:
+                if self.lower:
+                    self.lower.warm(mem_access)
+                evicted_block = self.fill(index, tag, mem_access.mode == 'w', mem_access.address)
+                self.valid_set_indexes.add(index)
+                dirty_change = (mem_access.mode == 'w') - bool(evicted_block and evicted_block.dirty_bit)
+                if dirty_change:
+                    self.count_dirty(index, dirty_change)
+            elif self.lower:
+                self.lower.warm(mem_access)
+
+        elif mem_access.mode == 'w':
+            if self.mark_dirty(index, block):
+                self.count_dirty(index, 1)
+            if not self.wb_wa and self.lower:
+                self.lower.warm(mem_access)
+
+    # Storage primitives, overridden by other storage engines
+    def lookup(self, index, tag):
+        # Returns a handle to the block, or None on a miss
+        block = self.sets[index][tag]
+        return block if is_hit(block) else None
+
+    def fill(self, index, tag, dirty, data):
+        # Returns the evicted block if there was one
+        return self.sets[index].__setitem__(tag, Block(tag, True, dirty, data))
+
+    def mark_dirty(self, index, block):
+        # Returns whether the block was clean before
+        was_clean = not block.dirty_bit
+        block.dirty_bit = True
+        return was_clean
+
+    def clear_sets(self):
+        # Only the sets holding blocks need to be emptied
+        for index in self.valid_set_indexes:
+            self.sets[index].clear()
+
+    def set_slots(self, index):
+        return self.sets[index].slots()
+
+    def set_policy_state(self, index):
+        return self.sets[index].policy_state()
+
+    def load_set(self, index, blocks, policy_state):
+        self.sets[index].load(blocks, policy_state)
+
+    def count_dirty(self, index, change):
+        count = self.dirty_set_counts.get(index, 0) + change
+        if count:
+            self.dirty_set_counts[index] = count
+        else:
+            del self.dirty_set_counts[index]
 
     def simulate_store_to(self, mem_access):
         # If we are not the bottom layer, continue to propagate down
@@ -129,7 +312,9 @@ class LRUCache(object):
             self.lower.access(mem_access)
         # If write-through and we have reached the bottom, write to memory
         else:
-            mem_access.add_time(self.latency + 100)
+            mem_access.add_time(self.memory_latency())
+            if self.profile is not None:
+                self.profile.memory_writes += 1
 
     def simulate_load_from(self, tag, mem_access):
         # We are the last level so simulate access, by adding 100 to our time
@@ -138,19 +323,22 @@ class LRUCache(object):
             self.lower.access(mem_access)
         else:
             # if mem_access.mode == 'r': #TODO: This adds latency for wa
-            mem_access.add_time(self.latency + 100)
-
-        # Create new block to bring into memory, simulating from the
-        return Block(tag, True, mem_access.mode == 'w', mem_access.address)
+            mem_access.add_time(self.memory_latency())
+            if self.profile is not None:
+                self.profile.memory_reads += 1
 
     def get_memory_latency(self):
-        # Find the last level of cache
+        # Find the last level of cache, or what stands in for the levels below
         level = self
         while level.lower:
             level = level.lower
 
-        # Return the last level + 100
-        return level.latency + 100
+        # Return its latency to memory
+        return level.memory_latency()
+
+    def memory_latency(self):
+        # Memory adds 100 cycles to the last level
+        return self.latency + 100
 
     def hit_rate(self):
         try:
@@ -161,17 +349,41 @@ class LRUCache(object):
     def miss_rate(self):
         return 1.0 - self.hit_rate()
 
+    def stats(self):
+        # The numbers in stat_string as plain values
+        stats = {"name": self.name,
+                 "latency": self.latency,
+                 "size_bytes": self.total_size_bytes,
+                 "block_size": self.block_size_bytes,
+                 "ways": self.blocks_per_set,
+                 "policy": self.replacement_policy,
+                 "accesses": self.num_accesses,
+                 "hits": self.num_hits,
+                 "misses": self.num_accesses - self.num_hits,
+                 "hit_rate": self.hit_rate(),
+                 "miss_rate": self.miss_rate()}
+        if self.classifier is not None:
+            stats.update(self.classifier.breakdown())
+        return stats
+
     def stat_string(self):
-        return " *** Cache: " + str(self.name) + " ***\n" \
+        stat_str = " *** Cache: " + str(self.name) + " ***\n" \
                " -- Latency: " + str(self.latency) + \
                " -- Cache Size (KB): " + str(self.total_size_bytes / 1000) + \
                " -- Block Size (B): " + str(self.block_size_bytes) + \
-               " -- Ways: " + str(self.blocks_per_set) + "\n" \
+               " -- Ways: " + str(self.blocks_per_set) + \
+               " -- Policy: " + str(self.replacement_policy).upper() + "\n" \
                " -- Accesses: " + str(self.num_accesses) + \
                " -- Hits: " + str(self.num_hits) + \
                " -- Misses: " + str(self.num_accesses - self.num_hits) + \
                " -- Hit Rate: " + str(int(self.hit_rate() * 100)) + "%" + \
                " -- Miss Rate: " + str(int(self.miss_rate() * 100)) + "%\n"
+        if self.classifier is not None:
+            num_misses = self.num_accesses - self.num_hits
+            stat_str += ''.join(" -- " + name.capitalize() + ": " + str(count) + " (" +
+                                str(int(float(count) / num_misses * 100) if num_misses else 0) + "%)"
+                                for name, count in self.classifier.breakdown().items()) + "\n"
+        return stat_str
 
     # Print out our cache table
     def __repr__(self):
@@ -236,6 +448,19 @@ class LRUSet(collections.OrderedDict):
     def is_full(self):
         return len(self) > self.maxsize
 
+    def slots(self):
+        # Blocks from least to most recently used
+        return list(self.values())
+
+    def policy_state(self):
+        # The order of the blocks is the whole replacement state
+        return ()
+
+    def load(self, blocks, policy_state):
+        self.clear()
+        for block in blocks:
+            super().__setitem__(block.tag, block)
+
     def get_valid_blocks(self, dirty_required=False):
         valid_blocks = []
 
@@ -0,0 +1,142 @@
+import os
+import json
+import struct
+import sys
+from array import array
+from memcomponents.replacement import RandomSet
+
+# Checkpoint layout (all little endian):
+#   header:   magic (8s) | version (H) | reserved (H) | metadata length (I)
+#   metadata: JSON with the heirarchy geometry, counters, outstanding accesses, the trace
+#             position and the byte length of every column
+#   columns:  for each level, the columns of LRUCache.dump_blocks in order
+# Block contents are kept as flat arrays rather than objects so a checkpoint of a large
+# heirarchy is written and read back in a few bulk copies. Outstanding accesses are kept
+# as their finish time and order, all the miss buffer needs of them. Version 1 kept every
+# field of the access, it is still read.
+CHECKPOINT_MAGIC = b'C1541CKP'
+CHECKPOINT_VERSION = 2
+READABLE_VERSIONS = (1, 2)
+HEADER_FORMAT = '<8sHHI'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# Typecodes of the dump_blocks columns, bytearrays are 'B'
+COLUMN_TYPES = ('I', 'I', 'B', 'B', 'Q', 'Q', 'Q')
+
+# The parts of each level a checkpoint has to agree with to be restored into it
+GEOMETRY_KEYS = ("block_size", "size_bytes", "ways", "wb_wa", "policy")
+
+
+def level_geometry(cache):
+    return {"block_size": cache.block_size_bytes,
+            "size_bytes": cache.total_size_bytes,
+            "ways": cache.blocks_per_set,
+            "wb_wa": cache.wb_wa,
+            "policy": cache.replacement_policy}
+
+
+def save_checkpoint(heirarchy, checkpoint_file, position):
+    # position is the number of trace accesses already simulated, where a restored run resumes
+    levels = []
+    columns = []
+    for cache in heirarchy.cache_layers:
+        level = level_geometry(cache)
+        level.update(name=cache.name, latency=cache.latency, accesses=cache.num_accesses, hits=cache.num_hits)
+
+        # Random sets of a cache share one generator, its state decides the next victims
+        first_set = cache.sets[0] if cache.total_sets else None
+        if isinstance(first_set, RandomSet):
+            level["random_state"] = first_set.rand.getstate()
+
+        level_columns = list(cache.dump_blocks())
+        level["column_bytes"] = [memoryview(column).nbytes for column in level_columns]
+        levels.append(level)
+        columns.extend(level_columns)
+
+    metadata = {"position": position,
+                "addr_size": heirarchy.addr_size,
+                "miss_limit": heirarchy.miss_limit,
+                "num_buffered": heirarchy.num_buffered,
+                "num_stalls": heirarchy.num_stalls,
+                "stall_cycles": heirarchy.stall_cycles,
+                "peak_occupancy": heirarchy.peak_occupancy,
+                "access_buffer": [[finish, order] for finish, order, mem_access in heirarchy.access_buffer],
+                "levels": levels}
+    encoded = json.dumps(metadata).encode('utf-8')
+
+    # Write next to the target and move it in place, so a crash never leaves half a checkpoint
+    tmp_file = str(checkpoint_file) + ".tmp"
+    with open(tmp_file, 'wb') as c_file:
+        c_file.write(struct.pack(HEADER_FORMAT, CHECKPOINT_MAGIC, CHECKPOINT_VERSION, 0, len(encoded)))
+        c_file.write(encoded)
+        for column in columns:
+            if isinstance(column, array) and sys.byteorder != 'little':
+                column.byteswap()
+            c_file.write(column)
+    os.replace(tmp_file, checkpoint_file)
+
+
+def read_checkpoint(checkpoint_file):
+    # Returns the metadata and the dump_blocks columns of each level
+    with open(checkpoint_file, 'rb') as c_file:
+        contents = c_file.read()
+    if len(contents) < HEADER_SIZE:
+        raise ValueError("Checkpoint " + str(checkpoint_file) + " has a truncated header")
+
+    magic, version, _, metadata_len = struct.unpack_from(HEADER_FORMAT, contents)
+    if magic != CHECKPOINT_MAGIC or version not in READABLE_VERSIONS:
+        raise ValueError("File " + str(checkpoint_file) + " is not a version " + str(CHECKPOINT_VERSION) +
+                         " checkpoint")
+    metadata = json.loads(contents[HEADER_SIZE:HEADER_SIZE + metadata_len].decode('utf-8'))
+
+    view = memoryview(contents)
+    offset = HEADER_SIZE + metadata_len
+    level_columns = []
+    for level in metadata["levels"]:
+        columns = []
+        for typecode, num_bytes in zip(COLUMN_TYPES, level["column_bytes"]):
+            if offset + num_bytes > len(contents):
+                raise ValueError("Checkpoint " + str(checkpoint_file) + " is truncated")
+            column = array(typecode, view[offset:offset + num_bytes].tobytes())
+            if sys.byteorder != 'little':
+                column.byteswap()
+            columns.append(column)
+            offset += num_bytes
+        level_columns.append(columns)
+    return metadata, level_columns
+
+
+def restore_checkpoint(heirarchy, checkpoint_file):
+    # Loads a checkpoint into a heirarchy with the same geometry and returns the trace position
+    # to resume from. Latencies, the miss limit and the storage engine may differ
+    metadata, level_columns = read_checkpoint(checkpoint_file)
+
+    levels = metadata["levels"]
+    if metadata["addr_size"] != heirarchy.addr_size or len(levels) != heirarchy.num_layers():
+        raise ValueError("Checkpoint " + str(checkpoint_file) + " has " + str(len(levels)) + " levels of " +
+                         str(metadata["addr_size"]) + " bit addresses, the heirarchy has " +
+                         str(heirarchy.num_layers()) + " levels of " + str(heirarchy.addr_size))
+    for cache, level in zip(heirarchy.cache_layers, levels):
+        geometry = level_geometry(cache)
+        for key in GEOMETRY_KEYS:
+            if geometry[key] != level[key]:
+                raise ValueError("Checkpoint level " + str(level["name"]) + " has " + key + " " + str(level[key]) +
+                                 ", cache " + str(cache.name) + " has " + str(geometry[key]))
+
+    for cache, level, columns in zip(heirarchy.cache_layers, levels, level_columns):
+        cache.load_blocks(*columns)
+        cache.num_accesses = level["accesses"]
+        cache.num_hits = level["hits"]
+        if "random_state" in level:
+            version, internal_state, gauss_next = level["random_state"]
+            cache.sets[0].rand.setstate((version, tuple(internal_state), gauss_next))
+
+    # Saved in heap order
+    heirarchy.access_buffer = [(entry[0], entry[1], None) for entry in metadata["access_buffer"]]
+    heirarchy.num_buffered = metadata["num_buffered"]
+    heirarchy.num_stalls = metadata["num_stalls"]
+    heirarchy.stall_cycles = metadata["stall_cycles"]
+    heirarchy.peak_occupancy = metadata["peak_occupancy"]
+    heirarchy.last_access = None
+
+    return metadata["position"]
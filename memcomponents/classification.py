@@ -0,0 +1,53 @@
+import collections
+
+# Miss classification into the three Cs, off unless a MissClassifier is attached to each
+# cache with CacheHeirarchy.set_miss_classification. Every access a level sees also goes
+# to two shadow caches with the same allocation policy as the level:
+#   an infinite cache, the set of blocks ever brought in
+#   a fully associative LRU cache with as many blocks as the level
+# A miss of the level is compulsory if the infinite cache misses, capacity if only the
+# fully associative cache misses, and conflict if the fully associative cache hits.
+#
+# The fully associative cache only needs to know if a block is among the most recent
+# total_blocks brought in, so it is an OrderedDict kept in LRU order, O(1) per access.
+MISS_CLASSES = ("compulsory", "capacity", "conflict")
+COMPULSORY, CAPACITY, CONFLICT = range(len(MISS_CLASSES))
+
+
+class MissClassifier(object):
+
+    def __init__(self, total_blocks, num_bits_offset):
+        self.total_blocks = total_blocks
+        self.num_bits_offset = num_bits_offset
+        self.seen = set()
+        self.shadow = collections.OrderedDict()
+        self.counts = [0] * len(MISS_CLASSES)
+
+    def access(self, address, miss, allocate):
+        # Update the shadow caches with an access, classifying it if the level missed
+        block = address >> self.num_bits_offset
+        shadow = self.shadow
+        if block in shadow:
+            shadow.move_to_end(block)
+            if miss:
+                self.counts[CONFLICT] += 1
+            return
+
+        if miss:
+            self.counts[CAPACITY if block in self.seen else COMPULSORY] += 1
+        if allocate:
+            self.seen.add(block)
+            shadow[block] = None
+            if len(shadow) > self.total_blocks:
+                shadow.popitem(last=False)
+
+    def reset_counters(self):
+        self.counts = [0] * len(MISS_CLASSES)
+
+    def invalidate(self):
+        self.seen = set()
+        self.shadow = collections.OrderedDict()
+        self.reset_counters()
+
+    def breakdown(self):
+        return dict(zip(MISS_CLASSES, self.counts))
@@ -0,0 +1,105 @@
+import struct
+
+# Per access event stream written while the simulation runs. Events are buffered as tuples
+# of (kind, level, flags, access num, a, b, c) and written out in batches, either as JSON
+# lines or as fixed width binary records.
+#
+#   kind       level         flags      a              b             c
+#   access     -             is write   address        serve time    finish time
+#   hit        cache level   is write   set index      tag           -
+#   miss       cache level   is write   set index      tag           -
+#   fill       cache level   is dirty   set index      tag           -
+#   evict      cache level   is dirty   set index      evicted tag   -
+#   writeback  cache level   -          set index      evicted tag   cycles added
+#
+# Binary files start with EVENT_MAGIC, a version and the record size, followed by records
+# packed as RECORD_FORMAT with kind as its index in EVENT_KINDS.
+EVENT_KINDS = ("access", "hit", "miss", "fill", "evict", "writeback")
+ACCESS, HIT, MISS, FILL, EVICT, WRITEBACK = range(len(EVENT_KINDS))
+
+EVENT_MAGIC = b'C1541EVT'
+EVENT_VERSION = 1
+HEADER_FORMAT = '<8sHH'
+RECORD_FORMAT = '<BBBQQQQ'
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+
+JSON_TEMPLATES = (
+    '{"event":"access","access":%d,"mode":"%s","address":%d,"serve_time":%d,"finish_time":%d}\n',
+    '{"event":"hit","level":%d,"access":%d,"mode":"%s","set":%d,"tag":%d}\n',
+    '{"event":"miss","level":%d,"access":%d,"mode":"%s","set":%d,"tag":%d}\n',
+    '{"event":"fill","level":%d,"access":%d,"dirty":%s,"set":%d,"tag":%d}\n',
+    '{"event":"evict","level":%d,"access":%d,"dirty":%s,"set":%d,"tag":%d}\n',
+    '{"event":"writeback","level":%d,"access":%d,"set":%d,"tag":%d,"cycles":%d}\n',
+)
+
+
+class EventTracer(object):
+
+    def __init__(self, out_file, event_format="jsonl", every=1, window=None, buffer_len=1 << 14):
+        # Only every Nth access inside the [start, stop) window of access numbers is traced
+        self.event_format = event_format
+        self.every = every
+        self.window_start, self.window_stop = window if window else (0, None)
+        self.buffer_len = buffer_len
+        self.buffer = []
+        self.active = False
+        self.num_events = 0
+
+        if event_format == "binary":
+            self.out = open(out_file, 'wb')
+            self.out.write(struct.pack(HEADER_FORMAT, EVENT_MAGIC, EVENT_VERSION, RECORD_SIZE))
+        elif event_format == "jsonl":
+            self.out = open(out_file, 'w')
+        else:
+            raise ValueError("Event format must be jsonl or binary, not " + str(event_format))
+
+    def begin(self, mem_access):
+        # Decide once per access whether its events are recorded
+        num = mem_access.num
+        self.active = num >= self.window_start and (self.window_stop is None or num < self.window_stop) \
+            and (num - self.window_start) % self.every == 0
+        return self.active
+
+    def record(self, kind, level, flags, num, a, b, c=0):
+        self.buffer.append((kind, level, flags, num, a, b, c))
+        if len(self.buffer) >= self.buffer_len:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        self.num_events += len(self.buffer)
+        if self.event_format == "binary":
+            pack = struct.Struct(RECORD_FORMAT).pack
+            self.out.write(b''.join([pack(kind, level, flags, num, a, b, c)
+                                     for kind, level, flags, num, a, b, c in self.buffer]))
+        else:
+            self.out.write(''.join([self.format_json(*event) for event in self.buffer]))
+        self.buffer = []
+
+    def format_json(self, kind, level, flags, num, a, b, c):
+        template = JSON_TEMPLATES[kind]
+        if kind == ACCESS:
+            return template % (num, 'w' if flags else 'r', a, b, c)
+        if kind == HIT or kind == MISS:
+            return template % (level, num, 'w' if flags else 'r', a, b)
+        if kind == FILL or kind == EVICT:
+            return template % (level, num, 'true' if flags else 'false', a, b)
+        return template % (level, num, a, b, c)
+
+    def close(self):
+        self.flush()
+        self.out.close()
+
+
+def read_binary_events(event_file):
+    # Yields (kind name, level, flags, access num, a, b, c) from a binary event stream
+    with open(event_file, 'rb') as e_file:
+        magic, version, record_size = struct.unpack(HEADER_FORMAT, e_file.read(struct.calcsize(HEADER_FORMAT)))
+        if magic != EVENT_MAGIC or version != EVENT_VERSION or record_size != RECORD_SIZE:
+            raise ValueError("File " + str(event_file) + " is not a version " + str(EVENT_VERSION) + " event stream")
+        chunk = e_file.read(RECORD_SIZE << 16)
+        while chunk:
+            for record in struct.iter_unpack(RECORD_FORMAT, chunk):
+                yield (EVENT_KINDS[record[0]],) + record[1:]
+            chunk = e_file.read(RECORD_SIZE << 16)
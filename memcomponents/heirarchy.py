@@ -1,19 +1,85 @@
+import heapq
 from memcomponents.cache import LRUCache
+from memcomponents.array_cache import ArrayLRUCache
+from memcomponents.replacement import REPLACEMENT_POLICIES, set_factory
 from memcomponents.utilities import *
+from memcomponents.events import ACCESS
+from memcomponents.profiling import LevelProfile
+from memcomponents.classification import MissClassifier
+from memcomponents.invariants import InvariantChecker
 
 
 class CacheHeirarchy(object):
-    def __init__(self, outstanding_misses=0):
+    def __init__(self, outstanding_misses=0, addr_size=32):
         self.last_access = None
+        self.addr_size = addr_size
         self.miss_limit = outstanding_misses
         self.cache_layers = []
+        # Outstanding accesses as a heap of (finish time, order, access). Replayed miss
+        # streams and restored checkpoints only keep the finish times and leave the access None
         self.access_buffer = []
+        self.num_buffered = 0
+        self.num_stalls = 0
+        self.stall_cycles = 0
+        self.peak_occupancy = 0
+        self.tracer = None
+        self.profiling = False
+        self.classifying = False
+        self.checker = None
+
+    def set_tracer(self, tracer):
+        # Stream structured events for every level, None turns tracing off
+        self.tracer = tracer
+        for cache_layer in self.cache_layers:
+            cache_layer.tracer = tracer
 
-    def invalidate(self):
+    def set_profiling(self, enabled=True):
+        # Attach fresh profiling counters to every level, or detach them
+        self.profiling = enabled
+        for cache_layer in self.cache_layers:
+            cache_layer.profile = LevelProfile(cache_layer.total_sets) if enabled else None
+
+    def set_miss_classification(self, enabled=True):
+        # Classify the misses of every level as compulsory, capacity or conflict from here on
+        self.classifying = enabled
+        for cache_layer in self.cache_layers:
+            cache_layer.classifier = MissClassifier(cache_layer.total_blocks, cache_layer.num_bits_offset) \
+                if enabled else None
+
+    def set_invariant_checking(self, enabled=True, inclusion=False):
+        # Check every access against shadow copies of the levels, starting from empty caches.
+        # The checker takes the place of the tracer and passes its events on
+        if self.checker is not None:
+            self.set_tracer(self.checker.tracer)
+            self.checker = None
+        if enabled:
+            self.checker = InvariantChecker(self, inclusion, self.tracer)
+            self.set_tracer(self.checker)
+
+    def reset_counters(self):
+        # Zero the counters but keep the cache contents, e.g. to measure after warming up
+        self.num_stalls = 0
+        self.stall_cycles = 0
+        self.peak_occupancy = len(self.access_buffer)
+        for cache_layer in self.cache_layers:
+            cache_layer.reset_counters()
+
+    def clear_buffer(self):
+        # Forget the outstanding accesses but keep the cache contents, for a new run whose
+        # arrival times start over
         self.access_buffer = []
+        self.num_buffered = 0
+        self.peak_occupancy = 0
         self.last_access = None
+
+    def invalidate(self):
+        self.clear_buffer()
+        self.num_stalls = 0
+        self.stall_cycles = 0
         for cache_layer in self.cache_layers:
             cache_layer.invalidate()
+        if self.checker is not None:
+            self.checker.invalidate()
 
     def add_cache(self, new_cache):
         prev_cache = self.cache_layers[-1] if self.cache_layers else None
@@ -21,53 +87,88 @@ class CacheHeirarchy(object):
             prev_cache.set_lower(new_cache)
 
         new_cache.set_upper(prev_cache)
+        new_cache.level = len(self.cache_layers)
+        new_cache.tracer = self.tracer
+        new_cache.profile = LevelProfile(new_cache.total_sets) if self.profiling else None
+        new_cache.classifier = MissClassifier(new_cache.total_blocks, new_cache.num_bits_offset) \
+            if self.classifying else None
         self.cache_layers.append(new_cache)
 
     def access(self, mem_access):
 
         if self.num_layers() > 0:
+            # Wider addresses would silently alias onto the wrong tags
+            if mem_access.address >> self.addr_size:
+                raise ValueError("Address " + str(mem_access.address) + " of instruction " + str(mem_access.num) +
+                                 " does not fit in " + str(self.addr_size) + " bits")
+
+            tracer = self.tracer
+            if tracer is not None:
+                tracer.begin(mem_access)
+
             # Adjust the serve time of the access
             mem_access = self.adjust_serve_time(mem_access)
 
             # Perform the access. Note this will set the finish time
             self.cache_layers[0].access(mem_access)
 
-            # Add the access to our buffer
-            self.access_buffer.append(mem_access)
+            # Add the access to our buffer, its finish time is now fixed
+            self.buffer_access(mem_access.finish_time(), mem_access)
+
+            if tracer is not None and tracer.active:
+                tracer.record(ACCESS, 0, mem_access.mode == 'w', mem_access.num, mem_access.address,
+                              mem_access.serve_time, mem_access.finish_time())
         else:
-            show_error_and_exit("Cache Heirarchy Is Empty! Cannot perform " + str(mem_access))
+            raise ValueError("Cache Heirarchy Is Empty! Cannot perform " + str(mem_access))
 
-    def adjust_serve_time(self, mem_access):
+    def warm(self, mem_access):
+        # Bring the caches to the state the access leaves them in, nothing is counted or timed
+        self.cache_layers[0].warm(mem_access)
 
-        min_finish_access = None
-        for pending_access in self.access_buffer:
+    def adjust_serve_time(self, mem_access):
+        mem_access.set_serve_time(self.next_serve_time(mem_access.arrival_time))
+        return mem_access
 
-            # If an instruction has completed before this access, remove it
-            if pending_access.finish_time() < mem_access.arrival_time:
-                self.access_buffer.remove(pending_access)
+    def next_serve_time(self, arrival_time):
+        access_buffer = self.access_buffer
 
-            # Calculate our minimum access in case we need it
-            elif not min_finish_access or pending_access.finish_time() < min_finish_access.finish_time():
-                min_finish_access = pending_access
+        # Retire every pending access that completed before this access arrived
+        while access_buffer and access_buffer[0][0] < arrival_time:
+            heapq.heappop(access_buffer)
 
         # If our buffer is at max capacity we need to simulate the minimum access finishing by
         # starting our current access at the minimum pending access's finish time + 1
-        if self.access_buffer and min_finish_access and \
-                len(self.access_buffer) >= self.miss_limit:
+        if access_buffer and len(access_buffer) >= self.miss_limit:
             # The new access should start one second after the pending access
-            # that is scheduled to finish first in the buffer
-            mem_access.set_serve_time(min_finish_access.finish_time() + 1)
+            # that is scheduled to finish first in the buffer, which leaves the buffer.
+            # Whatever is left finishes at or after the arrival, so a stall always waits
+            serve_time = heapq.heappop(access_buffer)[0] + 1
 
-            # Remove the pending access from the buffer
-            self.access_buffer.remove(min_finish_access)
+            self.num_stalls += 1
+            self.stall_cycles += serve_time - arrival_time
+            return serve_time
 
-        return mem_access
+        return arrival_time
+
+    def buffer_access(self, finish_time, mem_access):
+        heapq.heappush(self.access_buffer, (finish_time, self.num_buffered, mem_access))
+        self.num_buffered += 1
+        if len(self.access_buffer) > self.peak_occupancy:
+            self.peak_occupancy = len(self.access_buffer)
+
+    def stat_string(self):
+        return " *** Outstanding Misses ***\n" \
+               " -- Limit: " + str(self.miss_limit) + \
+               " -- Peak Occupancy: " + str(self.peak_occupancy) + \
+               " -- Stalled Accesses: " + str(self.num_stalls) + \
+               " -- Stall Cycles: " + str(self.stall_cycles) + "\n"
 
     def num_layers(self):
         return len(self.cache_layers)
 
     def __repr__(self):
         heirarchy_str = "<<<<<<<<<<< Heirarchy Snapshot >>>>>>>>>>>\n\n"
+        heirarchy_str += self.stat_string() + "\n"
 
         for cache in self.cache_layers:
             heirarchy_str += str(cache)
@@ -78,18 +179,32 @@ class CacheHeirarchy(object):
         return heirarchy_str
 
 
-def create_heirarchy(block_size, num_layers, sizes, cycles, associativity, write_policy, max_misses,cache_view=2):
+# Set storage engines, dict keeps an OrderedDict of Blocks per set and array keeps flat arrays
+STORAGE_ENGINES = {"dict": LRUCache, "array": ArrayLRUCache}
+
+
+def create_heirarchy(block_size, num_layers, sizes, cycles, associativity, write_policy, max_misses,cache_view=2,
+                     addr_size=32, storage="dict", replacement_policy="lru", seed=0):
     # Init heirarchy
-    heirarchy = CacheHeirarchy(max_misses)
+    heirarchy = CacheHeirarchy(max_misses, addr_size)
+    cache_class = STORAGE_ENGINES[storage]
+
+    # One replacement policy for every level, or one per level
+    policies = replacement_policy if isinstance(replacement_policy, list) else [replacement_policy] * num_layers
+    if cache_class is not LRUCache and any(policy != "lru" for policy in policies):
+        raise ValueError("The " + storage + " storage engine only supports lru replacement")
 
     # Create the new cache
     for i in range(num_layers):
-        new_cache = LRUCache(name="L" + str(i),
+        new_cache = cache_class(name="L" + str(i),
                              block_size_bytes=block_size,
                              total_size_bytes=adjust_to_standard_size(sizes[i]),
                              blocks_per_set=associativity[i],
                              latency=cycles[i],
                              wb_wa=(write_policy == "wb+wa"),
-                             debug=cache_view)
+                             debug=cache_view,
+                             addr_size=addr_size,
+                             set_factory=set_factory(policies[i], seed + i),
+                             replacement_policy=policies[i])
         heirarchy.add_cache(new_cache)
     return heirarchy
@@ -0,0 +1,217 @@
+from collections import OrderedDict
+from memcomponents.events import ACCESS, HIT, MISS, FILL, EVICT, WRITEBACK
+
+# Checks a heirarchy against shadow copies of its levels while it runs. The checker stands
+# in for the event tracer and keeps, for every level, the tags of each set in replacement
+# order with their dirty bits, updated from the hit, miss, fill and evict events of every
+# access. Each event is checked in O(1):
+#   - a hit finds its block in the shadow set and a miss does not
+#   - a fill never duplicates a block and only overfills a full set, the eviction that
+#     follows empties it again
+#   - an eviction removes a block that is there, with the dirty bit the shadow has, and
+#     under lru or fifo the block that was used or brought in longest ago
+#   - every dirty eviction from a write back level is written back and nothing else is
+#   - with inclusion, a block filled into a level is in the level below, and a block
+#     evicted from a level is in none of the levels above once the access is done
+# After each access the sets it touched are compared to the valid and dirty set
+# bookkeeping of the caches, and the counters of the levels it reached to its events.
+# Checking starts from empty caches, changes that produce no events, warming up or
+# restoring a checkpoint, would be reported as broken invariants.
+ORDERED_POLICIES = ("lru", "fifo")
+
+
+class LevelShadow(object):
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.ways = cache.blocks_per_set
+        self.num_bits_index = cache.num_bits_index
+        self.index_mask = (1 << cache.num_bits_index) - 1
+        # Under lru hits move a block to the back, under fifo only fills do
+        self.ordered = cache.replacement_policy in ORDERED_POLICIES
+        self.recency = cache.replacement_policy == "lru"
+        # Set index -> OrderedDict of tag -> dirty, and set index -> number of dirty blocks
+        self.sets = {}
+        self.dirty_counts = {}
+        # Counters at the start of the access and the accesses and hits seen since
+        self.start_accesses = 0
+        self.start_hits = 0
+        self.accesses = 0
+        self.hits = 0
+
+    def holds(self, block_num):
+        shadow_set = self.sets.get(block_num & self.index_mask)
+        return shadow_set is not None and (block_num >> self.num_bits_index) in shadow_set
+
+    def block_num(self, index, tag):
+        return tag << self.num_bits_index | index
+
+    def change_dirty(self, index, change):
+        count = self.dirty_counts.get(index, 0) + change
+        if count:
+            self.dirty_counts[index] = count
+        else:
+            del self.dirty_counts[index]
+
+
+class InvariantChecker(object):
+
+    def __init__(self, heirarchy, inclusion=False, tracer=None):
+        # Events are passed on to tracer, an event tracer set before checking started
+        self.heirarchy = heirarchy
+        self.inclusion = inclusion
+        self.tracer = tracer
+        self.active = True
+        self.num = 0
+        self.shadows = []
+        # (shadow, set index) of the sets the current access touched, and (level, set index, tag)
+        # of the blocks it evicted
+        self.touched = []
+        self.evicted = []
+        # Level waiting for the eviction of an overfull set, and for a writeback
+        self.pending_evict = None
+        self.pending_writeback = None
+        self.num_checked = 0
+
+        for cache in heirarchy.cache_layers:
+            if cache.valid_set_indexes:
+                raise ValueError("Invariant checking has to start from empty caches, " + str(cache.name) +
+                                 " holds blocks")
+        if inclusion and len(set(cache.block_size_bytes for cache in heirarchy.cache_layers)) > 1:
+            raise ValueError("Inclusion can only be checked when every level has the same block size")
+
+    def shadow(self, level):
+        # Levels added after checking started get their shadows when they are first reached
+        while len(self.shadows) <= level:
+            self.shadows.append(LevelShadow(self.heirarchy.cache_layers[len(self.shadows)]))
+        return self.shadows[level]
+
+    def invalidate(self):
+        self.shadows = []
+        self.pending_evict = None
+        self.pending_writeback = None
+
+    def fail(self, shadow, message):
+        raise ValueError("Invariant broken by access " + str(self.num) + " in " + str(shadow.cache.name) + ": " +
+                         message)
+
+    def begin(self, mem_access):
+        self.num = mem_access.num
+        self.touched = []
+        self.evicted = []
+        for level in range(self.heirarchy.num_layers()):
+            shadow = self.shadow(level)
+            shadow.start_accesses = shadow.cache.num_accesses
+            shadow.start_hits = shadow.cache.num_hits
+            shadow.accesses = 0
+            shadow.hits = 0
+        if self.tracer is not None:
+            self.tracer.begin(mem_access)
+
+    def record(self, kind, level, flags, num, a, b, c=0):
+        if kind == ACCESS:
+            self.end_access()
+        else:
+            self.check_event(kind, self.shadow(level), level, flags, a, b)
+        if self.tracer is not None and self.tracer.active:
+            self.tracer.record(kind, level, flags, num, a, b, c)
+
+    def check_event(self, kind, shadow, level, flags, index, tag):
+        shadow_set = shadow.sets.get(index)
+        present = shadow_set is not None and tag in shadow_set
+
+        if kind == HIT or kind == MISS:
+            shadow.accesses += 1
+            if kind == MISS:
+                if present:
+                    self.fail(shadow, "missed on tag " + str(tag) + " held by set " + str(index))
+                return
+            shadow.hits += 1
+            if not present:
+                self.fail(shadow, "hit on tag " + str(tag) + " missing from set " + str(index))
+            if shadow.recency:
+                shadow_set.move_to_end(tag)
+            if flags and not shadow_set[tag]:
+                shadow_set[tag] = True
+                shadow.change_dirty(index, 1)
+            self.touched.append((shadow, index))
+
+        elif kind == FILL:
+            if present:
+                self.fail(shadow, "filled tag " + str(tag) + " already held by set " + str(index))
+            if shadow_set is None:
+                shadow_set = shadow.sets[index] = OrderedDict()
+            shadow_set[tag] = bool(flags)
+            if flags:
+                shadow.change_dirty(index, 1)
+            if len(shadow_set) > shadow.ways:
+                self.pending_evict = level
+            self.touched.append((shadow, index))
+
+            # The level below hit on the block or was filled with it first
+            if self.inclusion and level + 1 < len(self.shadows) and \
+                    not self.shadows[level + 1].holds(shadow.block_num(index, tag)):
+                self.fail(shadow, "filled tag " + str(tag) + " of set " + str(index) +
+                          " that the level below does not hold")
+
+        elif kind == EVICT:
+            if self.pending_evict != level:
+                self.fail(shadow, "evicted tag " + str(tag) + " from set " + str(index) + " with a free way")
+            self.pending_evict = None
+            if not present:
+                self.fail(shadow, "evicted tag " + str(tag) + " missing from set " + str(index))
+            if shadow.ordered and next(iter(shadow_set)) != tag:
+                self.fail(shadow, "evicted tag " + str(tag) + " instead of tag " + str(next(iter(shadow_set))) +
+                          " from set " + str(index))
+            dirty = shadow_set.pop(tag)
+            if dirty != bool(flags):
+                self.fail(shadow, "evicted tag " + str(tag) + " of set " + str(index) + " as " +
+                          ("dirty" if flags else "clean") + " but it was " + ("dirty" if dirty else "clean"))
+            if dirty:
+                shadow.change_dirty(index, -1)
+                if shadow.cache.wb_wa:
+                    self.pending_writeback = level
+
+            # The level above may still evict the same block later in this access
+            if self.inclusion and level > 0:
+                self.evicted.append((level, index, tag))
+
+        elif kind == WRITEBACK:
+            if self.pending_writeback != level:
+                self.fail(shadow, "wrote back tag " + str(tag) + " of set " + str(index) +
+                          " without evicting it dirty")
+            self.pending_writeback = None
+
+    def end_access(self):
+        if self.pending_evict is not None:
+            self.fail(self.shadows[self.pending_evict], "a set holds more blocks than it has ways")
+        if self.pending_writeback is not None:
+            self.fail(self.shadows[self.pending_writeback], "a dirty eviction was never written back")
+
+        # Nothing above may keep a block a level no longer holds
+        for level, index, tag in self.evicted:
+            shadow = self.shadows[level]
+            if self.shadows[level - 1].holds(shadow.block_num(index, tag)):
+                self.fail(shadow, "evicted tag " + str(tag) + " of set " + str(index) +
+                          " still held by the level above")
+
+        for shadow, index in self.touched:
+            cache = shadow.cache
+            if cache.dirty_set_counts.get(index, 0) != shadow.dirty_counts.get(index, 0):
+                self.fail(shadow, "set " + str(index) + " counts " + str(cache.dirty_set_counts.get(index, 0)) +
+                          " dirty blocks but holds " + str(shadow.dirty_counts.get(index, 0)))
+            if index not in cache.valid_set_indexes:
+                self.fail(shadow, "set " + str(index) + " holds blocks but is not marked valid")
+
+        for shadow in self.shadows:
+            cache = shadow.cache
+            if cache.num_accesses - shadow.start_accesses != shadow.accesses or \
+                    cache.num_hits - shadow.start_hits != shadow.hits:
+                self.fail(shadow, "counted " + str(cache.num_accesses - shadow.start_accesses) + " accesses and " +
+                          str(cache.num_hits - shadow.start_hits) + " hits for " + str(shadow.accesses) +
+                          " accesses and " + str(shadow.hits) + " hits")
+        self.num_checked += 1
+
+    def close(self):
+        if self.tracer is not None:
+            self.tracer.close()
@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import struct
+from array import array
+from memcomponents.access_sequence import MemoryAccess
+from memcomponents.heirarchy import create_heirarchy
+from memcomponents.checkpoint import level_geometry, GEOMETRY_KEYS
+from memcomponents.trace_format import is_stream_trace
+
+# A miss stream is what the top levels of a heirarchy send to the levels below them. It is
+# recorded once by simulating only those top levels, the prefix, and can then be replayed
+# into any heirarchy that starts with the same prefix, so a sweep over the lower levels
+# never simulates the prefix again.
+#
+# Every trace access keeps its arrival time, the cycles it spent in the prefix and the
+# number of dirty writebacks it caused there, so the outstanding miss buffer is replayed
+# exactly. Writebacks go straight to memory and are charged the memory latency of the
+# replaying heirarchy. Accesses that left the prefix, misses and write throughs, also keep
+# their address and mode and are run through the lower levels. The prefix counters are
+# stored with the stream and copied into the prefix levels when replaying.
+#
+# Stream layout (all little endian):
+#   header:   magic (8s) | version (H) | reserved (H) | metadata length (I)
+#   metadata: JSON with the prefix levels, their counters and the byte length of every column
+#   columns:  arrival times (Q * n) | downstream addresses (Q * d) | prefix cycles (I * n) |
+#             flags (B * n, bit 0 = downstream, bit 1 = write, the rest = writebacks)
+MISS_STREAM_MAGIC = b'C1541MSS'
+MISS_STREAM_VERSION = 1
+HEADER_FORMAT = '<8sHHI'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+COLUMN_TYPES = ('Q', 'Q', 'I', 'B')
+
+DOWNSTREAM = 1
+WRITE = 2
+WRITEBACK_SHIFT = 2
+
+
+class StreamRecorder(object):
+    # Stands in for the level below the prefix and remembers the access that reached it
+    def __init__(self):
+        self.mem_access = None
+        self.lower = None
+
+    def access(self, mem_access):
+        self.mem_access = mem_access
+
+    def memory_latency(self):
+        # What get_memory_latency charges the prefix for a writeback. Nothing while recording,
+        # the replaying heirarchy's memory latency is added for every writeback it replays
+        return 0
+
+
+def is_miss_stream(stream_file):
+    if is_stream_trace(stream_file):
+        return False
+    try:
+        with open(stream_file, 'rb') as s_file:
+            return s_file.read(len(MISS_STREAM_MAGIC)) == MISS_STREAM_MAGIC
+    except (IOError, OSError):
+        return False
+
+
+def record_miss_stream(accesses, out_file, heirarchy_args, prefix_layers):
+    # Simulates the first prefix_layers levels of the heirarchy over the accesses, writes
+    # what left them to out_file and returns the prefix heirarchy
+    if not 1 <= prefix_layers <= heirarchy_args["num_layers"]:
+        raise ValueError("The prefix must have between 1 and " + str(heirarchy_args["num_layers"]) +
+                         " levels, not " + str(prefix_layers))
+    heirarchy = create_heirarchy(**dict(heirarchy_args, num_layers=prefix_layers, cache_view=0))
+    addr_size = heirarchy.addr_size
+
+    # Dirty evictions only cost a writeback under write back
+    wb_wa = heirarchy.cache_layers[0].wb_wa
+    heirarchy.set_profiling(wb_wa)
+    profiles = [cache.profile for cache in heirarchy.cache_layers] if wb_wa else []
+
+    recorder = StreamRecorder()
+    heirarchy.cache_layers[-1].set_lower(recorder)
+    top = heirarchy.cache_layers[0]
+
+    times = array('Q')
+    addresses = array('Q')
+    cycles = array('I')
+    flags = bytearray()
+    writebacks = 0
+    for mem_access in accesses:
+        if mem_access.address >> addr_size:
+            raise ValueError("Address " + str(mem_access.address) + " of instruction " + str(mem_access.num) +
+                             " does not fit in " + str(addr_size) + " bits")
+        recorder.mem_access = None
+        top.access(mem_access)
+
+        total_writebacks = sum(profile.dirty_evictions for profile in profiles)
+        flag = (total_writebacks - writebacks) << WRITEBACK_SHIFT
+        writebacks = total_writebacks
+        if recorder.mem_access is not None:
+            flag |= DOWNSTREAM | (mem_access.mode == 'w') * WRITE
+            addresses.append(mem_access.address)
+
+        times.append(mem_access.arrival_time)
+        cycles.append(mem_access.execution_time)
+        flags.append(flag)
+
+    levels = []
+    for cache in heirarchy.cache_layers:
+        level = level_geometry(cache)
+        level.update(name=cache.name, latency=cache.latency, accesses=cache.num_accesses, hits=cache.num_hits)
+        levels.append(level)
+    columns = [times, addresses, cycles, flags]
+    metadata = {"addr_size": addr_size,
+                "num_accesses": len(times),
+                "num_downstream": len(addresses),
+                "levels": levels,
+                "column_bytes": [memoryview(column).nbytes for column in columns]}
+    # Random victims depend on the seed each level was given
+    if any(level["policy"] == "random" for level in levels):
+        metadata["seed"] = heirarchy_args.get("seed", 0)
+    encoded = json.dumps(metadata).encode('utf-8')
+
+    tmp_file = str(out_file) + ".tmp"
+    with open(tmp_file, 'wb') as s_file:
+        s_file.write(struct.pack(HEADER_FORMAT, MISS_STREAM_MAGIC, MISS_STREAM_VERSION, 0, len(encoded)))
+        s_file.write(encoded)
+        for column in columns:
+            if isinstance(column, array) and sys.byteorder != 'little':
+                column.byteswap()
+            s_file.write(column)
+    os.replace(tmp_file, out_file)
+    return heirarchy
+
+
+def read_miss_stream(stream_file):
+    with open(stream_file, 'rb') as s_file:
+        contents = s_file.read()
+    if len(contents) < HEADER_SIZE:
+        raise ValueError("Miss stream " + str(stream_file) + " has a truncated header")
+
+    magic, version, _, metadata_len = struct.unpack_from(HEADER_FORMAT, contents)
+    if magic != MISS_STREAM_MAGIC or version != MISS_STREAM_VERSION:
+        raise ValueError("File " + str(stream_file) + " is not a version " + str(MISS_STREAM_VERSION) +
+                         " miss stream")
+    metadata = json.loads(contents[HEADER_SIZE:HEADER_SIZE + metadata_len].decode('utf-8'))
+
+    view = memoryview(contents)
+    offset = HEADER_SIZE + metadata_len
+    columns = []
+    for typecode, num_bytes in zip(COLUMN_TYPES, metadata["column_bytes"]):
+        if offset + num_bytes > len(contents):
+            raise ValueError("Miss stream " + str(stream_file) + " is truncated")
+        column = array(typecode, view[offset:offset + num_bytes].tobytes())
+        if sys.byteorder != 'little':
+            column.byteswap()
+        columns.append(column)
+        offset += num_bytes
+    return MissStream(metadata, *columns)
+
+
+class MissStream(object):
+
+    def __init__(self, metadata, times, addresses, cycles, flags):
+        self.metadata = metadata
+        self.levels = metadata["levels"]
+        self.times = times
+        self.addresses = addresses
+        self.cycles = cycles
+        self.flags = flags
+
+    def num_prefix_layers(self):
+        return len(self.levels)
+
+    def check(self, heirarchy, seed=0):
+        # Raises a ValueError unless the heirarchy starts with the recorded prefix and has
+        # levels below it
+        prefix = self.num_prefix_layers()
+        if heirarchy.addr_size != self.metadata["addr_size"] or heirarchy.num_layers() <= prefix:
+            raise ValueError("The miss stream needs a heirarchy of " + str(self.metadata["addr_size"]) +
+                             " bit addresses with more than " + str(prefix) + " levels")
+        for cache, level in zip(heirarchy.cache_layers, self.levels):
+            geometry = level_geometry(cache)
+            geometry["latency"] = cache.latency
+            for key in GEOMETRY_KEYS + ("latency",):
+                if geometry[key] != level[key]:
+                    raise ValueError("Miss stream level " + str(level["name"]) + " has " + key + " " +
+                                     str(level[key]) + ", cache " + str(cache.name) + " has " + str(geometry[key]))
+        if "seed" in self.metadata and seed != self.metadata["seed"]:
+            raise ValueError("The miss stream was recorded with random seed " + str(self.metadata["seed"]) +
+                             ", not " + str(seed))
+        # Write through levels below a write back prefix would see writes it never sent
+        if any(cache.wb_wa != heirarchy.cache_layers[0].wb_wa for cache in heirarchy.cache_layers[prefix:]):
+            raise ValueError("Every level must have the write policy the miss stream was recorded with")
+
+    def replay(self, heirarchy, seed=0):
+        # Runs the stream through the levels below the prefix of a freshly created heirarchy
+        # and returns the finish time of the last access, as if the whole trace had run
+        self.check(heirarchy, seed)
+        prefix = self.num_prefix_layers()
+        for cache, level in zip(heirarchy.cache_layers, self.levels):
+            cache.num_accesses = level["accesses"]
+            cache.num_hits = level["hits"]
+
+        lower = heirarchy.cache_layers[prefix]
+        memory_latency = heirarchy.cache_layers[-1].memory_latency()
+
+        # The outstanding miss buffer of CacheHeirarchy.access, fed only finish times
+        next_serve_time = heirarchy.next_serve_time
+        buffer_access = heirarchy.buffer_access
+        total_cycles = 0
+        addresses = iter(self.addresses)
+        for num, (arrival_time, execution_time, flag) in enumerate(zip(self.times, self.cycles, self.flags)):
+            serve_time = next_serve_time(arrival_time)
+
+            # Most accesses stayed in the prefix without a writeback
+            if flag:
+                execution_time += (flag >> WRITEBACK_SHIFT) * memory_latency
+                if flag & DOWNSTREAM:
+                    mem_access = MemoryAccess(num, 'w' if flag & WRITE else 'r', next(addresses), arrival_time)
+                    mem_access.serve_time = serve_time
+                    lower.access(mem_access)
+                    execution_time += mem_access.execution_time
+
+            finish_time = serve_time + execution_time
+            buffer_access(finish_time, None)
+            if finish_time > total_cycles:
+                total_cycles = finish_time
+        return total_cycles
+
+    def __len__(self):
+        return len(self.times)
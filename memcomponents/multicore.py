@@ -0,0 +1,205 @@
+import heapq
+from memcomponents.utilities import *
+from memcomponents.access_sequence import MemoryAccess, read_records
+from memcomponents.heirarchy import create_heirarchy
+from memcomponents.events import ACCESS, FILL, EVICT
+
+# Several cores, each with its own chain of private levels and its own outstanding miss
+# buffer, sharing the bottom levels. Every core's last private level reaches the shared
+# levels through a SharedPort, which counts that core's shared accesses and hits and, if
+# port_cycles is set, keeps the first shared level busy for port_cycles after each access
+# so accesses from different cores queue behind each other.
+#
+# The shared levels report their events to an OwnershipTracker, which passes them on to the
+# event tracer of the cores with the levels numbered after the private ones. An invariant
+# checker of the shared levels goes in front of it, the port starts and ends its checks
+# around every shared access.
+#
+# Per core traces are merged lazily by arrival time with a heap holding one access per
+# core, ties going to the lower core, so memory grows with the number of cores and not
+# with the length of the traces. Each trace must already be in arrival order.
+
+
+def merge_traces(trace_files):
+    # Yields (core, access) for every access of every core in arrival time order
+    def core_records(core, trace_file):
+        for num, (mode, address, time) in enumerate(read_records(trace_file)):
+            yield time, core, num, mode, address
+
+    for time, core, num, mode, address in heapq.merge(*[core_records(core, trace_file)
+                                                        for core, trace_file in enumerate(trace_files)]):
+        yield core, MemoryAccess(num, mode, address, time)
+
+
+class OwnershipTracker(object):
+    # Stands in for an event tracer on the shared levels, following which core brought in
+    # every shared block to count the blocks each core loses to fills by other cores. Events
+    # are passed on to tracer, the cores begin their accesses there and record them
+    def __init__(self, num_cores, level_offset=0, tracer=None):
+        self.active = True
+        self.core = 0
+        self.level_offset = level_offset
+        self.tracer = tracer
+        self.owners = {}
+        self.cross_evictions = [0] * num_cores
+
+    def begin(self, mem_access):
+        pass
+
+    def record(self, kind, level, flags, num, a, b, c=0):
+        if kind == FILL:
+            self.owners[(level, a, b)] = self.core
+        elif kind == EVICT:
+            owner = self.owners.pop((level, a, b), self.core)
+            if owner != self.core:
+                self.cross_evictions[owner] += 1
+        elif kind == ACCESS:
+            return
+        tracer = self.tracer
+        if tracer is not None and tracer.active:
+            tracer.record(kind, level + self.level_offset, flags, num, a, b, c)
+
+    def close(self):
+        if self.tracer is not None:
+            self.tracer.close()
+
+
+class SharedPort(object):
+    # Sits between a core's last private level and the first shared level
+    def __init__(self, core, multicore):
+        self.core = core
+        self.multicore = multicore
+        self.lower = multicore.shared.cache_layers[0]
+        self.num_accesses = 0
+        self.num_hits = 0
+        self.contention_cycles = 0
+
+    def access(self, mem_access):
+        multicore = self.multicore
+        multicore.ownership.core = self.core
+
+        # Wait for the shared level to finish the accesses ahead of this one
+        if multicore.port_cycles:
+            now = mem_access.serve_time + mem_access.execution_time
+            if now < multicore.port_free:
+                wait = multicore.port_free - now
+                mem_access.add_time(wait)
+                self.contention_cycles += wait
+                now = multicore.port_free
+            multicore.port_free = now + multicore.port_cycles
+
+        # The ownership tracker, or an invariant checker in front of it
+        tracer = multicore.shared.tracer
+        tracer.begin(mem_access)
+
+        num_hits = self.lower.num_hits
+        self.lower.access(mem_access)
+        self.num_accesses += 1
+        self.num_hits += self.lower.num_hits - num_hits
+
+        tracer.record(ACCESS, 0, mem_access.mode == 'w', mem_access.num, mem_access.address, mem_access.serve_time,
+                      mem_access.finish_time())
+
+    def warm(self, mem_access):
+        self.multicore.ownership.core = self.core
+        self.lower.warm(mem_access)
+
+    def hit_rate(self):
+        try:
+            return float(self.num_hits) / float(self.num_accesses)
+        except ZeroDivisionError:
+            return 0.0
+
+
+class MultiCoreHeirarchy(object):
+    def __init__(self, cores, shared, port_cycles=0):
+        # cores are heirarchies of private levels, shared is the heirarchy of shared levels
+        self.cores = cores
+        self.shared = shared
+        self.port_cycles = port_cycles
+        self.port_free = 0
+        self.tracer = None
+
+        self.ownership = OwnershipTracker(len(cores), cores[0].num_layers())
+        shared.set_tracer(self.ownership)
+
+        self.ports = []
+        for core, heirarchy in enumerate(cores):
+            port = SharedPort(core, self)
+            heirarchy.cache_layers[-1].set_lower(port)
+            self.ports.append(port)
+
+    def set_tracer(self, tracer):
+        # Stream the events of every core and of the shared levels to one tracer, None turns
+        # tracing off
+        self.tracer = tracer
+        for heirarchy in self.cores:
+            heirarchy.set_tracer(tracer)
+        self.ownership.tracer = tracer
+
+    def set_invariant_checking(self, enabled=True, inclusion=False):
+        # Check the private levels of every core and the shared levels on their own, inclusion
+        # is not checked between the last private and the first shared level
+        for heirarchy in self.cores:
+            heirarchy.set_invariant_checking(enabled, inclusion)
+        self.shared.set_invariant_checking(enabled, inclusion)
+
+    def access(self, core, mem_access):
+        self.cores[core].access(mem_access)
+
+    def run(self, trace_files):
+        if len(trace_files) != len(self.cores):
+            raise ValueError(str(len(trace_files)) + " traces given for " + str(len(self.cores)) + " cores")
+        for core, mem_access in merge_traces(trace_files):
+            self.access(core, mem_access)
+        return self
+
+    def core_table(self):
+        private_layers = self.cores[0].cache_layers
+        total_shared = sum(port.num_accesses for port in self.ports)
+        table = PrettyTable(["Core", "Accesses"] + [cache.name + " Hit Rate" for cache in private_layers] +
+                            ["Shared Accesses", "Shared Hit Rate", "Share Of Shared", "Lost To Other Cores",
+                             "Contention Cycles", "Stall Cycles"])
+        for core, (heirarchy, port) in enumerate(zip(self.cores, self.ports)):
+            share = float(port.num_accesses) / total_shared if total_shared else 0.0
+            table.add_row([core, heirarchy.cache_layers[0].num_accesses] +
+                          ["{:.2f}%".format(cache.hit_rate() * 100) for cache in heirarchy.cache_layers] +
+                          [port.num_accesses, "{:.2f}%".format(port.hit_rate() * 100), "{:.2f}%".format(share * 100),
+                           self.ownership.cross_evictions[core], port.contention_cycles, heirarchy.stall_cycles])
+        return str(table)
+
+    def __repr__(self):
+        multicore_str = "<<<<<<<<<<< Multi-Core Snapshot >>>>>>>>>>>\n\n"
+        multicore_str += " *** Cores: " + str(len(self.cores)) + " ***\n" \
+                         " -- Shared Port Cycles: " + str(self.port_cycles) + \
+                         " -- Shared Blocks Lost To Other Cores: " + str(sum(self.ownership.cross_evictions)) + \
+                         "\n" + self.core_table() + "\n\n"
+
+        for cache in self.shared.cache_layers:
+            multicore_str += str(cache)
+            multicore_str += '\n' + draw_vertical_line(5, 15) + '\n'
+
+        multicore_str += " ==================== MAIN MEMORY =================== "
+        return multicore_str
+
+
+def create_multicore(num_cores, block_size, num_layers, sizes, cycles, associativity, write_policy, max_misses,
+                     shared_layers=1, cache_view=0, addr_size=32, storage="dict", replacement_policy="lru", seed=0,
+                     port_cycles=0):
+    # The first num_layers - shared_layers levels are private to each core, the rest shared
+    num_private = num_layers - shared_layers
+    if num_private < 1 or shared_layers < 1:
+        raise ValueError("Need at least one private and one shared layer, not " + str(num_private) + " and " +
+                         str(shared_layers))
+    policies = replacement_policy if isinstance(replacement_policy, list) else [replacement_policy] * num_layers
+
+    cores = [create_heirarchy(block_size, num_private, sizes[:num_private], cycles[:num_private],
+                              associativity[:num_private], write_policy, max_misses, cache_view, addr_size, storage,
+                              policies[:num_private], seed + core * num_layers)
+             for core in range(num_cores)]
+    shared = create_heirarchy(block_size, shared_layers, sizes[num_private:], cycles[num_private:],
+                              associativity[num_private:], write_policy, max_misses, cache_view, addr_size, storage,
+                              policies[num_private:], seed + num_cores * num_layers)
+    for i, cache in enumerate(shared.cache_layers):
+        cache.name = "L" + str(num_private + i)
+    return MultiCoreHeirarchy(cores, shared, port_cycles)
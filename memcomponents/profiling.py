@@ -0,0 +1,139 @@
+import csv
+import json
+from array import array
+from memcomponents.utilities import *
+
+# Per level profiling counters, off unless a LevelProfile is attached to each cache with
+# CacheHeirarchy.set_profiling. A cache without a profile only pays for one None check
+# per access. Each profile counts:
+#   read/write hits and misses
+#   dirty evictions, which are writebacks to memory under wb+wa
+#   memory reads and writes made by the bottom level, writes being write-throughs and
+#   wt+nwa write misses reaching memory
+#   accesses and misses of every set, which the conflict heatmap is drawn from
+# Cycles are attributed from the counters: each level gets its latency for every access,
+# writebacks the memory latency each, and the bottom level its latency + 100 for every
+# memory read or write, which with the stall cycles adds up to the total access time.
+
+# Heatmap shades from no misses to the most misses of any cell
+HEAT_SHADES = " .:-=+*#%@"
+HEATMAP_ROWS = 16
+
+
+class LevelProfile(object):
+
+    def __init__(self, total_sets):
+        self.total_sets = total_sets
+        self.reset()
+
+    def reset(self):
+        # read hits, read misses, write hits, write misses, indexed by is_write << 1 | is_miss
+        self.outcomes = [0, 0, 0, 0]
+        self.dirty_evictions = 0
+        self.memory_reads = 0
+        self.memory_writes = 0
+        self.set_accesses = array('Q', bytes(8 * self.total_sets))
+        self.set_misses = array('Q', bytes(8 * self.total_sets))
+
+    def hot_sets(self, count=10):
+        # The set indexes with the most misses, ties going to the lower index
+        indexes = [index for index in range(len(self.set_misses)) if self.set_misses[index]]
+        indexes.sort(key=lambda index: -self.set_misses[index])
+        return indexes[:count]
+
+
+def level_report(cache, memory_latency):
+    profile = cache.profile
+    read_hits, read_misses, write_hits, write_misses = profile.outcomes
+    writebacks = profile.dirty_evictions if cache.wb_wa else 0
+    memory_cycles = (profile.memory_reads + profile.memory_writes) * cache.memory_latency() if cache.lower is None else 0
+    return {"name": cache.name,
+            "level": cache.level,
+            "read_hits": read_hits,
+            "read_misses": read_misses,
+            "write_hits": write_hits,
+            "write_misses": write_misses,
+            "dirty_evictions": profile.dirty_evictions,
+            "writebacks": writebacks,
+            "memory_reads": profile.memory_reads,
+            "memory_writes": profile.memory_writes,
+            "access_cycles": cache.num_accesses * cache.latency,
+            "writeback_cycles": writebacks * memory_latency,
+            "memory_cycles": memory_cycles,
+            "set_accesses": profile.set_accesses.tolist(),
+            "set_misses": profile.set_misses.tolist()}
+
+
+def profile_report(heirarchy):
+    # Everything the profiles counted as plain values, ready to export
+    memory_latency = heirarchy.cache_layers[-1].memory_latency()
+    levels = [level_report(cache, memory_latency) for cache in heirarchy.cache_layers]
+    total_cycles = heirarchy.stall_cycles + sum(level["access_cycles"] + level["writeback_cycles"] +
+                                                level["memory_cycles"] for level in levels)
+    return {"levels": levels,
+            "stall_cycles": heirarchy.stall_cycles,
+            "total_cycles": total_cycles}
+
+
+def write_profile(out_file, report):
+    # JSON if the file ends in .json, otherwise CSV rows of level, set, counter and value with
+    # the set left empty for the level totals
+    if out_file.endswith(".json"):
+        with open(out_file, 'w') as w_file:
+            json.dump(report, w_file, indent=1)
+        return
+
+    with open(out_file, 'w', newline='') as w_file:
+        writer = csv.writer(w_file)
+        writer.writerow(["level", "set", "counter", "value"])
+        for level in report["levels"]:
+            for counter, value in level.items():
+                if counter not in ("name", "level", "set_accesses", "set_misses"):
+                    writer.writerow([level["name"], "", counter, value])
+            for index, (accesses, misses) in enumerate(zip(level["set_accesses"], level["set_misses"])):
+                if accesses:
+                    writer.writerow([level["name"], index, "accesses", accesses])
+                    writer.writerow([level["name"], index, "misses", misses])
+        writer.writerow(["", "", "stall_cycles", report["stall_cycles"]])
+        writer.writerow(["", "", "total_cycles", report["total_cycles"]])
+
+
+def sets_per_cell(total_sets, width):
+    # Caches with more sets than fit in the heatmap add up runs of neighbouring sets
+    return max(1, -(-total_sets // (width * HEATMAP_ROWS)))
+
+
+def heatmap(set_misses, width=64):
+    # Rows of width cells shaded by misses, the label is the first set of each row
+    cell_sets = sets_per_cell(len(set_misses), width)
+    cells = [sum(set_misses[start:start + cell_sets]) for start in range(0, len(set_misses), cell_sets)]
+    most = max(cells) if cells else 0
+
+    lines = []
+    label_width = len(str(len(set_misses)))
+    for row_start in range(0, len(cells), width):
+        shades = ''.join(HEAT_SHADES[-(-misses * (len(HEAT_SHADES) - 1) // most)] if most else HEAT_SHADES[0]
+                         for misses in cells[row_start:row_start + width])
+        lines.append(str(row_start * cell_sets).rjust(label_width) + " |" + shades + "|")
+    return "\n".join(lines)
+
+
+def heatmap_string(heirarchy, hot_count=10, width=64):
+    # The heatmap and hottest sets of every level
+    heatmap_str = ""
+    for cache in heirarchy.cache_layers:
+        profile = cache.profile
+        total_misses = sum(profile.outcomes[1::2])
+        heatmap_str += " *** Conflict Heatmap: " + str(cache.name) + " ***\n" \
+                       " -- Sets: " + str(cache.total_sets) + \
+                       " -- Sets Per Cell: " + str(sets_per_cell(cache.total_sets, width)) + \
+                       " -- Shades: '" + HEAT_SHADES + "' (no misses to most misses)\n"
+        heatmap_str += heatmap(profile.set_misses, width) + "\n"
+
+        table = PrettyTable(["Set", "Accesses", "Misses", "Miss Rate", "Share Of Misses"])
+        for index in profile.hot_sets(hot_count):
+            accesses, misses = profile.set_accesses[index], profile.set_misses[index]
+            table.add_row([index, accesses, misses, "{:.2f}%".format(100.0 * misses / accesses),
+                           "{:.2f}%".format(100.0 * misses / total_misses)])
+        heatmap_str += str(table) + "\n\n"
+    return heatmap_str
@@ -0,0 +1,241 @@
+import random
+from memcomponents.cache import Block, LRUSet
+
+# Replacement policies are set classes with the same interface as LRUSet: __getitem__ returns
+# the block for a tag (or None) and updates the policy on a hit, __setitem__ brings a block
+# in and returns the evicted block if any. Unlike LRUSet they keep a fixed list of ways and
+# a tag to way map, and track their policy state in small ints and bit vectors so no
+# update allocates.
+
+
+class WaySet(object):
+
+    def __init__(self, index=0, maxsize=4):
+        self.index = index
+        self.maxsize = maxsize
+        self.blocks = [None] * maxsize
+        self.ways = {}
+        # First empty way, ways only empty out all at once so it only moves forward
+        self.next_free = 0
+
+    def __getitem__(self, tag):
+        way = self.ways.get(tag)
+        if way is None:
+            return None
+        self.touch(way)
+        return self.blocks[way]
+
+    def __setitem__(self, tag, block):
+        evicted = None
+        if self.next_free < self.maxsize:
+            way = self.next_free
+            self.skip_filled(way + 1)
+        else:
+            way = self.victim()
+            evicted = self.blocks[way]
+            del self.ways[evicted.tag]
+
+        self.blocks[way] = block
+        self.ways[tag] = way
+        self.insert(way)
+        return evicted
+
+    def __len__(self):
+        return len(self.ways)
+
+    def skip_filled(self, way):
+        blocks = self.blocks
+        while way < self.maxsize and blocks[way] is not None:
+            way += 1
+        self.next_free = way
+
+    # Policy hooks
+    def touch(self, way):
+        pass
+
+    def insert(self, way):
+        pass
+
+    def victim(self):
+        raise NotImplementedError
+
+    def is_full(self):
+        return len(self.ways) >= self.maxsize
+
+    def clear(self):
+        self.blocks = [None] * self.maxsize
+        self.ways = {}
+        self.next_free = 0
+
+    def slots(self):
+        # Ways in place, empty ways as None
+        return list(self.blocks)
+
+    def policy_state(self):
+        return ()
+
+    def set_policy_state(self, policy_state):
+        pass
+
+    def load(self, blocks, policy_state):
+        self.blocks = list(blocks) + [None] * (self.maxsize - len(blocks))
+        self.ways = {block.tag: way for way, block in enumerate(self.blocks) if block is not None}
+        self.skip_filled(0)
+        self.set_policy_state(policy_state)
+
+    def values(self):
+        return [block for block in self.blocks if block is not None]
+
+    def get_valid_blocks(self, dirty_required=False):
+        return [block for block in self.values() if block.valid_bit and (block.dirty_bit or not dirty_required)]
+
+    def as_table_entry(self):
+        block_list = [self.index]
+
+        # Ways are shown in place, empty ways as empty blocks
+        for block in self.blocks:
+            block_list += (block or Block()).as_table_entry()
+
+        return block_list
+
+
+class FIFOSet(WaySet):
+    # Ways are filled in order and then replaced round robin, hits change nothing
+
+    def __init__(self, index=0, maxsize=4):
+        super().__init__(index, maxsize)
+        self.next_victim = 0
+
+    def clear(self):
+        super().clear()
+        self.next_victim = 0
+
+    def policy_state(self):
+        return (self.next_victim,)
+
+    def set_policy_state(self, policy_state):
+        self.next_victim, = policy_state
+
+    def victim(self):
+        way = self.next_victim
+        self.next_victim = (way + 1) % self.maxsize
+        return way
+
+
+class RandomSet(WaySet):
+    # Evicts a uniformly random way, drawn from a generator shared by the whole cache
+
+    def __init__(self, index=0, maxsize=4, rand=random):
+        super().__init__(index, maxsize)
+        self.rand = rand
+
+    def victim(self):
+        return self.rand.randrange(self.maxsize)
+
+
+class PLRUSet(WaySet):
+    # Tree pseudo LRU. The ways - 1 tree nodes are bits of one int, numbered like a heap
+    # from 1. A node bit of 0 points the victim search left and 1 points it right, every
+    # access flips the bits on its path to point away from it
+
+    def __init__(self, index=0, maxsize=4):
+        if maxsize & (maxsize - 1):
+            raise ValueError("Tree PLRU needs a power of two associativity, not " + str(maxsize))
+        super().__init__(index, maxsize)
+        self.tree = 0
+
+    def touch(self, way):
+        node = way + self.maxsize
+        tree = self.tree
+        while node > 1:
+            parent = node >> 1
+            if node & 1:
+                tree &= ~(1 << parent)
+            else:
+                tree |= 1 << parent
+            node = parent
+        self.tree = tree
+
+    def insert(self, way):
+        self.touch(way)
+
+    def clear(self):
+        super().clear()
+        self.tree = 0
+
+    def policy_state(self):
+        return (self.tree,)
+
+    def set_policy_state(self, policy_state):
+        self.tree, = policy_state
+
+    def victim(self):
+        node = 1
+        while node < self.maxsize:
+            node = 2 * node + ((self.tree >> node) & 1)
+        return node - self.maxsize
+
+
+class SRRIPSet(WaySet):
+    # Static RRIP with 2 bit re-reference predictions. masks[v] is a bit vector of the ways
+    # predicted v, blocks come in at 2, hits go to 0 and the victim is any way at 3. When no
+    # way is at 3 every prediction is aged at once by shifting the masks up in place
+
+    MAX_RRPV = 3
+
+    def __init__(self, index=0, maxsize=4):
+        super().__init__(index, maxsize)
+        self.masks = [0] * (self.MAX_RRPV + 1)
+
+    def set_rrpv(self, way, rrpv):
+        bit = 1 << way
+        masks = self.masks
+        for value in range(self.MAX_RRPV + 1):
+            masks[value] &= ~bit
+        masks[rrpv] |= bit
+
+    def touch(self, way):
+        self.set_rrpv(way, 0)
+
+    def insert(self, way):
+        self.set_rrpv(way, self.MAX_RRPV - 1)
+
+    def clear(self):
+        super().clear()
+        self.masks = [0] * (self.MAX_RRPV + 1)
+
+    def policy_state(self):
+        return tuple(self.masks)
+
+    def set_policy_state(self, policy_state):
+        self.masks = list(policy_state)
+
+    def victim(self):
+        masks = self.masks
+        if not masks[self.MAX_RRPV]:
+            # Age by the smallest amount that puts some way at the max prediction
+            oldest = self.MAX_RRPV - 1
+            while not masks[oldest]:
+                oldest -= 1
+            shift = self.MAX_RRPV - oldest
+            for value in range(self.MAX_RRPV, shift - 1, -1):
+                masks[value] = masks[value - shift]
+            for value in range(shift):
+                masks[value] = 0
+        victims = masks[self.MAX_RRPV]
+        return (victims & -victims).bit_length() - 1
+
+
+REPLACEMENT_POLICIES = {"lru": LRUSet, "fifo": FIFOSet, "random": RandomSet, "plru": PLRUSet, "srrip": SRRIPSet}
+
+
+def set_factory(policy, seed=0):
+    # Builds the sets for one cache, random sets share one seeded generator per cache
+    if policy not in REPLACEMENT_POLICIES:
+        raise ValueError("Replacement policy must be one of " + ", ".join(REPLACEMENT_POLICIES) + ", not " +
+                         str(policy))
+    set_class = REPLACEMENT_POLICIES[policy]
+    if set_class is RandomSet:
+        rand = random.Random(seed)
+        return lambda index, maxsize: RandomSet(index, maxsize, rand)
+    return set_class
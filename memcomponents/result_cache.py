@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+from memcomponents.utilities import *
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Content addressed cache of final results on disk. A result is keyed by a digest of the
+# trace file's bytes and of the heirarchy arguments after normalizing, with sizes rounded
+# the way create_heirarchy rounds them and settings that cannot change the results, the
+# storage engine and the cache view, left out.
+#
+# Every entry is a JSON file written to a temporary file and moved into place, so readers
+# in other processes see a whole entry or none. Reading an entry touches it, and after
+# each write the least recently used entries are deleted until the directory fits in
+# max_bytes. Eviction holds an exclusive lock on the directory where fcntl is available,
+# and entries that vanish under a reader are simply misses. Trace digests are remembered
+# by path, size and modification time so an unchanged trace is only hashed once.
+# Temporary files count towards max_bytes too, and ones left behind by a writer that died
+# are deleted once they are older than any write could take.
+RESULT_CACHE_VERSION = 1
+RESULT_SUFFIX = ".result.json"
+DIGEST_SUFFIX = ".digest"
+TMP_SUFFIX = ".tmp"
+LOCK_FILE = ".lock"
+STALE_TMP_SECONDS = 3600
+
+
+def normalized_config(heirarchy_args):
+    # The create_heirarchy arguments that decide the results, as plain JSON values
+    num_layers = heirarchy_args["num_layers"]
+    policies = heirarchy_args.get("replacement_policy", "lru")
+    if not isinstance(policies, list):
+        policies = [policies] * num_layers
+    config = {"block_size": heirarchy_args["block_size"],
+              "sizes": [adjust_to_standard_size(size) for size in heirarchy_args["sizes"][:num_layers]],
+              "cycles": list(heirarchy_args["cycles"][:num_layers]),
+              "associativity": list(heirarchy_args["associativity"][:num_layers]),
+              "write_policy": heirarchy_args["write_policy"],
+              "max_misses": heirarchy_args["max_misses"],
+              "addr_size": heirarchy_args.get("addr_size", 32),
+              "replacement_policy": list(policies)}
+    # The seed only matters to random replacement
+    if "random" in policies:
+        config["seed"] = heirarchy_args.get("seed", 0)
+    return config
+
+
+def file_digest(trace_file, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(trace_file, 'rb') as t_file:
+        chunk = t_file.read(chunk_size)
+        while chunk:
+            digest.update(chunk)
+            chunk = t_file.read(chunk_size)
+    return digest.hexdigest()
+
+
+def heirarchy_result(heirarchy):
+    # What a cache hit gives back: the stats of every level and the stats only report
+    return {"levels": [cache.stats() for cache in heirarchy.cache_layers],
+            "stalled_accesses": heirarchy.num_stalls,
+            "stall_cycles": heirarchy.stall_cycles,
+            "peak_occupancy": heirarchy.peak_occupancy,
+            "report": heirarchy.stat_string() + "\n" + "\n".join(cache.stat_string()
+                                                                 for cache in heirarchy.cache_layers)}
+
+
+class ResultCache(object):
+
+    def __init__(self, cache_dir, max_bytes=256 << 20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, trace_file, heirarchy_args):
+        encoded = json.dumps({"version": RESULT_CACHE_VERSION,
+                              "trace": self.trace_digest(trace_file),
+                              "config": normalized_config(heirarchy_args)}, sort_keys=True)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def trace_digest(self, trace_file):
+        info = os.stat(trace_file)
+        stat_key = hashlib.sha256(repr((os.path.realpath(trace_file), info.st_size,
+                                        info.st_mtime_ns)).encode('utf-8')).hexdigest()
+        digest = self.read_entry(stat_key + DIGEST_SUFFIX)
+        if digest is None:
+            digest = file_digest(trace_file)
+            self.write_entry(stat_key + DIGEST_SUFFIX, digest)
+        return digest
+
+    def get(self, key):
+        # Returns the stored result, or None
+        contents = self.read_entry(key + RESULT_SUFFIX)
+        if contents is None:
+            return None
+        try:
+            return json.loads(contents)
+        except ValueError:
+            return None
+
+    def put(self, key, result):
+        self.write_entry(key + RESULT_SUFFIX, json.dumps(result))
+        self.evict()
+
+    def read_entry(self, name):
+        path = os.path.join(self.cache_dir, name)
+        try:
+            with open(path, 'r') as r_file:
+                contents = r_file.read()
+            # Mark it as recently used
+            os.utime(path)
+        except (IOError, OSError):
+            return None
+        return contents
+
+    def write_entry(self, name, contents):
+        fd, tmp_file = tempfile.mkstemp(dir=self.cache_dir, suffix=TMP_SUFFIX)
+        try:
+            with os.fdopen(fd, 'w') as w_file:
+                w_file.write(contents)
+            # Readable by everyone sharing the cache, mkstemp only lets the owner read
+            os.chmod(tmp_file, 0o644)
+            os.replace(tmp_file, os.path.join(self.cache_dir, name))
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+
+    def entries(self):
+        # (last used, size, path) of every entry and temporary file, oldest first
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith((RESULT_SUFFIX, DIGEST_SUFFIX, TMP_SUFFIX)):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            entries.append((info.st_mtime, info.st_size, path))
+        entries.sort()
+        return entries
+
+    def evict(self):
+        with open(os.path.join(self.cache_dir, LOCK_FILE), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            entries = self.entries()
+            total_bytes = sum(size for last_used, size, path in entries)
+            stale_time = time.time() - STALE_TMP_SECONDS
+            for last_used, size, path in entries:
+                # Temporary files of running writers are left alone, they become entries
+                if path.endswith(TMP_SUFFIX):
+                    if last_used >= stale_time:
+                        continue
+                elif total_bytes <= self.max_bytes:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total_bytes -= size
@@ -0,0 +1,185 @@
+from memcomponents.utilities import *
+
+# LRU reuse distances in O(log n) per access. The reuse distance of an access is the number
+# of distinct blocks touched since the last access to its block, or None on the first one.
+# A fully associative LRU cache of C blocks hits exactly the accesses with a distance below
+# C, and an S set, A way LRU cache the accesses whose distance among the blocks of their
+# own set is below A, so one histogram gives the miss rate of every capacity. Like the
+# stack distance sweep this only holds for wb+wa, where every access allocates.
+#
+# Each tracker numbers its accesses and keeps a Fenwick tree over those numbers with a 1
+# at the most recent access of every block, so the distance is the number of 1s after the
+# block's previous access. When the numbers run out the live accesses are renumbered in
+# order and the tree rebuilt, keeping memory proportional to the distinct blocks.
+
+
+class ReuseTracker(object):
+
+    def __init__(self, capacity=64):
+        self.last_access = {}
+        self.capacity = capacity
+        self.tree = [0] * (capacity + 1)
+        self.clock = 0
+
+    def access(self, block):
+        # Returns the reuse distance of the block, None if it was not seen before
+        if self.clock == self.capacity:
+            self.compact()
+
+        tree = self.tree
+        previous = self.last_access.get(block)
+        distance = None
+        if previous is not None:
+            # Marks at or before the previous access, less the block's own one
+            i = previous + 1
+            before = 0
+            while i > 0:
+                before += tree[i]
+                i &= i - 1
+            distance = len(self.last_access) - before
+
+            i = previous + 1
+            while i <= self.capacity:
+                tree[i] -= 1
+                i += i & -i
+
+        i = self.clock + 1
+        while i <= self.capacity:
+            tree[i] += 1
+            i += i & -i
+        self.last_access[block] = self.clock
+        self.clock += 1
+        return distance
+
+    def compact(self):
+        # Renumber the last access of every block from 0 in the same order, with at least as
+        # many free numbers as live blocks
+        blocks = sorted(self.last_access, key=self.last_access.get)
+        self.capacity = max(self.capacity, 2 * len(blocks))
+        self.last_access = dict((block, position) for position, block in enumerate(blocks))
+        self.clock = len(blocks)
+
+        # Linear time build of a tree with a 1 at every position below the clock
+        tree = [0] * (self.capacity + 1)
+        for i in range(1, self.capacity + 1):
+            if i <= self.clock:
+                tree[i] += 1
+            parent = i + (i & -i)
+            if parent <= self.capacity:
+                tree[parent] += tree[i]
+        self.tree = tree
+
+
+class ReuseHistogram(object):
+    # Reuse distance histograms over a trace at one block size, globally and, given a set
+    # count, among the blocks of each set
+    def __init__(self, block_size, num_sets=None):
+        self.block_size = block_size
+        self.num_sets = num_sets
+        self.num_accesses = 0
+
+        self.block_geometry = address_geometry(1, block_size)
+        self.tracker = ReuseTracker()
+        # distances[d] counts accesses at distance d, cold counts first accesses
+        self.distances = []
+        self.cold = 0
+
+        if num_sets is not None:
+            self.set_geometry = address_geometry(num_sets, block_size)
+            self.set_trackers = [ReuseTracker(8) for set_index in range(num_sets)]
+            self.set_distances = [[] for set_index in range(num_sets)]
+            self.set_cold = [0] * num_sets
+
+    def access(self, mem_access):
+        self.num_accesses += 1
+        block = mem_access.decode(self.block_geometry)[0]
+        self.cold += record_distance(self.distances, self.tracker.access(block))
+
+        if self.num_sets is not None:
+            tag, index = mem_access.decode(self.set_geometry)
+            self.set_cold[index] += record_distance(self.set_distances[index], self.set_trackers[index].access(tag))
+
+    def run(self, sequence):
+        for mem_access in sequence:
+            self.access(mem_access)
+        return self
+
+    def miss_curve(self):
+        # Rows of (capacity in blocks, misses) of fully associative LRU caches, from one
+        # block to the smallest capacity that only misses on first accesses
+        return cumulative_misses(self.distances, self.cold)
+
+    def set_distance_counts(self):
+        # Distances among the blocks of each set, added up over the sets
+        distances = [0] * max([len(counts) for counts in self.set_distances] + [0])
+        for counts in self.set_distances:
+            for distance, count in enumerate(counts):
+                distances[distance] += count
+        return distances
+
+    def set_miss_curve(self):
+        # Rows of (ways, misses) of LRU caches with num_sets sets
+        return cumulative_misses(self.set_distance_counts(), sum(self.set_cold))
+
+    def miss_table(self):
+        # Fully associative miss rates at every power of two capacity the histogram spans
+        table = PrettyTable(["Cache Size (KB)", "Blocks", "Misses", "Miss Rate"])
+        for blocks, misses in table_rows(self.miss_curve()):
+            table.add_row(self.miss_row(blocks, blocks, misses))
+        return "--- Fully Associative LRU (Block Size " + str(self.block_size) + " B) ---\n" + str(table)
+
+    def set_miss_table(self):
+        table = PrettyTable(["Cache Size (KB)", "Ways", "Misses", "Miss Rate"])
+        for ways, misses in table_rows(self.set_miss_curve()):
+            table.add_row(self.miss_row(ways * self.num_sets, ways, misses))
+        return "--- " + str(self.num_sets) + " Set LRU (Block Size " + str(self.block_size) + " B) ---\n" + str(table)
+
+    def miss_row(self, blocks, label, misses):
+        miss_rate = float(misses) / self.num_accesses if self.num_accesses else 0.0
+        return [blocks * self.block_size / 1000, label, misses, "{:.2f}%".format(miss_rate * 100)]
+
+    def __repr__(self):
+        histogram_str = " *** Reuse Distances ***\n" \
+                        " -- Accesses: " + str(self.num_accesses) + \
+                        " -- Distinct Blocks: " + str(self.cold) + \
+                        " -- Largest Distance: " + (str(len(self.distances) - 1) if self.distances else "none") + "\n\n"
+        histogram_str += self.miss_table()
+        if self.num_sets is not None:
+            histogram_str += "\n\n" + self.set_miss_table()
+        return histogram_str
+
+
+def record_distance(distances, distance):
+    # Adds the distance to the histogram, returns 1 for a first access
+    if distance is None:
+        return 1
+    if distance >= len(distances):
+        distances.extend([0] * (distance + 1 - len(distances)))
+    distances[distance] += 1
+    return 0
+
+
+def table_rows(curve):
+    # The power of two capacities of a miss curve and its last capacity, past which only
+    # first accesses miss
+    rows = [curve[capacity - 1] for capacity in powers_of_two(len(curve))]
+    if curve and rows[-1] != curve[-1]:
+        rows.append(curve[-1])
+    return rows
+
+
+def powers_of_two(limit):
+    power = 1
+    while power <= limit:
+        yield power
+        power *= 2
+
+
+def cumulative_misses(distances, cold):
+    # A cache of c blocks misses on first accesses and on every distance of c or more
+    rows = []
+    misses = cold + sum(distances)
+    for capacity in range(1, len(distances) + 1):
+        misses -= distances[capacity - 1]
+        rows.append((capacity, misses))
+    return rows
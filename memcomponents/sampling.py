@@ -0,0 +1,145 @@
+import math
+import random
+from memcomponents.utilities import *
+from memcomponents.access_sequence import MemoryAccess, read_records
+from memcomponents.heirarchy import create_heirarchy
+from memcomponents.sharding import max_slice_bits, slice_args, slice_address
+
+# Sampled runs estimate each level's hit rate from part of the work, with a confidence
+# interval. Both modes split the run into clusters and use the ratio estimator
+# sum(hits) / sum(accesses) over the simulated clusters, with the usual cluster sampling
+# variance so clusters of different sizes are weighted by their accesses.
+#
+# Set sampling: as with sharding, the low set index bits pick the same slice of sets at
+# every level, so each slice is an independent small heirarchy. A random subset of the
+# slices is simulated and every slice is a cluster.
+#
+# Time sampling: the trace is cut into periods. The last window accesses of each period
+# are simulated in full and counted, the warmup accesses before them only update the
+# cache contents, and the rest of the period is skipped. Every window is a cluster.
+#
+# Neither mode reports access timing, only hit and miss rates.
+
+# Two sided 95% normal quantile
+Z_95 = 1.96
+
+
+def ratio_estimate(clusters, sampled_fraction):
+    # Returns (rate, half width of the 95% interval) for a list of (accesses, hits) clusters.
+    # The half width is None when there are too few clusters to estimate the variance
+    total_accesses = sum(accesses for accesses, hits in clusters)
+    if total_accesses == 0:
+        return 0.0, None
+
+    rate = float(sum(hits for accesses, hits in clusters)) / total_accesses
+    n = len(clusters)
+    if n < 2:
+        return rate, None
+
+    mean_accesses = float(total_accesses) / n
+    residual_var = sum((hits - rate * accesses) ** 2 for accesses, hits in clusters) / (n - 1)
+    variance = max(0.0, 1.0 - sampled_fraction) * residual_var / (n * mean_accesses ** 2)
+    return rate, Z_95 * math.sqrt(variance)
+
+
+def estimate_levels(heirarchy, level_clusters, sampled_fraction, total_accesses):
+    # Per level estimates, counts are scaled by how much of the trace reached the first level
+    sampled_accesses = sum(accesses for accesses, hits in level_clusters[0])
+    scale = float(total_accesses) / sampled_accesses if sampled_accesses else 0.0
+
+    estimates = []
+    for cache, clusters in zip(heirarchy.cache_layers, level_clusters):
+        hit_rate, half_width = ratio_estimate(clusters, sampled_fraction)
+        accesses = sum(accesses for accesses, hits in clusters)
+        estimates.append({"name": cache.name,
+                          "accesses": int(round(accesses * scale)),
+                          "hits": int(round(sum(hits for accesses, hits in clusters) * scale)),
+                          "hit_rate": hit_rate,
+                          "miss_rate": 1.0 - hit_rate,
+                          "ci": half_width,
+                          "sampled_accesses": accesses,
+                          "clusters": len(clusters)})
+    return estimates
+
+
+def sample_sets(trace_file, heirarchy_args, fraction, seed=0):
+    # Returns the per level estimates, or None if the smallest cache has a single set
+    heirarchy = create_heirarchy(**heirarchy_args)
+    num_slice_bits = max_slice_bits(heirarchy)
+    if num_slice_bits == 0:
+        return None
+
+    num_slices = 1 << num_slice_bits
+    num_sampled = min(num_slices, max(2, int(round(fraction * num_slices))))
+    sampled = random.Random(seed).sample(range(num_slices), num_sampled)
+
+    sampled_args = slice_args(heirarchy_args, heirarchy, num_slice_bits)
+    slices = dict((index, create_heirarchy(**sampled_args)) for index in sampled)
+
+    offset_bits = heirarchy.cache_layers[0].num_bits_offset
+    slice_mask = num_slices - 1
+    total_accesses = 0
+    for mode, address, time in read_records(trace_file):
+        slice_heirarchy = slices.get((address >> offset_bits) & slice_mask)
+        if slice_heirarchy is not None:
+            address = slice_address(address, num_slice_bits, offset_bits)
+            slice_heirarchy.access(MemoryAccess(total_accesses, mode, address, time))
+        total_accesses += 1
+
+    level_clusters = [[(slice_heirarchy.cache_layers[level].num_accesses, slice_heirarchy.cache_layers[level].num_hits)
+                       for slice_heirarchy in slices.values()] for level in range(heirarchy.num_layers())]
+    return estimate_levels(heirarchy, level_clusters, float(num_sampled) / num_slices, total_accesses)
+
+
+def sample_time(trace_file, heirarchy_args, period, window, warmup=None):
+    # Returns the per level estimates. warmup defaults to the whole gap between windows
+    if warmup is None:
+        warmup = period - window
+    if window < 1 or warmup < 0 or window + warmup > period:
+        raise ValueError("Sampling windows of " + str(window) + " with " + str(warmup) +
+                         " accesses of warm up do not fit in a period of " + str(period))
+
+    heirarchy = create_heirarchy(**heirarchy_args)
+    skip = period - window - warmup
+    measure_start = skip + warmup
+
+    level_clusters = [[] for cache in heirarchy.cache_layers]
+    window_start = [(0, 0)] * heirarchy.num_layers()
+    total_accesses = 0
+    for mode, address, time in read_records(trace_file):
+        phase = total_accesses % period
+        if phase >= skip:
+            mem_access = MemoryAccess(total_accesses, mode, address, time)
+            if phase < measure_start:
+                heirarchy.warm(mem_access)
+            else:
+                if phase == measure_start:
+                    window_start = [(cache.num_accesses, cache.num_hits) for cache in heirarchy.cache_layers]
+                heirarchy.access(mem_access)
+                if phase == period - 1:
+                    record_window(heirarchy, level_clusters, window_start)
+        total_accesses += 1
+
+    # A window cut short by the end of the trace is still a cluster, just a smaller one
+    if total_accesses % period > measure_start:
+        record_window(heirarchy, level_clusters, window_start)
+
+    num_windows = len(level_clusters[0])
+    sampled_fraction = float(num_windows * window) / total_accesses if total_accesses else 1.0
+    return estimate_levels(heirarchy, level_clusters, min(1.0, sampled_fraction), total_accesses)
+
+
+def record_window(heirarchy, level_clusters, window_start):
+    for clusters, cache, (start_accesses, start_hits) in zip(level_clusters, heirarchy.cache_layers, window_start):
+        clusters.append((cache.num_accesses - start_accesses, cache.num_hits - start_hits))
+
+
+def estimate_table(estimates):
+    table = PrettyTable(["Cache", "Est. Accesses", "Est. Hits", "Hit Rate", "Miss Rate", "95% CI",
+                         "Simulated Accesses", "Clusters"])
+    for estimate in estimates:
+        ci = "n/a" if estimate["ci"] is None else "+/- {:.2f}%".format(estimate["ci"] * 100)
+        table.add_row([estimate["name"], estimate["accesses"], estimate["hits"],
+                       "{:.2f}%".format(estimate["hit_rate"] * 100), "{:.2f}%".format(estimate["miss_rate"] * 100),
+                       ci, estimate["sampled_accesses"], estimate["clusters"]])
+    return str(table)
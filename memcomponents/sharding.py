@@ -0,0 +1,89 @@
+from memcomponents.utilities import *
+from memcomponents.access_sequence import MemoryAccess, read_columns
+from memcomponents.trace_format import MODE_NAMES
+from memcomponents.heirarchy import create_heirarchy
+from memcomponents import sweep
+
+# Every level shares the block size, so the low set index bits select the same slice of
+# sets at every level and accesses in different slices never meet anywhere in the
+# heirarchy. Each shard simulates one slice with caches shrunk by the shard count and the
+# shard bits squeezed out of the address, which keeps every tag and remaining index bit.
+#
+# Hit and miss counters do not depend on timing, so the merged totals are identical to
+# a serial run. Serve and finish times are not: the --max-misses buffer, and even the
+# sequential ordering at --max-misses 0, couple every access in the trace, so sharded
+# runs report counters only.
+#
+# Set sampling simulates some of the same slices, with the helpers below.
+
+
+def max_slice_bits(heirarchy):
+    # Set index bits every level has, the heirarchy splits into at most 1 << this slices
+    return min(cache.num_bits_index for cache in heirarchy.cache_layers)
+
+
+def slice_args(heirarchy_args, heirarchy, num_slice_bits):
+    # Arguments of the heirarchy that simulates one of 1 << num_slice_bits slices of heirarchy
+    args = dict(heirarchy_args)
+    args["sizes"] = [cache.total_size_bytes >> num_slice_bits for cache in heirarchy.cache_layers]
+    args["addr_size"] = heirarchy.addr_size - num_slice_bits
+    args["cache_view"] = 0
+    return args
+
+
+def slice_address(address, num_slice_bits, offset_bits):
+    # The address within its slice, the slice bits above the block offset squeezed out
+    return ((address >> (offset_bits + num_slice_bits)) << offset_bits) | (address & ((1 << offset_bits) - 1))
+
+
+def shard_bits(heirarchy, num_shards):
+    # Largest power of two shard count no more than requested that every level can split
+    return max(0, min(num_shards.bit_length() - 1, max_slice_bits(heirarchy)))
+
+
+def shard_accesses(columns, shard, num_shard_bits, offset_bits):
+    shard_mask = (1 << num_shard_bits) - 1
+    line_num = 0
+    for mode, address, time in zip(*columns):
+        if (address >> offset_bits) & shard_mask == shard:
+            yield MemoryAccess(line_num, MODE_NAMES[mode], slice_address(address, num_shard_bits, offset_bits), time)
+        line_num += 1
+
+
+def simulate_shard(columns, shard, num_shard_bits, heirarchy_args):
+    heirarchy = create_heirarchy(**heirarchy_args)
+    offset_bits = heirarchy.cache_layers[0].num_bits_offset
+    for mem_access in shard_accesses(columns, shard, num_shard_bits, offset_bits):
+        heirarchy.access(mem_access)
+    return [(cache.num_accesses, cache.num_hits) for cache in heirarchy.cache_layers]
+
+
+def _run_shard(job):
+    shard, num_shard_bits, heirarchy_args = job
+    return simulate_shard(sweep.worker_columns(), shard, num_shard_bits, heirarchy_args)
+
+
+def run_sharded(trace_file, heirarchy_args, num_shards, jobs=None):
+    # Returns the full size heirarchy with merged counters, or None if the heirarchy
+    # cannot be split and the caller should run serially
+    heirarchy = create_heirarchy(**heirarchy_args)
+    num_shard_bits = shard_bits(heirarchy, num_shards)
+    if num_shard_bits == 0:
+        return None
+
+    shard_args = slice_args(heirarchy_args, heirarchy, num_shard_bits)
+    jobs_list = [(shard, num_shard_bits, shard_args) for shard in range(1 << num_shard_bits)]
+
+    if jobs == 1:
+        columns = read_columns(trace_file)
+        results = [simulate_shard(columns, *job) for job in jobs_list]
+    else:
+        with sweep.trace_pool(trace_file, jobs) as pool:
+            results = pool.map(_run_shard, jobs_list, 1)
+
+    # Merge the per level counters back into the full heirarchy
+    for shard_counts in results:
+        for cache, (num_accesses, num_hits) in zip(heirarchy.cache_layers, shard_counts):
+            cache.num_accesses += num_accesses
+            cache.num_hits += num_hits
+    return heirarchy
@@ -0,0 +1,157 @@
+import os
+from memcomponents.access_sequence import MemoryAccess, AccessSequence, ColumnSequence
+from memcomponents.heirarchy import create_heirarchy, STORAGE_ENGINES
+from memcomponents.replacement import REPLACEMENT_POLICIES
+
+# Programmatic interface to the simulator. A Simulator builds its heirarchy once from a
+# SimulatorConfig, runs traces given as files, iterables or columns, and returns plain
+# result objects without printing or formatting anything. Each run counts from zero but
+# starts from the cache contents the last run left, reset() empties the caches in place
+# so one Simulator can be reused for any number of independent runs.
+#
+#   simulator = Simulator(SimulatorConfig(sizes=[512, 2048], cycles=[1, 4], associativity=[4, 4]))
+#   result = simulator.run("traces/example.trace")
+#   result.levels[0].hit_rate, result.total_cycles
+#   simulator.reset()
+
+
+class SimulatorConfig(object):
+
+    def __init__(self, block_size=64, sizes=(32000, 2000000), cycles=(1, 50), associativity=(4, 8),
+                 write_policy="wb+wa", max_misses=0, addr_size=32, storage="dict", replacement_policy="lru", seed=0):
+        # The same defaults as cachesim.py, replacement_policy is one policy or one per level
+        self.block_size = block_size
+        self.sizes = list(sizes)
+        self.cycles = list(cycles)
+        self.associativity = list(associativity)
+        self.write_policy = write_policy
+        self.max_misses = max_misses
+        self.addr_size = addr_size
+        self.storage = storage
+        self.replacement_policy = replacement_policy if isinstance(replacement_policy, str) \
+            else list(replacement_policy)
+        self.seed = seed
+        self.validate()
+
+    def validate(self):
+        num_layers = len(self.sizes)
+        if num_layers < 1:
+            raise ValueError("A heirarchy needs at least one level")
+        if len(self.cycles) != num_layers or len(self.associativity) != num_layers:
+            raise ValueError("sizes, cycles and associativity need one entry per level")
+        if self.write_policy not in ["wb+wa", "wt+nwa"]:
+            raise ValueError("Write policy must be wb+wa or wt+nwa, not " + str(self.write_policy))
+        if self.max_misses < 0:
+            raise ValueError("max_misses must be at least 0, not " + str(self.max_misses))
+        if self.storage not in STORAGE_ENGINES:
+            raise ValueError("Storage must be one of " + ", ".join(STORAGE_ENGINES) + ", not " + str(self.storage))
+        policies = [self.replacement_policy] if isinstance(self.replacement_policy, str) else self.replacement_policy
+        if len(policies) not in [1, num_layers]:
+            raise ValueError("replacement_policy needs one policy or one per level")
+        for policy in policies:
+            if policy not in REPLACEMENT_POLICIES:
+                raise ValueError("Replacement policies must be one of " + ", ".join(REPLACEMENT_POLICIES) +
+                                 ", not " + str(policy))
+
+    def heirarchy_args(self):
+        # Keyword arguments of create_heirarchy
+        policies = self.replacement_policy
+        if not isinstance(policies, str) and len(policies) == 1:
+            policies = policies[0]
+        return dict(block_size=self.block_size, num_layers=len(self.sizes), sizes=list(self.sizes),
+                    cycles=list(self.cycles), associativity=list(self.associativity),
+                    write_policy=self.write_policy, max_misses=self.max_misses, cache_view=0,
+                    addr_size=self.addr_size, storage=self.storage, replacement_policy=policies, seed=self.seed)
+
+    def as_dict(self):
+        return dict(block_size=self.block_size, sizes=list(self.sizes), cycles=list(self.cycles),
+                    associativity=list(self.associativity), write_policy=self.write_policy,
+                    max_misses=self.max_misses, addr_size=self.addr_size, storage=self.storage,
+                    replacement_policy=self.replacement_policy, seed=self.seed)
+
+    @classmethod
+    def from_dict(cls, config):
+        return cls(**config)
+
+
+class LevelResult(object):
+    # Counters of one level, misses_by_class is None unless misses were classified
+    def __init__(self, cache):
+        self.name = cache.name
+        self.latency = cache.latency
+        self.size_bytes = cache.total_size_bytes
+        self.ways = cache.blocks_per_set
+        self.accesses = cache.num_accesses
+        self.hits = cache.num_hits
+        self.misses = cache.num_accesses - cache.num_hits
+        self.hit_rate = cache.hit_rate()
+        self.miss_rate = cache.miss_rate()
+        self.misses_by_class = cache.classifier.breakdown() if cache.classifier is not None else None
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+class SimulationResult(object):
+    # Counters of every level and the access timing of one run
+    def __init__(self, heirarchy, num_accesses, total_cycles, access_cycles):
+        self.levels = [LevelResult(cache) for cache in heirarchy.cache_layers]
+        self.num_accesses = num_accesses
+        # Finish time of the last access to come back, and the time from arrival to finish
+        # of every access added up
+        self.total_cycles = total_cycles
+        self.access_cycles = access_cycles
+        self.stalled_accesses = heirarchy.num_stalls
+        self.stall_cycles = heirarchy.stall_cycles
+        self.peak_occupancy = heirarchy.peak_occupancy
+
+    def average_access_time(self):
+        return float(self.access_cycles) / self.num_accesses if self.num_accesses else 0.0
+
+    def as_dict(self):
+        result = dict(self.__dict__)
+        result["levels"] = [level.as_dict() for level in self.levels]
+        return result
+
+
+class Simulator(object):
+
+    def __init__(self, config):
+        self.config = config
+        self.heirarchy = create_heirarchy(**config.heirarchy_args())
+
+    def run(self, trace):
+        # Runs a trace file, or an iterable of MemoryAccess or (mode, address, arrival time),
+        # and returns the counters and timing of the run
+        if isinstance(trace, (str, os.PathLike)):
+            return self.run_accesses(AccessSequence(os.fspath(trace)))
+        return self.run_accesses(trace)
+
+    def run_columns(self, modes, addresses, times):
+        # Runs (modes, addresses, arrival times) columns with modes 0 for reads and 1 for
+        # writes, e.g. arrays or NumPy arrays, which are turned into Python ints first
+        columns = [column.tolist() if hasattr(column, "dtype") else column for column in (modes, addresses, times)]
+        return self.run_accesses(ColumnSequence(*columns))
+
+    def run_accesses(self, accesses):
+        # Every run starts with the caches as the last one left them and no accesses outstanding
+        heirarchy = self.heirarchy
+        heirarchy.clear_buffer()
+        heirarchy.reset_counters()
+        num_accesses = 0
+        total_cycles = 0
+        access_cycles = 0
+        for mem_access in accesses:
+            if not isinstance(mem_access, MemoryAccess):
+                mode, address, time = mem_access
+                mem_access = MemoryAccess(num_accesses, mode, address, time)
+            heirarchy.access(mem_access)
+            finish_time = mem_access.finish_time()
+            total_cycles = max(total_cycles, finish_time)
+            access_cycles += finish_time - mem_access.arrival_time
+            num_accesses += 1
+        return SimulationResult(heirarchy, num_accesses, total_cycles, access_cycles)
+
+    def reset(self):
+        # Empty every cache and zero every counter in place, without reallocating the sets
+        self.heirarchy.invalidate()
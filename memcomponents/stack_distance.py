@@ -0,0 +1,93 @@
+from memcomponents.utilities import *
+
+
+class SetStacks(object):
+    # Per set LRU stacks for one set count, following LRUSet ordering but with the most
+    # recent tag at the front so a tag's position is its stack distance
+    def __init__(self, num_sets, block_size, depth):
+        self.num_sets = num_sets
+        self.depth = depth
+        self.geometry = address_geometry(num_sets, block_size)
+        self.stacks = [[] for set_index in range(num_sets)]
+        # distances[d] counts accesses found d tags deep, distances[depth] counts the rest
+        self.distances = [0] * (depth + 1)
+
+    def access(self, mem_access):
+        tag, index = mem_access.decode(self.geometry)
+        stack = self.stacks[index]
+        if tag in stack:
+            distance = stack.index(tag)
+            del stack[distance]
+        else:
+            distance = self.depth
+            if len(stack) == self.depth:
+                stack.pop()
+        stack.insert(0, tag)
+        self.distances[distance] += 1
+
+    def hits(self, associativity):
+        return sum(self.distances[:associativity])
+
+
+class StackDistanceSweep(object):
+    # Mattson style single pass over the trace giving the hit counts of every power of two
+    # cache size and associativity for a first level LRU cache. Since LRU has the inclusion
+    # property, an A way cache with S sets hits exactly when the per set stack distance
+    # under S sets is below A. This only holds for wb+wa, where every access allocates
+    def __init__(self, block_size, min_size, max_size, max_associativity):
+        self.block_size = block_size
+        self.num_accesses = 0
+
+        # Same rounding create_heirarchy does
+        self.sizes = []
+        size = adjust_to_standard_size(max(min_size, block_size))
+        while size <= adjust_to_standard_size(max_size):
+            self.sizes.append(size)
+            size *= 2
+
+        self.associativities = []
+        associativity = 1
+        while associativity <= max_associativity:
+            self.associativities.append(associativity)
+            associativity *= 2
+
+        # One set of stacks per distinct set count, deep enough for the most ways it needs
+        self.configs = []
+        depths = {}
+        for size in self.sizes:
+            for associativity in self.associativities:
+                num_sets = size // (block_size * associativity)
+                if num_sets < 1:
+                    continue
+                self.configs.append((size, associativity, num_sets))
+                depths[num_sets] = max(depths.get(num_sets, 0), associativity)
+
+        self.set_stacks = {}
+        for num_sets in sorted(depths):
+            self.set_stacks[num_sets] = SetStacks(num_sets, block_size, depths[num_sets])
+
+    def access(self, mem_access):
+        self.num_accesses += 1
+        for stacks in self.set_stacks.values():
+            stacks.access(mem_access)
+
+    def run(self, sequence):
+        for mem_access in sequence:
+            self.access(mem_access)
+        return self.results()
+
+    def results(self):
+        # Rows of (size, associativity, sets, accesses, hits) for every configuration
+        rows = []
+        for size, associativity, num_sets in self.configs:
+            hits = self.set_stacks[num_sets].hits(associativity)
+            rows.append((size, associativity, num_sets, self.num_accesses, hits))
+        return rows
+
+    def __repr__(self):
+        table = PrettyTable(["Cache Size (KB)", "Ways", "Sets", "Accesses", "Hits", "Misses", "Hit Rate", "Miss Rate"])
+        for size, associativity, num_sets, accesses, hits in self.results():
+            hit_rate = float(hits) / accesses if accesses else 0.0
+            table.add_row([size / 1000, associativity, num_sets, accesses, hits, accesses - hits,
+                           str(int(hit_rate * 100)) + "%", str(int((1.0 - hit_rate) * 100)) + "%"])
+        return "--- Stack Distance Sweep (Block Size " + str(self.block_size) + " B) ---\n" + str(table)
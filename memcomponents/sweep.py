@@ -0,0 +1,134 @@
+import itertools
+import multiprocessing
+from memcomponents.utilities import *
+from memcomponents.access_sequence import ColumnSequence, read_columns
+from memcomponents.trace_format import BinaryTrace, is_binary_trace, is_stream_trace
+from memcomponents.heirarchy import create_heirarchy
+from memcomponents.miss_stream import is_miss_stream, read_miss_stream
+
+# Trace columns, or the miss stream, shared by every task a worker runs, set once per worker process
+_worker_columns = None
+_worker_stream = None
+
+
+def expand_grid(block_sizes, cache_sizes, cache_cycles, set_associativity, write_policies, max_misses):
+    # Every combination of the given values. Per level lists only combine with lists
+    # describing the same number of layers
+    configs = []
+    for block_size, sizes, cycles, associativity, write_policy, misses in itertools.product(
+            block_sizes, cache_sizes, cache_cycles, set_associativity, write_policies, max_misses):
+        if len(sizes) != len(cycles) or len(sizes) != len(associativity):
+            continue
+        configs.append({"block_size": block_size,
+                        "sizes": list(sizes),
+                        "cycles": list(cycles),
+                        "associativity": list(associativity),
+                        "write_policy": write_policy,
+                        "max_misses": misses})
+    return configs
+
+
+def simulate_config(config, sequence):
+    heirarchy = create_heirarchy(num_layers=len(config["sizes"]), cache_view=0, **config)
+
+    # The run takes as long as the last access to come back
+    total_cycles = 0
+    for mem_access in sequence:
+        heirarchy.access(mem_access)
+        total_cycles = max(total_cycles, mem_access.finish_time())
+    return config_row(config, heirarchy, total_cycles)
+
+
+def replay_config(config, stream):
+    # Only the levels below the recorded prefix are simulated
+    heirarchy = create_heirarchy(num_layers=len(config["sizes"]), cache_view=0, **config)
+    return config_row(config, heirarchy, stream.replay(heirarchy))
+
+
+def config_row(config, heirarchy, total_cycles):
+    row = dict(config)
+    for cache in heirarchy.cache_layers:
+        for key, value in cache.stats().items():
+            if key != "name":
+                row[cache.name + "_" + key] = value
+    row["total_cycles"] = total_cycles
+    row["stalled_accesses"] = heirarchy.num_stalls
+    row["stall_cycles"] = heirarchy.stall_cycles
+    row["peak_occupancy"] = heirarchy.peak_occupancy
+    return row
+
+
+def _init_worker(trace_file, columns):
+    global _worker_columns
+    # Binary traces are mapped by each worker, sharing the page cache instead of copying
+    if columns is None:
+        columns = BinaryTrace(trace_file).columns()
+    _worker_columns = columns
+
+
+def is_mappable(trace_file):
+    # Binary trace files can be mapped by every worker, streams can only be read once
+    return not is_stream_trace(trace_file) and is_binary_trace(trace_file)
+
+
+def worker_columns():
+    return _worker_columns
+
+
+def _init_stream_worker(stream):
+    global _worker_stream
+    _worker_stream = stream
+
+
+def worker_pool(jobs, initializer, initargs):
+    # With fork the initializer arguments are inherited copy on write by the workers rather
+    # than pickled to them
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+    return context.Pool(jobs, initializer, initargs)
+
+
+def trace_pool(trace_file, jobs=None):
+    # Text traces and streams are parsed once here
+    columns = None if is_mappable(trace_file) else read_columns(trace_file)
+    return worker_pool(jobs, _init_worker, (trace_file, columns))
+
+
+def _run_worker(job):
+    index, config = job
+    return index, simulate_config(config, ColumnSequence(*_worker_columns))
+
+
+def _run_stream_worker(job):
+    index, config = job
+    return index, replay_config(config, _worker_stream)
+
+
+def run_sweep(trace_file, configs, jobs=None):
+    # trace_file may also be a miss stream, every configuration must then start with its prefix
+    if is_miss_stream(trace_file):
+        return run_stream_sweep(trace_file, configs, jobs)
+
+    if jobs == 1:
+        _init_worker(trace_file, None if is_mappable(trace_file) else read_columns(trace_file))
+        return [simulate_config(config, ColumnSequence(*_worker_columns)) for config in configs]
+
+    rows = [None] * len(configs)
+    with trace_pool(trace_file, jobs) as pool:
+        for index, row in pool.imap_unordered(_run_worker, enumerate(configs)):
+            rows[index] = row
+    return rows
+
+
+def run_stream_sweep(stream_file, configs, jobs=None):
+    stream = read_miss_stream(stream_file)
+    if jobs == 1:
+        return [replay_config(config, stream) for config in configs]
+
+    rows = [None] * len(configs)
+    with worker_pool(jobs, _init_stream_worker, (stream,)) as pool:
+        for index, row in pool.imap_unordered(_run_stream_worker, enumerate(configs)):
+            rows[index] = row
+    return rows
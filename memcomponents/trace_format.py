@@ -0,0 +1,305 @@
+import io
+import os
+import mmap
+import queue
+import struct
+import sys
+import shutil
+import tempfile
+import threading
+import subprocess
+from array import array
+
+# Binary trace layout (all little endian):
+#   header:  magic (8s) | version (H) | reserved (H) | reserved (I) | num accesses (Q) | reserved (Q)
+#   columns: addresses (Q * n) | arrival times (Q * n) | modes (B * n, 0 = read, 1 = write)
+# The 8 byte columns come first so every column is naturally aligned for zero copy views
+TRACE_MAGIC = b'C1541TRC'
+TRACE_VERSION = 1
+HEADER_FORMAT = '<8sHHIQQ'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+MODE_CODES = {'r': 0, 'w': 1}
+MODE_NAMES = ('r', 'w')
+
+
+# Traces read as a stream instead of by path: "-" for stdin, and compressed files which are
+# decompressed on the fly
+STDIN_TRACE = '-'
+COMPRESSED_SUFFIXES = ('.gz', '.xz', '.zst')
+STREAM_BLOCK_SIZE = 1 << 20
+
+
+def is_stream_trace(trace_file):
+    return trace_file == STDIN_TRACE or str(trace_file).endswith(COMPRESSED_SUFFIXES)
+
+
+def trace_exists(trace_file):
+    return trace_file == STDIN_TRACE or os.path.exists(trace_file)
+
+
+def is_binary_trace(trace_file):
+    try:
+        if trace_file == STDIN_TRACE:
+            # Peeking leaves the bytes for the reader, text traces never start like the magic
+            head = sys.stdin.buffer.peek(len(TRACE_MAGIC))[:len(TRACE_MAGIC)]
+            return len(head) > 0 and TRACE_MAGIC.startswith(head)
+        if is_stream_trace(trace_file):
+            with open_trace_stream(trace_file, prefetch=False) as t_file:
+                return t_file.read(len(TRACE_MAGIC)) == TRACE_MAGIC
+        with open(trace_file, 'rb') as t_file:
+            return t_file.read(len(TRACE_MAGIC)) == TRACE_MAGIC
+    except (IOError, OSError, EOFError, ValueError):
+        return False
+
+
+def open_trace_stream(trace_file, prefetch=True, block_size=STREAM_BLOCK_SIZE):
+    # Binary file object over stdin or a decompressed trace. With prefetch the reading and
+    # decompressing happens in a background thread a few blocks ahead of the simulation,
+    # zlib, lzma, zstd and pipe reads all release the GIL so the two overlap
+    if trace_file == STDIN_TRACE:
+        source = sys.stdin.buffer
+    elif trace_file.endswith('.gz'):
+        import gzip
+        source = gzip.open(trace_file, 'rb')
+    elif trace_file.endswith('.xz'):
+        import lzma
+        source = lzma.open(trace_file, 'rb')
+    else:
+        source = open_zstd(trace_file, block_size)
+
+    if not prefetch:
+        return source
+    return io.BufferedReader(PrefetchReader(source, block_size, close_source=trace_file != STDIN_TRACE), block_size)
+
+
+def open_zstd(trace_file, block_size):
+    # Uses the zstandard module if it is installed, otherwise a zstd -dc process
+    try:
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(open(trace_file, 'rb'), read_size=block_size,
+                                                          closefd=True)
+    except ImportError:
+        pass
+    if shutil.which('zstd') is None:
+        raise ValueError("Reading " + str(trace_file) + " needs the zstandard module or the zstd command")
+    return ProcessReader(['zstd', '-dcq', trace_file], block_size)
+
+
+def open_text_trace(trace_file):
+    if is_stream_trace(trace_file):
+        return io.TextIOWrapper(open_trace_stream(trace_file))
+    return open(trace_file, 'r')
+
+
+class ProcessReader(io.RawIOBase):
+    # Standard output of a decompressor process, which is stopped on close
+
+    def __init__(self, command, block_size=STREAM_BLOCK_SIZE):
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=block_size)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self.process.stdout.readinto(buffer)
+        # A corrupt file ends the output early, only the exit status tells
+        if not n and self.process.wait() != 0:
+            raise IOError(" ".join(self.process.args) + " exited with status " + str(self.process.returncode))
+        return n
+
+    def close(self):
+        if not self.closed:
+            self.process.stdout.close()
+            if self.process.poll() is None:
+                self.process.terminate()
+            self.process.wait()
+        super().close()
+
+
+class PrefetchReader(io.RawIOBase):
+    # Raw stream over blocks read from source by a background thread into a bounded queue,
+    # so memory stays constant however long the stream is
+
+    def __init__(self, source, block_size=STREAM_BLOCK_SIZE, depth=4, close_source=True):
+        self.source = source
+        self.block_size = block_size
+        self.close_source = close_source
+        self.blocks = queue.Queue(depth)
+        self.pending = memoryview(b'')
+        self.eof = False
+        self.stopping = False
+        self.thread = threading.Thread(target=self.fill, daemon=True)
+        self.thread.start()
+
+    def fill(self):
+        try:
+            while not self.stopping:
+                block = self.source.read(self.block_size)
+                self.blocks.put(block)
+                if not block:
+                    return
+        except Exception as e:
+            self.blocks.put(e)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending:
+            if self.eof:
+                return 0
+            block = self.blocks.get()
+            if isinstance(block, Exception):
+                self.eof = True
+                raise block
+            if not block:
+                self.eof = True
+                return 0
+            self.pending = memoryview(block)
+
+        n = min(len(buffer), len(self.pending))
+        buffer[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            # Unblock the thread if it is waiting on a full queue, then let it finish
+            self.stopping = True
+            while self.thread.is_alive():
+                try:
+                    self.blocks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            if self.close_source:
+                self.source.close()
+        super().close()
+
+
+def write_binary_trace(out_file, records, chunk_len=1 << 16):
+    return write_binary_columns(out_file, _record_chunks(records, chunk_len))
+
+
+def _record_chunks(records, chunk_len):
+    addresses, times, modes = array('Q'), array('Q'), array('B')
+    for mode, address, time in records:
+        addresses.append(address)
+        times.append(time)
+        modes.append(MODE_CODES[mode.lower()])
+        if len(modes) >= chunk_len:
+            yield modes, addresses, times
+            addresses, times, modes = array('Q'), array('Q'), array('B')
+    yield modes, addresses, times
+
+
+def write_binary_columns(out_file, chunks):
+    # Writes (modes, addresses, arrival times) chunks of any buffers, e.g. arrays or NumPy
+    # arrays, in native byte order. Addresses can go straight to the output since they are
+    # the first column, the other two columns are spooled to temp files until we know how
+    # many accesses there are
+    num_accesses = 0
+    with open(out_file, 'wb') as w_file, tempfile.TemporaryFile() as time_file, \
+            tempfile.TemporaryFile() as mode_file:
+        w_file.write(struct.pack(HEADER_FORMAT, TRACE_MAGIC, TRACE_VERSION, 0, 0, 0, 0))
+
+        for modes, addresses, times in chunks:
+            num_accesses += _flush_columns(w_file, time_file, mode_file, addresses, times, modes)
+
+        # Append the spooled columns and fill in the real count
+        for column_file in [time_file, mode_file]:
+            column_file.seek(0)
+            shutil.copyfileobj(column_file, w_file, 1 << 20)
+        w_file.seek(0)
+        w_file.write(struct.pack(HEADER_FORMAT, TRACE_MAGIC, TRACE_VERSION, 0, 0, num_accesses, 0))
+
+    return num_accesses
+
+
+def _flush_columns(w_file, time_file, mode_file, addresses, times, modes):
+    addresses, times = memoryview(addresses).cast('B'), memoryview(times).cast('B')
+    if sys.byteorder != 'little':
+        addresses, times = array('Q', addresses.tobytes()), array('Q', times.tobytes())
+        addresses.byteswap()
+        times.byteswap()
+    w_file.write(addresses)
+    time_file.write(times)
+    mode_file.write(modes)
+    return len(modes)
+
+
+class BinaryTrace(object):
+
+    def __init__(self, trace_file):
+        # Plain files are mapped, streams can not be and are read into memory whole since the
+        # columns are laid out one after the other
+        self.trace_file = trace_file
+        self.t_file = open_trace_stream(trace_file) if is_stream_trace(trace_file) else open(trace_file, 'rb')
+        header = self.t_file.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            self.t_file.close()
+            raise ValueError("Binary trace " + str(trace_file) + " has a truncated header")
+
+        magic, version, _, _, self.num_accesses, _ = struct.unpack(HEADER_FORMAT, header)
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            self.t_file.close()
+            raise ValueError("File " + str(trace_file) + " is not a version " + str(TRACE_VERSION) + " binary trace")
+
+        expected_size = HEADER_SIZE + 17 * self.num_accesses
+        self.mm = None
+        if expected_size > HEADER_SIZE:
+            if is_stream_trace(trace_file):
+                self.mm = header + self.t_file.read(expected_size - HEADER_SIZE)
+            else:
+                self.mm = mmap.mmap(self.t_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if len(self.mm) < expected_size:
+                self.close()
+                raise ValueError("Binary trace " + str(trace_file) + " is truncated")
+
+    def columns(self):
+        # Zero copy views of (modes, addresses, arrival times) over the mapped file
+        if self.mm is None:
+            return array('B'), array('Q'), array('Q')
+
+        n = self.num_accesses
+        view = memoryview(self.mm)
+        addresses = view[HEADER_SIZE:HEADER_SIZE + 8 * n]
+        times = view[HEADER_SIZE + 8 * n:HEADER_SIZE + 16 * n]
+        modes = view[HEADER_SIZE + 16 * n:HEADER_SIZE + 17 * n]
+        if sys.byteorder != 'little':
+            # Big endian hosts have to pay for a swapped copy
+            addresses, times = array('Q', addresses.tobytes()), array('Q', times.tobytes())
+            addresses.byteswap()
+            times.byteswap()
+            return modes, addresses, times
+        return modes, addresses.cast('Q'), times.cast('Q')
+
+    def as_arrays(self):
+        # Same columns as NumPy arrays, still backed by the mapping
+        import numpy
+        n = self.num_accesses
+        if self.mm is None:
+            return numpy.zeros(0, numpy.uint8), numpy.zeros(0, '<u8'), numpy.zeros(0, '<u8')
+        addresses = numpy.frombuffer(self.mm, '<u8', n, HEADER_SIZE)
+        times = numpy.frombuffer(self.mm, '<u8', n, HEADER_SIZE + 8 * n)
+        modes = numpy.frombuffer(self.mm, numpy.uint8, n, HEADER_SIZE + 16 * n)
+        return modes, addresses, times
+
+    def close(self):
+        if isinstance(self.mm, mmap.mmap):
+            try:
+                self.mm.close()
+            except BufferError:
+                # Views handed out are still alive, the mapping goes away with them
+                pass
+        self.mm = None
+        self.t_file.close()
+
+    def __len__(self):
+        return self.num_accesses
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,215 @@
+import multiprocessing
+import numpy
+from memcomponents.trace_format import MODE_NAMES, write_binary_columns
+
+# Vectorized synthetic traces. Every access is drawn from one of the locality models in the
+# mix, chosen by weight, then with probability reuse_rate replaced by one of the previous
+# reuse_window addresses:
+#   random:  uniform addresses over the whole address space
+#   stride:  num_streams streams, each walking from its own base by stride bytes
+#   zipf:    a hot set of zipf_blocks blocks with Zipfian popularity zipf_alpha
+#   phase:   phases of phase_length accesses, each uniform over its own working set of
+#            phase_blocks blocks
+#
+# The trace is made of chunks of chunk_len accesses and everything random in a chunk comes
+# from generators seeded by (seed, chunk index), so chunks can be made by any number of
+# processes and the trace only depends on the seed and the model. Stride streams restart
+# each chunk where they would be expected to be, and reuse does not reach across chunks.
+
+LOCALITY_MODELS = ("random", "stride", "zipf", "phase")
+
+# Generator stream tags, keep chunk contents, model constants, phases and times independent
+_CHUNK, _CONSTANTS, _PHASE, _TIMES = range(4)
+
+
+class TraceModel(object):
+
+    def __init__(self, mix=None, addr_size=32, block_size=64, reuse_rate=0.3, reuse_window=4096, write_rate=0.5,
+                 timing=0, num_streams=4, stride=64, zipf_blocks=4096, zipf_alpha=1.0, phase_length=100000,
+                 phase_blocks=2048, seed=0, chunk_len=1 << 20):
+        # mix maps model names to weights
+        self.mix = dict(mix or {"random": 1.0})
+        for model in self.mix:
+            if model not in LOCALITY_MODELS:
+                raise ValueError("Locality model must be one of " + ", ".join(LOCALITY_MODELS) + ", not " + str(model))
+        if sum(self.mix.values()) <= 0 or any(weight < 0 for weight in self.mix.values()):
+            raise ValueError("Locality model weights must be positive")
+        if not 0 < addr_size <= 64:
+            raise ValueError("Address size must be between 1 and 64 bits, not " + str(addr_size))
+        if timing not in [0, 1, 2]:
+            raise ValueError("Timing must be 0, 1 or 2, not " + str(timing))
+
+        self.models = list(self.mix)
+        self.weights = numpy.array([self.mix[model] for model in self.models], float)
+        self.weights /= self.weights.sum()
+        self.addr_size = addr_size
+        self.max_address = (1 << addr_size) - 1
+        self.block_size = block_size
+        self.reuse_rate = reuse_rate
+        self.reuse_window = reuse_window
+        self.write_rate = write_rate
+        self.timing = timing
+        self.num_streams = num_streams
+        self.stride = stride
+        self.zipf_blocks = zipf_blocks
+        self.zipf_alpha = zipf_alpha
+        self.phase_length = phase_length
+        self.phase_blocks = phase_blocks
+        self.seed = seed
+        self.chunk_len = chunk_len
+
+        # Stream bases and the hot set are fixed for the whole trace
+        constants = numpy.random.default_rng([seed, _CONSTANTS])
+        self.stream_bases = self.random_blocks(constants, num_streams)
+        self.hot_blocks = self.random_blocks(constants, zipf_blocks)
+        zipf_weights = 1.0 / numpy.arange(1, zipf_blocks + 1) ** zipf_alpha
+        self.zipf_cdf = numpy.cumsum(zipf_weights) / zipf_weights.sum()
+
+    def random_addresses(self, rng, count):
+        return rng.integers(0, self.max_address, count, numpy.uint64, endpoint=True)
+
+    def random_blocks(self, rng, count):
+        return self.random_addresses(rng, count) & numpy.uint64(self.max_address & ~(self.block_size - 1))
+
+    def num_chunks(self, num_accesses):
+        return (num_accesses + self.chunk_len - 1) // self.chunk_len
+
+    def chunk_size(self, num_accesses, chunk_index):
+        return min(self.chunk_len, num_accesses - chunk_index * self.chunk_len)
+
+    def time_increments(self, chunk_index, count):
+        # Time between an access and the next, drawn on their own so chunk offsets are cheap
+        if self.timing == 0:
+            return numpy.ones(count, numpy.uint64)
+        rng = numpy.random.default_rng([self.seed, _TIMES, chunk_index])
+        if self.timing == 1:
+            return rng.integers(1, 6, count, numpy.uint64)
+        return rng.integers(0, 5, count, numpy.uint64)
+
+    def chunk_time_span(self, chunk_index, count):
+        if self.timing == 0:
+            return count
+        return int(self.time_increments(chunk_index, count).sum())
+
+    def chunk(self, chunk_index, count, time_offset=0):
+        # Returns the (modes, addresses, arrival times) columns of one chunk
+        rng = numpy.random.default_rng([self.seed, _CHUNK, chunk_index])
+        start = chunk_index * self.chunk_len
+
+        addresses = numpy.empty(count, numpy.uint64)
+        if len(self.models) == 1:
+            picks = [(self.models[0], slice(None), count)]
+        else:
+            choices = rng.choice(len(self.models), count, p=self.weights)
+            picks = []
+            for i, model in enumerate(self.models):
+                mask = choices == i
+                picks.append((model, mask, int(numpy.count_nonzero(mask))))
+
+        for model, mask, model_count in picks:
+            if model == "random":
+                addresses[mask] = self.random_addresses(rng, model_count)
+            elif model == "stride":
+                addresses[mask] = self.stride_addresses(rng, start, model_count)
+            elif model == "zipf":
+                ranks = numpy.searchsorted(self.zipf_cdf, rng.random(model_count))
+                addresses[mask] = self.hot_blocks[numpy.minimum(ranks, self.zipf_blocks - 1)]
+            else:
+                positions = start + (numpy.arange(count) if model_count == count else numpy.flatnonzero(mask))
+                addresses[mask] = self.phase_addresses(rng, positions)
+
+        if self.reuse_rate > 0:
+            addresses = addresses[self.reuse_sources(rng, count)]
+
+        modes = (rng.random(count) < self.write_rate).astype(numpy.uint8)
+        increments = self.time_increments(chunk_index, count)
+        times = numpy.empty(count, numpy.uint64)
+        times[:1] = time_offset
+        numpy.cumsum(increments[:-1], out=times[1:])
+        times[1:] += numpy.uint64(time_offset)
+        return modes, addresses, times
+
+    def stride_addresses(self, rng, start, count):
+        # Streams pick up where they are expected to be after the accesses before this chunk
+        streams = rng.integers(0, self.num_streams, count)
+        share = self.mix["stride"] / sum(self.mix.values()) / self.num_streams
+        addresses = numpy.empty(count, numpy.uint64)
+        for stream in range(self.num_streams):
+            mask = streams == stream
+            steps = int(start * share) + numpy.arange(numpy.count_nonzero(mask), dtype=numpy.uint64)
+            addresses[mask] = self.stream_bases[stream] + steps * numpy.uint64(self.stride)
+        return addresses & numpy.uint64(self.max_address)
+
+    def phase_addresses(self, rng, positions):
+        phases = positions // self.phase_length
+        addresses = numpy.empty(len(positions), numpy.uint64)
+        for phase in numpy.unique(phases).tolist():
+            mask = phases == phase
+            base = self.random_blocks(numpy.random.default_rng([self.seed, _PHASE, phase]), 1)[0]
+            blocks = rng.integers(0, self.phase_blocks, numpy.count_nonzero(mask), numpy.uint64)
+            addresses[mask] = base + blocks * numpy.uint64(self.block_size)
+        return addresses & numpy.uint64(self.max_address)
+
+    def reuse_sources(self, rng, count):
+        # Index of the access each access copies its address from, following chains of reuse
+        # by pointer jumping so it takes log(chain length) passes
+        positions = numpy.arange(count)
+        reuse = rng.random(count) < self.reuse_rate
+        distances = rng.integers(1, self.reuse_window + 1, count)
+        sources = numpy.where(reuse & (distances <= positions), positions - distances, positions)
+        while True:
+            next_sources = sources[sources]
+            if numpy.array_equal(next_sources, sources):
+                return sources
+            sources = next_sources
+
+
+def format_text(modes, addresses, times, number_base=10, addr_size=32):
+    # The text trace lines of a chunk
+    if number_base == 10:
+        address_strings = map(str, addresses.tolist())
+    elif number_base == 16:
+        address_strings = map('{:x}'.format, addresses.tolist())
+    elif number_base == 2:
+        address_strings = map(('{:0' + str(addr_size) + 'b}').format, addresses.tolist())
+    else:
+        raise ValueError("Number base must be 2, 10 or 16, not " + str(number_base))
+    return ''.join([MODE_NAMES[mode] + " " + address + " " + str(time) + "\n"
+                    for mode, address, time in zip(modes.tolist(), address_strings, times.tolist())])
+
+
+def _make_chunk(job):
+    model, chunk_index, count, time_offset, trace_format, number_base = job
+    modes, addresses, times = model.chunk(chunk_index, count, time_offset)
+    if trace_format == "binary":
+        return modes, addresses, times
+    return format_text(modes, addresses, times, number_base, model.addr_size)
+
+
+def generate_trace(out_file, num_accesses, model, trace_format="text", number_base=10, jobs=1):
+    # Writes the trace and returns the number of accesses. Chunks are made in parallel by jobs
+    # processes and written in order, the file is the same for any number of jobs
+    jobs_list = []
+    time_offset = 0
+    for chunk_index in range(model.num_chunks(num_accesses)):
+        count = model.chunk_size(num_accesses, chunk_index)
+        jobs_list.append((model, chunk_index, count, time_offset, trace_format, number_base))
+        time_offset += model.chunk_time_span(chunk_index, count)
+
+    pool = None
+    if jobs > 1:
+        pool = multiprocessing.get_context('fork').Pool(jobs)
+        chunks = pool.imap(_make_chunk, jobs_list)
+    else:
+        chunks = map(_make_chunk, jobs_list)
+
+    try:
+        if trace_format == "binary":
+            return write_binary_columns(out_file, chunks)
+        with open(out_file, 'w') as w_file:
+            for text in chunks:
+                w_file.write(text)
+        return num_accesses
+    finally:
+        if pool is not None:
+            pool.terminate()
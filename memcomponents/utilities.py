@@ -28,6 +28,23 @@ def adjust_to_standard_size(bytes):
     return 2 ** bits_required(bytes)
 
 
+# Geometries are interned so caches with the same shape share one tuple,
+# which lets a decoded address be reused between them by identity
+_geometries = {}
+
+
+def address_geometry(num_sets, block_size):
+    key = (num_sets, block_size)
+    geometry = _geometries.get(key)
+    if geometry is None:
+        num_bits_offset = bits_required(block_size)
+        num_bits_index = bits_required(num_sets)
+        # (offset shift, index mask, tag shift)
+        geometry = (num_bits_offset, (1 << num_bits_index) - 1, num_bits_offset + num_bits_index)
+        _geometries[key] = geometry
+    return geometry
+
+
 # Convenience dict lookup
 def dict_lookup(dict, key):
     try:
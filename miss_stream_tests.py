@@ -0,0 +1,94 @@
+import os
+import unittest
+from memcomponents.access_sequence import AccessSequence
+from memcomponents.heirarchy import create_heirarchy
+from memcomponents.miss_stream import record_miss_stream, read_miss_stream, is_miss_stream
+from memcomponents.sweep import expand_grid, run_sweep
+from memcomponents.checkpoint import save_checkpoint, restore_checkpoint
+from testutils import TempDirTest, write_trace, simulate
+
+CONFIG = dict(block_size=16, num_layers=3, sizes=[128, 512, 2048], cycles=[1, 4, 10], associativity=[2, 2, 4],
+              write_policy="wb+wa", max_misses=2, cache_view=0)
+
+
+def outcome(heirarchy, total_cycles):
+    return ([(cache.num_accesses, cache.num_hits) for cache in heirarchy.cache_layers],
+            total_cycles, heirarchy.num_stalls, heirarchy.stall_cycles, heirarchy.peak_occupancy)
+
+
+class MissStreamTest(TempDirTest):
+
+    def setUp(self):
+        super().setUp()
+        self.trace_file = self.tmp_path("test.trace")
+        self.stream_file = self.tmp_path("test.mss")
+        # Mostly close to the last address so the top level hits often
+        write_trace(self.trace_file, 3000, max_gap=5, locality=True)
+
+    def test_replay_matches_full_run(self):
+        for write_policy in ["wb+wa", "wt+nwa"]:
+            for max_misses in [0, 2]:
+                for prefix_layers in [1, 2]:
+                    args = dict(CONFIG, write_policy=write_policy, max_misses=max_misses)
+                    record_miss_stream(AccessSequence(self.trace_file), self.stream_file, args, prefix_layers)
+                    stream = read_miss_stream(self.stream_file)
+                    self.assertEqual(stream.num_prefix_layers(), prefix_layers)
+                    self.assertEqual(len(stream), 3000)
+
+                    heirarchy = create_heirarchy(**args)
+                    total_cycles = stream.replay(heirarchy)
+                    self.assertEqual(outcome(heirarchy, total_cycles), outcome(*simulate(self.trace_file, args)))
+
+    def test_lower_levels_vary(self):
+        # One stream of the top level stands in for the trace of different levels below it
+        record_miss_stream(AccessSequence(self.trace_file), self.stream_file, CONFIG, 1)
+        self.assertTrue(is_miss_stream(self.stream_file))
+        self.assertFalse(is_miss_stream(self.trace_file))
+        stream = read_miss_stream(self.stream_file)
+        self.assertLess(len(stream.addresses), len(stream) // 2)
+
+        for sizes, cycles, associativity in [([128, 4096], [1, 20], [2, 8]), ([128, 256, 1024], [1, 3, 30], [2, 1, 2])]:
+            args = dict(CONFIG, num_layers=len(sizes), sizes=sizes, cycles=cycles, associativity=associativity)
+            heirarchy = create_heirarchy(**args)
+            total_cycles = stream.replay(heirarchy)
+            self.assertEqual(outcome(heirarchy, total_cycles), outcome(*simulate(self.trace_file, args)))
+
+    def test_prefix_must_match(self):
+        record_miss_stream(AccessSequence(self.trace_file), self.stream_file, CONFIG, 2)
+        stream = read_miss_stream(self.stream_file)
+        for args in [dict(CONFIG, sizes=[128, 1024, 2048]), dict(CONFIG, cycles=[2, 4, 10]),
+                     dict(CONFIG, write_policy="wt+nwa"), dict(CONFIG, num_layers=2)]:
+            with self.assertRaises(ValueError):
+                stream.replay(create_heirarchy(**args))
+
+        with open(self.stream_file, 'r+b') as s_file:
+            s_file.truncate(os.path.getsize(self.stream_file) - 1)
+        with self.assertRaises(ValueError):
+            read_miss_stream(self.stream_file)
+
+    def test_checkpoint_after_replay(self):
+        # Replayed accesses leave only their finish times in the miss buffer
+        args = dict(CONFIG, num_layers=2, sizes=[128, 512], cycles=[1, 4], associativity=[2, 2])
+        record_miss_stream(AccessSequence(self.trace_file), self.stream_file, args, 1)
+        heirarchy = create_heirarchy(**args)
+        read_miss_stream(self.stream_file).replay(heirarchy)
+        checkpoint_file = self.tmp_path("replayed.ckpt")
+        save_checkpoint(heirarchy, checkpoint_file, len(read_miss_stream(self.stream_file)))
+
+        restored = create_heirarchy(**args)
+        self.assertEqual(restore_checkpoint(restored, checkpoint_file), 3000)
+        self.assertEqual(outcome(restored, 0), outcome(heirarchy, 0))
+        self.assertEqual([entry[:2] for entry in restored.access_buffer],
+                         [entry[:2] for entry in heirarchy.access_buffer])
+        self.assertEqual(str(restored), str(heirarchy))
+
+    def test_sweep_from_stream(self):
+        record_miss_stream(AccessSequence(self.trace_file), self.stream_file, CONFIG, 1)
+        configs = expand_grid([16], [[128, 512], [128, 512, 2048]], [[1, 4], [1, 4, 10]], [[2, 2], [2, 2, 4]],
+                              ["wb+wa"], [0, 2])
+        self.assertEqual(run_sweep(self.stream_file, configs, jobs=1), run_sweep(self.trace_file, configs, jobs=1))
+        self.assertEqual(run_sweep(self.stream_file, configs, jobs=2), run_sweep(self.trace_file, configs, jobs=1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+import time
+import argparse
+from cachesim import args_as_list, args_as_policies, args_as_window, verify_replacement_policies
+from memcomponents.utilities import *
+from memcomponents.trace_format import trace_exists, STDIN_TRACE
+from memcomponents.heirarchy import STORAGE_ENGINES
+from memcomponents.events import EventTracer
+from memcomponents.multicore import create_multicore
+
+
+def verify_args(args):
+    num_layers = int(args.cache_layers)
+    if len(args.trace_files) < 1:
+        show_error_and_exit("--tracefiles needs a trace for every core!")
+    for trace_file in args.trace_files:
+        if not trace_exists(trace_file):
+            show_error_and_exit("The tracefile: " + str(trace_file) + " does not exist!")
+    if args.trace_files.count(STDIN_TRACE) > 1:
+        show_error_and_exit("Only one core can read its trace from stdin!")
+    if len(args.cache_sizes) != num_layers:
+        show_error_and_exit("Length of --cache-sizes must equal the number of layers: " + str(num_layers))
+    if len(args.cache_cycles) != num_layers:
+        show_error_and_exit("Length of --cache-cycles must equal the number of layers: " + str(num_layers))
+    if len(args.set_associativity) != num_layers:
+        show_error_and_exit("Length of --set-associativity must equal the number of layers: " + str(num_layers))
+    if not 1 <= args.shared_layers < num_layers:
+        show_error_and_exit("--shared-layers must leave at least one private layer and share at least one!")
+    if args.write_policy != "wb+wa" and args.write_policy != "wt+nwa":
+        show_error_and_exit("Write policy must be wb+wa or wt+nwa")
+    if args.max_misses < 0:
+        show_error_and_exit("--max-misses must be a number greater than or equal to 0!")
+    if args.port_cycles < 0:
+        show_error_and_exit("--port-cycles must be a number greater than or equal to 0!")
+    if args.debug_level not in [0,1]:
+        show_error_and_exit("--debug argument must be 0 or 1!")
+    if args.cache_view not in [0,1,2,3]:
+        show_error_and_exit("--cache-view argument must be 0, 1, 2, or 3!")
+    if args.storage not in STORAGE_ENGINES:
+        show_error_and_exit("--storage must be one of: " + ", ".join(STORAGE_ENGINES))
+    verify_replacement_policies(args, num_layers)
+    if any(policy != "lru" for policy in args.replacement_policy) and args.storage != "dict":
+        show_error_and_exit("Only lru replacement works with --storage array!")
+    if args.addr_size not in [32,48,64]:
+        show_error_and_exit("--address-size argument must be 32, 48, or 64!")
+    if args.event_format not in ["jsonl", "binary"]:
+        show_error_and_exit("--event-format must be jsonl or binary!")
+    if args.event_every < 1:
+        show_error_and_exit("--event-every must be at least 1!")
+
+
+if __name__ == "__main__":
+    # Add our program arguments
+    parser = argparse.ArgumentParser(description='Multi-core shared cache simulator for COE1541 Project 2')
+    parser.add_argument('-t', '--tracefiles', dest='trace_files', default=[], type=lambda s: s.split(','),
+                        help='Comma separated trace files, one per core, each in arrival time order')
+    parser.add_argument('-b', '--block-size', dest='block_size', action='store',
+                        default=64, type=int,
+                        help='Block size in bytes')
+    parser.add_argument('-l', '--cache-layers', dest='cache_layers', action='store',
+                        default=3, type=int,
+                        help='The desired number of layers in the cache, private and shared')
+    parser.add_argument('-L', '--shared-layers', dest='shared_layers', action='store',
+                        default=1, type=int,
+                        help='Number of the bottom layers shared by every core, the layers above are private')
+    parser.add_argument('-s', '--cache-sizes', dest='cache_sizes', action='store',
+                        default=[32000, 256000, 2000000], type=args_as_list,
+                        help='The cache sizes in bytes')
+    parser.add_argument('-c', '--cache-cycles', dest='cache_cycles', action='store',
+                        default=[1, 10, 50], type=args_as_list,
+                        help='Access latency for each layer of the cache')
+    parser.add_argument('-a', '--set-associativity', dest='set_associativity', action='store',
+                        default=[4, 8, 16], type=args_as_list,
+                        help='Set associativity for each cache')
+    parser.add_argument('-p', '--write-policy', dest='write_policy', action='store',
+                        default='wb+wa', type=str,
+                        help='Write/Allocate policy for all levels of cache. Options <wb+wa,wt+nwa>')
+    parser.add_argument('-m', '--max-misses', dest='max_misses', action='store',
+                        default=0, type=int,
+                        help='Maximum number of outstanding misses of each core. A value of 0 is sequential access')
+    parser.add_argument('-P', '--port-cycles', dest='port_cycles', action='store',
+                        default=0, type=int,
+                        help='Cycles the first shared layer is busy per access, later accesses from any core '
+                             'wait for it. 0 = no contention for the port')
+    parser.add_argument('-d', '--debug-level', dest='debug_level', action='store',
+                        default=1, type=int,
+                        help='Verbosity of debug level. 0 = No Output, 1 = Final Output Tables')
+    parser.add_argument('-v', '--cache-view', dest='cache_view', action='store',
+                        default=0, type=int,
+                        help='How to display the contents of each shared cache. 0 = Stats Only, '
+                             '1 = Dirty Sets Only, 2 = Valid Sets Only,3 = All Sets')
+    parser.add_argument('-w', '--address-size', dest='addr_size', action='store',
+                        default=32, type=int,
+                        help='Width of the memory addresses in bits. Options <32,48,64>')
+    parser.add_argument('-e', '--storage', dest='storage', action='store',
+                        default='dict', type=str,
+                        help='How each cache stores its blocks. Options <dict,array>')
+    parser.add_argument('-r', '--replacement-policy', dest='replacement_policy', action='store',
+                        default=['lru'], type=args_as_policies,
+                        help='Replacement policy for every layer, or a comma separated policy per layer. '
+                             'Options <lru,plru,fifo,random,srrip>')
+    parser.add_argument('--event-trace', dest='event_trace', action='store',
+                        default='', type=str,
+                        help='Stream hit, miss, fill, evict and writeback events of every core to this file, '
+                             'shared layers are numbered after the private ones')
+    parser.add_argument('--event-format', dest='event_format', action='store',
+                        default='jsonl', type=str,
+                        help='Format of the event trace. Options <jsonl,binary>')
+    parser.add_argument('--event-every', dest='event_every', action='store',
+                        default=1, type=int,
+                        help='Only trace every Nth access of each core')
+    parser.add_argument('--event-window', dest='event_window', action='store',
+                        default=None, type=args_as_window,
+                        help='Only trace accesses of each core numbered in start:stop')
+    parser.add_argument('--check-invariants', dest='check_invariants', action='store_true',
+                        help='Check the private layers of every core and the shared layers after every access '
+                             'and stop at the first broken invariant')
+    parser.add_argument('--check-inclusion', dest='check_inclusion', action='store_true',
+                        help='Also check that every layer holds all the blocks of the layer above it, within '
+                             'the private and within the shared layers. Implies --check-invariants')
+    # Parse the arguments
+    args = parser.parse_args()
+
+    # Verify they are correct
+    verify_args(args)
+
+    start_time = time.time()
+    try:
+        multicore = create_multicore(len(args.trace_files), args.block_size, args.cache_layers, args.cache_sizes,
+                                     args.cache_cycles, args.set_associativity, args.write_policy, args.max_misses,
+                                     args.shared_layers, args.cache_view, args.addr_size, args.storage,
+                                     args.replacement_policy, port_cycles=args.port_cycles)
+    except ValueError as e:
+        show_error_and_exit(str(e) + "!")
+
+    # Stream events to a file if asked to, before the invariant checkers which pass them on
+    if args.event_trace:
+        multicore.set_tracer(EventTracer(args.event_trace, args.event_format, args.event_every, args.event_window))
+    if args.check_invariants or args.check_inclusion:
+        multicore.set_invariant_checking(True, args.check_inclusion)
+
+    try:
+        multicore.run(args.trace_files)
+    except ValueError as e:
+        show_error_and_exit(str(e) + "!")
+    finally:
+        # Write out the buffered events even when a broken invariant stops the run
+        if multicore.tracer is not None:
+            multicore.tracer.close()
+
+    if args.debug_level > 0:
+        print("\n\n************** Final Results ******************")
+        print("\n" + str(multicore) + "\n")
+        if multicore.shared.checker is not None:
+            print("Invariants" + (" and inclusion" if args.check_inclusion else "") + " held for " +
+                  str(sum(heirarchy.checker.num_checked for heirarchy in multicore.cores)) + " accesses\n")
+        hours, rem = divmod(time.time() - start_time, 3600)
+        minutes, seconds = divmod(rem, 60)
+        print("Program Finished In Time {:0>2}:{:0>2}:{:05.2f}\n".format(int(hours), int(minutes), seconds))
@@ -0,0 +1,109 @@
+import unittest
+from memcomponents.access_sequence import AccessSequence
+from memcomponents.heirarchy import create_heirarchy
+from memcomponents.events import EventTracer
+from memcomponents.multicore import create_multicore, merge_traces
+from testutils import TempDirTest, write_trace
+
+CONFIG = dict(block_size=16, num_layers=3, sizes=[128, 512, 2048], cycles=[1, 4, 10], associativity=[2, 2, 4],
+              write_policy="wb+wa", max_misses=2)
+
+
+class MultiCoreTest(TempDirTest):
+
+    def setUp(self):
+        super().setUp()
+        self.trace_files = []
+        for core in range(3):
+            trace_file = self.tmp_path("core" + str(core) + ".trace")
+            write_trace(trace_file, 1500, seed=core, address_bits=13, max_gap=3)
+            self.trace_files.append(trace_file)
+
+    def test_merge_order(self):
+        merged = list(merge_traces(self.trace_files))
+        self.assertEqual(len(merged), 3 * 1500)
+        keys = [(mem_access.arrival_time, core) for core, mem_access in merged]
+        self.assertEqual(keys, sorted(keys))
+        for core in range(3):
+            nums = [mem_access.num for merged_core, mem_access in merged if merged_core == core]
+            self.assertEqual(nums, list(range(1500)))
+
+    def test_single_core_matches_heirarchy(self):
+        multicore = create_multicore(1, shared_layers=1, **CONFIG)
+        multicore.run(self.trace_files[:1])
+
+        heirarchy = create_heirarchy(**CONFIG)
+        for mem_access in AccessSequence(self.trace_files[0]):
+            heirarchy.access(mem_access)
+
+        layers = multicore.cores[0].cache_layers + multicore.shared.cache_layers
+        self.assertEqual([(cache.num_accesses, cache.num_hits) for cache in layers],
+                         [(cache.num_accesses, cache.num_hits) for cache in heirarchy.cache_layers])
+        self.assertEqual(multicore.cores[0].stall_cycles, heirarchy.stall_cycles)
+        self.assertEqual(multicore.ownership.cross_evictions, [0])
+
+    def test_shared_counters(self):
+        multicore = create_multicore(3, shared_layers=1, **CONFIG)
+        multicore.run(self.trace_files)
+        shared = multicore.shared.cache_layers[0]
+        self.assertEqual(sum(port.num_accesses for port in multicore.ports), shared.num_accesses)
+        self.assertEqual(sum(port.num_hits for port in multicore.ports), shared.num_hits)
+        for heirarchy, port in zip(multicore.cores, multicore.ports):
+            last = heirarchy.cache_layers[-1]
+            self.assertEqual(port.num_accesses, last.num_accesses - last.num_hits)
+        self.assertGreater(sum(multicore.ownership.cross_evictions), 0)
+        self.assertIn("Lost To Other Cores", str(multicore))
+
+        with self.assertRaises(ValueError):
+            multicore.run(self.trace_files[:2])
+
+    def test_port_contention(self):
+        quiet = create_multicore(3, shared_layers=2, **CONFIG)
+        quiet.run(self.trace_files)
+        busy = create_multicore(3, shared_layers=2, port_cycles=8, **CONFIG)
+        busy.run(self.trace_files)
+
+        self.assertTrue(all(port.contention_cycles == 0 for port in quiet.ports))
+        self.assertTrue(all(port.contention_cycles > 0 for port in busy.ports))
+        # Contention only delays accesses, it never changes what hits
+        self.assertEqual([cache.num_hits for cache in quiet.shared.cache_layers],
+                         [cache.num_hits for cache in busy.shared.cache_layers])
+        self.assertEqual([cache.name for cache in busy.shared.cache_layers], ["L1", "L2"])
+
+    def test_events_and_invariants(self):
+        # A single core streams the same events as the heirarchy it splits, checked or not
+        events = []
+        for checking in [False, True]:
+            event_file = self.tmp_path("multicore" + str(checking) + ".jsonl")
+            multicore = create_multicore(1, shared_layers=2, **CONFIG)
+            multicore.set_tracer(EventTracer(event_file))
+            multicore.set_invariant_checking(checking, inclusion=checking)
+            multicore.run(self.trace_files[:1])
+            multicore.tracer.close()
+            with open(event_file) as e_file:
+                events.append(e_file.read())
+        self.assertEqual(multicore.shared.checker.num_checked, multicore.shared.cache_layers[0].num_accesses)
+
+        event_file = self.tmp_path("heirarchy.jsonl")
+        heirarchy = create_heirarchy(**CONFIG)
+        heirarchy.set_tracer(EventTracer(event_file))
+        for mem_access in AccessSequence(self.trace_files[0]):
+            heirarchy.access(mem_access)
+        heirarchy.tracer.close()
+        with open(event_file) as e_file:
+            events.append(e_file.read())
+        self.assertEqual(events[0], events[2])
+        self.assertEqual(events[1], events[2])
+
+        # Checking every core and the shared levels leaves the ownership counts alone
+        plain = create_multicore(3, shared_layers=1, **CONFIG)
+        plain.run(self.trace_files)
+        checked = create_multicore(3, shared_layers=1, **CONFIG)
+        checked.set_invariant_checking(True)
+        checked.run(self.trace_files)
+        self.assertEqual(checked.ownership.cross_evictions, plain.ownership.cross_evictions)
+        self.assertEqual([heirarchy.checker.num_checked for heirarchy in checked.cores], [1500] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import csv
+import json
+import random
+import tempfile
+import unittest
+from memcomponents.access_sequence import MemoryAccess
+from memcomponents.heirarchy import create_heirarchy
+from memcomponents.profiling import profile_report, write_profile, heatmap, heatmap_string, HEAT_SHADES
+
+
+def make_heirarchy(write_policy="wb+wa", storage="dict"):
+    return create_heirarchy(block_size=16, num_layers=2, sizes=[256, 2048], cycles=[1, 10], associativity=[2, 4],
+                            write_policy=write_policy, max_misses=3, cache_view=0, storage=storage)
+
+
+def run(heirarchy, count=3000):
+    # Returns the summed time from arrival to finish of every access
+    rand = random.Random(5)
+    total_time = 0
+    for num in range(count):
+        mem_access = MemoryAccess(num, 'w' if rand.random() < 0.4 else 'r', rand.randrange(0, 1 << 13), num)
+        heirarchy.access(mem_access)
+        total_time += mem_access.finish_time() - mem_access.arrival_time
+    return total_time
+
+
+class ProfilingTest(unittest.TestCase):
+
+    def test_counters_match_cache(self):
+        for write_policy in ["wb+wa", "wt+nwa"]:
+            for storage in ["dict", "array"]:
+                heirarchy = make_heirarchy(write_policy, storage)
+                heirarchy.set_profiling(True)
+                total_time = run(heirarchy)
+                report = profile_report(heirarchy)
+
+                for cache, level in zip(heirarchy.cache_layers, report["levels"]):
+                    hits = level["read_hits"] + level["write_hits"]
+                    misses = level["read_misses"] + level["write_misses"]
+                    self.assertEqual(hits, cache.num_hits)
+                    self.assertEqual(hits + misses, cache.num_accesses)
+                    self.assertEqual(sum(level["set_accesses"]), cache.num_accesses)
+                    self.assertEqual(sum(level["set_misses"]), misses)
+
+                # Every cycle of every access is attributed to a level, memory or a stall
+                self.assertEqual(report["total_cycles"], total_time)
+
+    def test_write_policies(self):
+        heirarchy = make_heirarchy("wb+wa")
+        heirarchy.set_profiling(True)
+        run(heirarchy)
+        first, last = profile_report(heirarchy)["levels"]
+        self.assertGreater(first["writebacks"], 0)
+        self.assertEqual(first["writebacks"], first["dirty_evictions"])
+        self.assertEqual(last["memory_writes"], 0)
+        self.assertEqual(last["memory_reads"], last["read_misses"] + last["write_misses"])
+
+        heirarchy = make_heirarchy("wt+nwa")
+        heirarchy.set_profiling(True)
+        run(heirarchy)
+        first, last = profile_report(heirarchy)["levels"]
+        self.assertEqual(first["writebacks"], 0)
+        self.assertEqual(last["memory_writes"], last["write_hits"] + last["write_misses"])
+
+    def test_disabled_and_reset(self):
+        profiled, plain = make_heirarchy(), make_heirarchy()
+        profiled.set_profiling(True)
+        self.assertEqual(run(profiled), run(plain))
+        self.assertEqual(str(profiled), str(plain))
+        self.assertIsNone(plain.cache_layers[0].profile)
+
+        profiled.reset_counters()
+        level = profile_report(profiled)["levels"][0]
+        self.assertEqual(level["read_misses"], 0)
+        self.assertEqual(sum(level["set_accesses"]), 0)
+
+        profiled.set_profiling(False)
+        self.assertTrue(all(cache.profile is None for cache in profiled.cache_layers))
+
+    def test_export(self):
+        heirarchy = make_heirarchy()
+        heirarchy.set_profiling(True)
+        run(heirarchy)
+        report = profile_report(heirarchy)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_file = os.path.join(tmp_dir, "profile.json")
+            write_profile(json_file, report)
+            with open(json_file) as r_file:
+                self.assertEqual(json.load(r_file), report)
+
+            csv_file = os.path.join(tmp_dir, "profile.csv")
+            write_profile(csv_file, report)
+            with open(csv_file, newline='') as r_file:
+                rows = list(csv.DictReader(r_file))
+        level = report["levels"][1]
+        values = dict(((row["level"], row["set"], row["counter"]), int(row["value"])) for row in rows)
+        self.assertEqual(values[("L1", "", "dirty_evictions")], level["dirty_evictions"])
+        self.assertEqual(values[("L1", "3", "misses")], level["set_misses"][3])
+        self.assertEqual(values[("", "", "total_cycles")], report["total_cycles"])
+
+    def test_heatmap(self):
+        self.assertEqual(heatmap([0, 4, 2, 8], width=2), "0 |" + HEAT_SHADES[0] + HEAT_SHADES[5] + "|\n"
+                                                          "2 |" + HEAT_SHADES[3] + HEAT_SHADES[-1] + "|")
+        # More sets than cells are added up in runs
+        lines = heatmap([1] * 4096, width=64).split("\n")
+        self.assertEqual(len(lines), 16)
+        self.assertTrue(lines[1].startswith(" 256 |"))
+
+        heirarchy = make_heirarchy()
+        heirarchy.set_profiling(True)
+        run(heirarchy)
+        self.assertIn("Conflict Heatmap: L1", heatmap_string(heirarchy, 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from memcomponents.cache import Block
+from memcomponents.heirarchy import create_heirarchy
+from memcomponents.access_sequence import MemoryAccess
+from memcomponents.replacement import FIFOSet, PLRUSet, SRRIPSet, set_factory
+
+
+def fill(cache_set, tags):
+    evicted = []
+    for tag in tags:
+        if cache_set[tag] is None:
+            block = cache_set.__setitem__(tag, Block(tag, True, False, tag))
+            evicted.append(block.tag if block else None)
+        else:
+            evicted.append('hit')
+    return evicted
+
+
+class ReplacementPolicyTest(unittest.TestCase):
+
+    def test_fifo(self):
+        # Hits do not protect a block under FIFO
+        self.assertEqual(fill(FIFOSet(0, 2), [1, 2, 1, 3, 1]), [None, None, 'hit', 1, 2])
+
+    def test_plru(self):
+        cache_set = PLRUSet(0, 4)
+        self.assertEqual(fill(cache_set, [1, 2, 3, 4]), [None] * 4)
+        # Touching 1 points the tree at the 3/4 half, then at 3 since 4 was used last
+        self.assertEqual(fill(cache_set, [1, 5]), ['hit', 3])
+        self.assertEqual(fill(cache_set, [6]), [2])
+        self.assertRaises(ValueError, PLRUSet, 0, 3)
+
+    def test_srrip(self):
+        cache_set = SRRIPSet(0, 2)
+        self.assertEqual(fill(cache_set, [1, 2, 1]), [None, None, 'hit'])
+        # 2 was never reused so it ages out first, 3 then comes in at a distant prediction
+        self.assertEqual(fill(cache_set, [3, 4]), [2, 3])
+
+    def test_random_is_seeded(self):
+        first = [fill(set_factory("random", 7)(0, 4), range(50)) for i in range(2)]
+        self.assertEqual(first[0], first[1])
+
+    def test_heirarchy_policies(self):
+        for policy in ["lru", "plru", "fifo", "random", "srrip"]:
+            heirarchy = create_heirarchy(block_size=16, num_layers=2, sizes=[256, 1024], cycles=[1, 10],
+                                         associativity=[4, 8], write_policy="wb+wa", max_misses=0,
+                                         cache_view=3, replacement_policy=[policy, "lru"])
+            for num in range(500):
+                heirarchy.access(MemoryAccess(num, 'rw'[num % 2], (num * 7919) % 4096, num))
+            self.assertEqual(heirarchy.cache_layers[0].replacement_policy, policy)
+            self.assertTrue(str(heirarchy))
+
+        self.assertRaises(ValueError, create_heirarchy, 16, 1, [256], [1], [4], "wb+wa", 0,
+                          storage="array", replacement_policy="fifo")
+        self.assertRaises(ValueError, create_heirarchy, 16, 1, [256], [1], [4], "wb+wa", 0, replacement_policy="mru")
+
+
+if __name__ == '__main__':
+    unittest.main()
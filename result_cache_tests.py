@@ -0,0 +1,111 @@
+import os
+import time
+import unittest
+import multiprocessing
+from memcomponents.result_cache import ResultCache, heirarchy_result, RESULT_SUFFIX, STALE_TMP_SECONDS
+from testutils import TempDirTest, write_trace, simulate
+
+HEIRARCHY_ARGS = dict(block_size=16, num_layers=2, sizes=[256, 2048], cycles=[1, 10], associativity=[2, 4],
+                      write_policy="wb+wa", max_misses=3, cache_view=2, addr_size=32, storage="dict",
+                      replacement_policy="lru")
+
+
+def simulated_result(trace_file, heirarchy_args):
+    return heirarchy_result(simulate(trace_file, heirarchy_args)[0])
+
+
+def _store(job):
+    cache_dir, trace_file, cycles = job
+    result_cache = ResultCache(cache_dir)
+    args = dict(HEIRARCHY_ARGS, cycles=[1, cycles])
+    key = result_cache.key(trace_file, args)
+    result_cache.put(key, simulated_result(trace_file, args))
+    return key
+
+
+class ResultCacheTest(TempDirTest):
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = self.tmp_path("results")
+        self.trace_file = self.tmp_path("run.trace")
+        write_trace(self.trace_file, 500)
+
+    def test_round_trip(self):
+        result_cache = ResultCache(self.cache_dir)
+        key = result_cache.key(self.trace_file, HEIRARCHY_ARGS)
+        self.assertIsNone(result_cache.get(key))
+        result = simulated_result(self.trace_file, HEIRARCHY_ARGS)
+        result_cache.put(key, result)
+        self.assertEqual(ResultCache(self.cache_dir).get(key), result)
+        self.assertIn(" *** Cache: L1 ***", result["report"])
+
+    def test_key_normalization(self):
+        result_cache = ResultCache(self.cache_dir)
+        key = result_cache.key(self.trace_file, HEIRARCHY_ARGS)
+        # Rounded sizes, the storage engine and the cache view do not change the results
+        self.assertEqual(key, result_cache.key(self.trace_file, dict(HEIRARCHY_ARGS, sizes=[200, 2000])))
+        self.assertEqual(key, result_cache.key(self.trace_file, dict(HEIRARCHY_ARGS, storage="array", cache_view=0)))
+        self.assertEqual(key, result_cache.key(self.trace_file, dict(HEIRARCHY_ARGS, replacement_policy=["lru"] * 2,
+                                                                     seed=5)))
+        self.assertNotEqual(key, result_cache.key(self.trace_file, dict(HEIRARCHY_ARGS, max_misses=4)))
+        self.assertNotEqual(result_cache.key(self.trace_file, dict(HEIRARCHY_ARGS, replacement_policy="random")),
+                            result_cache.key(self.trace_file, dict(HEIRARCHY_ARGS, replacement_policy="random",
+                                                                   seed=5)))
+
+        # The same contents anywhere give the same key, different contents a new one
+        copy_file = self.tmp_path("copy.trace")
+        write_trace(copy_file, 500)
+        self.assertEqual(key, result_cache.key(copy_file, HEIRARCHY_ARGS))
+        time.sleep(0.01)
+        write_trace(self.trace_file, 500, seed=1)
+        self.assertNotEqual(key, result_cache.key(self.trace_file, HEIRARCHY_ARGS))
+
+    def test_lru_eviction(self):
+        result_cache = ResultCache(self.cache_dir)
+        keys = []
+        for cycles in range(10, 16):
+            keys.append(_store((self.cache_dir, self.trace_file, cycles)))
+            time.sleep(0.01)
+        entry_bytes = os.path.getsize(os.path.join(self.cache_dir, keys[0] + RESULT_SUFFIX))
+
+        # Use the oldest entry, then shrink the cache to about three entries
+        result_cache.get(keys[0])
+        result_cache.max_bytes = entry_bytes * 3 + 100
+        result_cache.evict()
+        kept = [key for key in keys if result_cache.get(key) is not None]
+        self.assertIn(keys[0], kept)
+        self.assertIn(keys[-1], kept)
+        self.assertNotIn(keys[1], kept)
+        self.assertLessEqual(len(kept), 3)
+
+    def test_temporary_files(self):
+        # Leftovers of dead writers are deleted once stale, fresh ones count towards the limit
+        result_cache = ResultCache(self.cache_dir)
+        key = _store((self.cache_dir, self.trace_file, 10))
+        stale_file = os.path.join(self.cache_dir, "dead.tmp")
+        fresh_file = os.path.join(self.cache_dir, "running.tmp")
+        for tmp_file in [stale_file, fresh_file]:
+            with open(tmp_file, 'w') as w_file:
+                w_file.write("x" * 4096)
+        os.utime(stale_file, (time.time() - STALE_TMP_SECONDS - 1,) * 2)
+
+        result_cache.max_bytes = 4096 + 100
+        result_cache.evict()
+        self.assertFalse(os.path.exists(stale_file))
+        self.assertTrue(os.path.exists(fresh_file))
+        self.assertIsNone(result_cache.get(key))
+
+    def test_concurrent_writers(self):
+        jobs = [(self.cache_dir, self.trace_file, 10 + i % 4) for i in range(16)]
+        with multiprocessing.get_context('fork').Pool(4) as pool:
+            keys = pool.map(_store, jobs)
+        result_cache = ResultCache(self.cache_dir)
+        for key, (cache_dir, trace_file, cycles) in zip(keys, jobs):
+            self.assertEqual(result_cache.get(key), simulated_result(self.trace_file,
+                                                                     dict(HEIRARCHY_ARGS, cycles=[1, cycles])))
+        self.assertFalse([name for name in os.listdir(self.cache_dir) if name.endswith(".tmp")])
+
+
+if __name__ == '__main__':
+    unittest.main()
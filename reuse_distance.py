@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+from memcomponents.utilities import *
+from memcomponents.access_sequence import AccessSequence
+from memcomponents.trace_format import trace_exists
+from memcomponents.reuse_distance import ReuseHistogram
+
+
+def verify_args(args):
+    if not trace_exists(args.trace_file):
+        show_error_and_exit("The tracefile: " + str(args.trace_file) + " does not exist!")
+    if args.block_size < 1 or args.block_size & (args.block_size - 1):
+        show_error_and_exit("--block-size must be a power of two!")
+    if args.num_sets is not None and (args.num_sets < 1 or args.num_sets & (args.num_sets - 1)):
+        show_error_and_exit("--sets must be a power of two!")
+
+
+def write_curves(out_file, histogram):
+    # Misses of every fully associative capacity, and of every associativity with --sets
+    with open(out_file, 'w', newline='') as w_file:
+        writer = csv.writer(w_file)
+        writer.writerow(["sets", "ways", "blocks", "size_bytes", "accesses", "misses"])
+        for blocks, misses in histogram.miss_curve():
+            writer.writerow([1, blocks, blocks, blocks * histogram.block_size, histogram.num_accesses, misses])
+        if histogram.num_sets is not None:
+            for ways, misses in histogram.set_miss_curve():
+                blocks = ways * histogram.num_sets
+                writer.writerow([histogram.num_sets, ways, blocks, blocks * histogram.block_size,
+                                 histogram.num_accesses, misses])
+
+
+def write_histogram(out_file, histogram):
+    # Accesses at every distance, cold first accesses as an empty distance
+    set_distances = histogram.set_distance_counts() if histogram.num_sets is not None else []
+    with open(out_file, 'w', newline='') as w_file:
+        writer = csv.writer(w_file)
+        writer.writerow(["distance", "accesses", "set_accesses"])
+        writer.writerow(["", histogram.cold, sum(histogram.set_cold) if histogram.num_sets is not None else ""])
+        for distance in range(max(len(histogram.distances), len(set_distances))):
+            writer.writerow([distance,
+                             histogram.distances[distance] if distance < len(histogram.distances) else 0,
+                             set_distances[distance] if distance < len(set_distances) else ""])
+
+
+if __name__ == "__main__":
+    # Add our program arguments
+    parser = argparse.ArgumentParser(description='Reuse distance histogram and LRU miss rate curves for '
+                                                 'COE1541 Project 2')
+    parser.add_argument('-t', '--tracefile', dest='trace_file', default='', type=str,
+                        help='The path to the tracefile for the memory accesses')
+    parser.add_argument('-b', '--block-size', dest='block_size', action='store',
+                        default=64, type=int,
+                        help='Block size in bytes')
+    parser.add_argument('-n', '--sets', dest='num_sets', action='store',
+                        default=None, type=int,
+                        help='Also histogram distances within each set for this many sets, giving the miss '
+                             'rate of every associativity')
+    parser.add_argument('-o', '--output', dest='out_file', default='', type=str,
+                        help='Optional CSV file to write the misses of every capacity to')
+    parser.add_argument('-H', '--histogram', dest='histogram_file', default='', type=str,
+                        help='Optional CSV file to write the accesses at every reuse distance to')
+    # Parse the arguments
+    args = parser.parse_args()
+
+    # Verify they are correct
+    verify_args(args)
+
+    # Every capacity in one pass
+    histogram = ReuseHistogram(args.block_size, args.num_sets).run(AccessSequence(args.trace_file))
+
+    print(histogram)
+    if args.out_file:
+        write_curves(args.out_file, histogram)
+    if args.histogram_file:
+        write_histogram(args.histogram_file, histogram)
@@ -0,0 +1,58 @@
+import random
+import unittest
+from memcomponents.access_sequence import MemoryAccess
+from memcomponents.heirarchy import create_heirarchy
+from memcomponents.reuse_distance import ReuseTracker, ReuseHistogram
+
+
+def make_accesses(count=3000, seed=7):
+    rand = random.Random(seed)
+    accesses = []
+    for num in range(count):
+        address = rand.randrange(0, 1 << 13) if rand.random() < 0.8 else rand.randrange(0, 1 << 32)
+        accesses.append(MemoryAccess(num, 'w' if rand.random() < 0.4 else 'r', address, num))
+    return accesses
+
+
+def simulate_misses(size, associativity):
+    heirarchy = create_heirarchy(block_size=32, num_layers=1, sizes=[size], cycles=[1],
+                                 associativity=[associativity], write_policy="wb+wa", max_misses=0)
+    for mem_access in make_accesses():
+        heirarchy.access(mem_access)
+    cache = heirarchy.cache_layers[0]
+    return cache.num_accesses - cache.num_hits
+
+
+class ReuseDistanceTest(unittest.TestCase):
+
+    def test_matches_lru_stack(self):
+        # A small starting capacity so the tree is compacted and grown many times
+        tracker = ReuseTracker(capacity=4)
+        stack = []
+        rand = random.Random(1)
+        for i in range(5000):
+            block = rand.randrange(0, 300) if rand.random() < 0.9 else rand.randrange(0, 5000)
+            expected = stack.index(block) if block in stack else None
+            if expected is not None:
+                del stack[expected]
+            stack.insert(0, block)
+            self.assertEqual(tracker.access(block), expected)
+        self.assertLessEqual(tracker.capacity, 4 * len(stack))
+
+    def test_fully_associative_curve(self):
+        histogram = ReuseHistogram(32).run(make_accesses())
+        curve = dict(histogram.miss_curve())
+        for blocks in [1, 4, 16, 64]:
+            self.assertEqual(curve[blocks], simulate_misses(blocks * 32, blocks))
+        self.assertEqual(histogram.miss_curve()[-1][1], histogram.cold)
+
+    def test_set_associative_curve(self):
+        histogram = ReuseHistogram(32, num_sets=8).run(make_accesses())
+        curve = dict(histogram.set_miss_curve())
+        for ways in [1, 2, 4, 8]:
+            self.assertEqual(curve[ways], simulate_misses(8 * ways * 32, ways))
+        self.assertEqual(sum(histogram.set_cold), histogram.cold)
+
+
+if __name__ == '__main__':
+    unittest.main()
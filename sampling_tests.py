@@ -0,0 +1,49 @@
+import unittest
+from memcomponents.access_sequence import AccessSequence
+from memcomponents.heirarchy import create_heirarchy
+from memcomponents.sampling import ratio_estimate, sample_sets, sample_time
+from testutils import BasicTraceTest, basic_heirarchy_args as heirarchy_args, full_counters
+
+
+class SamplingTest(BasicTraceTest):
+
+    def run_full(self, write_policy):
+        return full_counters(self.trace_file, heirarchy_args(write_policy))
+
+    def test_all_sets_is_exact(self):
+        for write_policy in ["wb+wa", "wt+nwa"]:
+            estimates = sample_sets(self.trace_file, heirarchy_args(write_policy), 1.0)
+            self.assertEqual([(e["accesses"], e["hits"]) for e in estimates], self.run_full(write_policy))
+            self.assertEqual([e["ci"] for e in estimates], [0.0] * 3)
+
+    def test_whole_windows_are_exact(self):
+        for write_policy in ["wb+wa", "wt+nwa"]:
+            estimates = sample_time(self.trace_file, heirarchy_args(write_policy), 7, 7)
+            self.assertEqual([(e["accesses"], e["hits"]) for e in estimates], self.run_full(write_policy))
+
+    def test_warm_matches_access(self):
+        # Fully warmed windows see exactly the hits of the full run in those windows
+        for write_policy in ["wb+wa", "wt+nwa"]:
+            full = create_heirarchy(**heirarchy_args(write_policy))
+            window_counts = [[0, 0] for cache in full.cache_layers]
+            for mem_access in AccessSequence(self.trace_file):
+                before = [(cache.num_accesses, cache.num_hits) for cache in full.cache_layers]
+                full.access(mem_access)
+                if mem_access.num % 5 >= 3:
+                    for counts, cache, (accesses, hits) in zip(window_counts, full.cache_layers, before):
+                        counts[0] += cache.num_accesses - accesses
+                        counts[1] += cache.num_hits - hits
+
+            estimates = sample_time(self.trace_file, heirarchy_args(write_policy), 5, 2)
+            self.assertEqual([(e["sampled_accesses"], round(e["hit_rate"] * e["sampled_accesses"]))
+                              for e in estimates], [tuple(counts) for counts in window_counts])
+
+    def test_ratio_estimate(self):
+        rate, half_width = ratio_estimate([(100, 50), (100, 60), (200, 90)], 0.5)
+        self.assertAlmostEqual(rate, 0.5)
+        self.assertGreater(half_width, 0.0)
+        self.assertIsNone(ratio_estimate([(100, 50)], 0.5)[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
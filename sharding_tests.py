@@ -0,0 +1,36 @@
+import unittest
+from memcomponents.heirarchy import create_heirarchy
+from memcomponents.sharding import run_sharded, shard_bits, slice_address
+from testutils import BasicTraceTest, basic_heirarchy_args as heirarchy_args, full_counters
+
+
+class ShardingTest(BasicTraceTest):
+
+    def assert_matches_serial(self, write_policy, num_shards, jobs):
+        sharded = run_sharded(self.trace_file, heirarchy_args(write_policy), num_shards, jobs)
+        self.assertEqual([(cache.num_accesses, cache.num_hits) for cache in sharded.cache_layers],
+                         full_counters(self.trace_file, heirarchy_args(write_policy)))
+
+    def test_sharded_wbwa(self):
+        self.assert_matches_serial("wb+wa", 8, 1)
+
+    def test_sharded_wtnwa(self):
+        self.assert_matches_serial("wt+nwa", 4, 1)
+
+    def test_sharded_pool(self):
+        self.assert_matches_serial("wb+wa", 4, 2)
+
+    def test_shard_bits(self):
+        heirarchy = create_heirarchy(**heirarchy_args("wb+wa"))
+        # 64 sets at L0, 64 at L1 and 64 at L2
+        self.assertEqual(shard_bits(heirarchy, 6), 2)
+        self.assertEqual(shard_bits(heirarchy, 1000), 6)
+        # Offset 0b11, slice 0b10 and tag 0b101 of 2 slice bits
+        self.assertEqual(slice_address(0b1011011, 2, 2), 0b10111)
+
+        args = dict(heirarchy_args("wb+wa"), associativity=[1, 2, 256])
+        self.assertIsNone(run_sharded(self.trace_file, args, 4, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
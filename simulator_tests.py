@@ -0,0 +1,101 @@
+import os
+import random
+import tempfile
+import unittest
+from array import array
+from memcomponents.access_sequence import MemoryAccess
+from memcomponents.heirarchy import create_heirarchy
+from memcomponents.simulator import Simulator, SimulatorConfig
+
+CONFIG = dict(block_size=16, sizes=[256, 2048], cycles=[1, 10], associativity=[2, 4], max_misses=3)
+
+
+def make_records(count=2000, seed=4):
+    rand = random.Random(seed)
+    return [('w' if rand.random() < 0.3 else 'r', rand.randrange(0, 1 << 13), num * 2) for num in range(count)]
+
+
+class SimulatorTest(unittest.TestCase):
+
+    def expected(self, records):
+        heirarchy = create_heirarchy(block_size=16, num_layers=2, sizes=[256, 2048], cycles=[1, 10],
+                                     associativity=[2, 4], write_policy="wb+wa", max_misses=3)
+        finish_times = []
+        for num, (mode, address, time) in enumerate(records):
+            mem_access = MemoryAccess(num, mode, address, time)
+            heirarchy.access(mem_access)
+            finish_times.append(mem_access.finish_time())
+        return heirarchy, finish_times
+
+    def test_inputs_agree(self):
+        records = make_records()
+        heirarchy, finish_times = self.expected(records)
+        counters = [(cache.num_accesses, cache.num_hits) for cache in heirarchy.cache_layers]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            trace_file = os.path.join(tmp_dir, "run.trace")
+            with open(trace_file, 'w') as w_file:
+                w_file.writelines(mode + " " + str(address) + " " + str(time) + "\n"
+                                  for mode, address, time in records)
+
+            simulator = Simulator(SimulatorConfig(**CONFIG))
+            results = [simulator.run(trace_file)]
+            simulator.reset()
+            results.append(simulator.run(iter(records)))
+            simulator.reset()
+            results.append(simulator.run_columns(array('B', [mode == 'w' for mode, address, time in records]),
+                                                 array('Q', [address for mode, address, time in records]),
+                                                 array('Q', [time for mode, address, time in records])))
+
+        for result in results:
+            self.assertEqual([(level.accesses, level.hits) for level in result.levels], counters)
+            self.assertEqual(result.num_accesses, len(records))
+            self.assertEqual(result.total_cycles, max(finish_times))
+            self.assertEqual(result.access_cycles, sum(finish - time for finish, (mode, address, time)
+                                                       in zip(finish_times, records)))
+            self.assertEqual(result.stall_cycles, heirarchy.stall_cycles)
+            self.assertEqual(result.as_dict(), results[0].as_dict())
+
+    def test_runs_continue_from_cache_contents(self):
+        records = make_records()
+        simulator = Simulator(SimulatorConfig(**CONFIG))
+        cold = simulator.run(records[:1000])
+        warm = simulator.run(records[:1000])
+        self.assertEqual(warm.levels[0].accesses, 1000)
+        self.assertGreater(warm.levels[1].hits, cold.levels[1].hits)
+
+        # Timed like a heirarchy warmed without timing, nothing waits behind the last run
+        heirarchy = create_heirarchy(**SimulatorConfig(**CONFIG).heirarchy_args())
+        for num, (mode, address, time) in enumerate(records[:1000]):
+            heirarchy.warm(MemoryAccess(num, mode, address, time))
+        heirarchy.reset_counters()
+        total_cycles = 0
+        for num, (mode, address, time) in enumerate(records[:1000]):
+            mem_access = MemoryAccess(num, mode, address, time)
+            heirarchy.access(mem_access)
+            total_cycles = max(total_cycles, mem_access.finish_time())
+        self.assertEqual((warm.total_cycles, warm.stalled_accesses, warm.stall_cycles, warm.peak_occupancy),
+                         (total_cycles, heirarchy.num_stalls, heirarchy.stall_cycles, heirarchy.peak_occupancy))
+        self.assertEqual([level.hits for level in warm.levels], [cache.num_hits for cache in heirarchy.cache_layers])
+
+        simulator.reset()
+        self.assertEqual(simulator.run(records[:1000]).as_dict(), cold.as_dict())
+
+    def test_config(self):
+        config = SimulatorConfig(**CONFIG)
+        self.assertEqual(SimulatorConfig.from_dict(config.as_dict()).heirarchy_args(), config.heirarchy_args())
+        with self.assertRaises(ValueError):
+            SimulatorConfig(sizes=[256], cycles=[1, 2], associativity=[1])
+        with self.assertRaises(ValueError):
+            SimulatorConfig(write_policy="wb")
+        with self.assertRaises(ValueError):
+            SimulatorConfig(replacement_policy=["lru", "mru"])
+
+    def test_errors_are_raised(self):
+        simulator = Simulator(SimulatorConfig(**CONFIG))
+        with self.assertRaises(ValueError):
+            simulator.run([('r', 1 << 40, 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import random
+import unittest
+from memcomponents.access_sequence import MemoryAccess
+from memcomponents.heirarchy import create_heirarchy
+from memcomponents.stack_distance import StackDistanceSweep
+
+
+def make_accesses(count=3000, seed=11):
+    rand = random.Random(seed)
+    accesses = []
+    for num in range(count):
+        address = rand.randrange(0, 1 << 14) if rand.random() < 0.7 else rand.randrange(0, 1 << 32)
+        accesses.append(MemoryAccess(num, 'w' if rand.random() < 0.4 else 'r', address, num))
+    return accesses
+
+
+class StackDistanceTest(unittest.TestCase):
+
+    def test_matches_simulation(self):
+        sweep = StackDistanceSweep(32, 256, 16384, 8)
+        sweep.run(make_accesses())
+        self.assertEqual(len(sweep.results()), 7 * 4)
+
+        for size, associativity, num_sets, accesses, hits in sweep.results():
+            heirarchy = create_heirarchy(block_size=32, num_layers=1, sizes=[size], cycles=[1],
+                                         associativity=[associativity], write_policy="wb+wa", max_misses=0)
+            for mem_access in make_accesses():
+                heirarchy.access(mem_access)
+            cache = heirarchy.cache_layers[0]
+            self.assertEqual(cache.total_sets, num_sets)
+            self.assertEqual((cache.num_accesses, cache.num_hits), (accesses, hits))
+
+    def test_skips_impossible_configs(self):
+        sweep = StackDistanceSweep(64, 64, 128, 4)
+        self.assertEqual([(size, ways) for size, ways, _ in sweep.configs], [(64, 1), (128, 1), (128, 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
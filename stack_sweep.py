@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+from memcomponents.utilities import *
+from memcomponents.access_sequence import AccessSequence
+from memcomponents.trace_format import trace_exists
+from memcomponents.stack_distance import StackDistanceSweep
+
+
+def verify_args(args):
+    if not trace_exists(args.trace_file):
+        show_error_and_exit("The tracefile: " + str(args.trace_file) + " does not exist!")
+    if args.min_size < 1 or args.max_size < args.min_size:
+        show_error_and_exit("--min-size must be positive and no larger than --max-size!")
+    if args.max_associativity < 1:
+        show_error_and_exit("--max-associativity must be at least 1!")
+    if args.write_policy != "wb+wa":
+        show_error_and_exit("Stack distance sweeps need every access to allocate, only wb+wa is supported")
+
+
+def write_csv(out_file, sweep):
+    with open(out_file, 'w', newline='') as w_file:
+        writer = csv.writer(w_file)
+        writer.writerow(["size_bytes", "ways", "sets", "block_size", "accesses", "hits", "misses"])
+        for size, associativity, num_sets, accesses, hits in sweep.results():
+            writer.writerow([size, associativity, num_sets, sweep.block_size, accesses, hits, accesses - hits])
+
+
+if __name__ == "__main__":
+    # Add our program arguments
+    parser = argparse.ArgumentParser(description='Single pass L1 size and associativity sweep for COE1541 Project 2')
+    parser.add_argument('-t', '--tracefile', dest='trace_file', default='', type=str,
+                        help='The path to the tracefile for the memory accesses')
+    parser.add_argument('-b', '--block-size', dest='block_size', action='store',
+                        default=64, type=int,
+                        help='Block size in bytes')
+    parser.add_argument('--min-size', dest='min_size', action='store',
+                        default=1024, type=int,
+                        help='Smallest cache size in bytes, rounded up to a power of two')
+    parser.add_argument('--max-size', dest='max_size', action='store',
+                        default=2000000, type=int,
+                        help='Largest cache size in bytes, rounded up to a power of two')
+    parser.add_argument('-a', '--max-associativity', dest='max_associativity', action='store',
+                        default=16, type=int,
+                        help='Largest associativity to report, every power of two up to it is included')
+    parser.add_argument('-p', '--write-policy', dest='write_policy', action='store',
+                        default='wb+wa', type=str,
+                        help='Write/Allocate policy of the cache. Only wb+wa is stack inclusive')
+    parser.add_argument('-o', '--output', dest='out_file', default='', type=str,
+                        help='Optional CSV file to write the results to')
+    # Parse the arguments
+    args = parser.parse_args()
+
+    # Verify they are correct
+    verify_args(args)
+
+    # Sweep every configuration in one pass
+    sweep = StackDistanceSweep(args.block_size, args.min_size, args.max_size, args.max_associativity)
+    sweep.run(AccessSequence(args.trace_file))
+
+    print(sweep)
+    if args.out_file:
+        write_csv(args.out_file, sweep)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import json
+import sys
+from cachesim import args_as_list
+from memcomponents.utilities import *
+from memcomponents.sweep import expand_grid, run_sweep
+from memcomponents.trace_format import trace_exists
+
+
+def args_as_grid(s):
+    # A single per level list is shorthand for a grid with one entry
+    v = args_as_list(s)
+    if v and not any(type(elem) is list for elem in v):
+        v = [v]
+    return v
+
+
+def args_as_choices(s):
+    return [choice for choice in s.split(',') if choice]
+
+
+def verify_args(args):
+    if not trace_exists(args.trace_file):
+        show_error_and_exit("The tracefile: " + str(args.trace_file) + " does not exist!")
+    for write_policy in args.write_policies:
+        if write_policy != "wb+wa" and write_policy != "wt+nwa":
+            show_error_and_exit("Write policies must be wb+wa or wt+nwa")
+    if any(misses < 0 for misses in args.max_misses):
+        show_error_and_exit("--max-misses must all be numbers greater than or equal to 0!")
+    if args.jobs is not None and args.jobs < 1:
+        show_error_and_exit("--jobs must be at least 1!")
+
+
+def write_rows(out_file, rows):
+    if out_file.endswith(".json"):
+        with open(out_file, 'w') as w_file:
+            json.dump(rows, w_file, indent=1)
+        return
+
+    # Heirarchies with fewer layers leave the deeper columns empty
+    fieldnames = []
+    for row in rows:
+        fieldnames.extend(key for key in row if key not in fieldnames)
+
+    w_file = open(out_file, 'w', newline='') if out_file else sys.stdout
+    writer = csv.DictWriter(w_file, fieldnames)
+    writer.writeheader()
+    writer.writerows(rows)
+    if out_file:
+        w_file.close()
+
+
+if __name__ == "__main__":
+    # Add our program arguments
+    parser = argparse.ArgumentParser(description='Parallel configuration sweep for COE1541 Project 2')
+    parser.add_argument('-t', '--tracefile', dest='trace_file', default='', type=str,
+                        help='The path to the tracefile for the memory accesses, or to a miss stream recorded '
+                             'by cachesim.py --record-miss-stream to only simulate the levels below its prefix')
+    parser.add_argument('-b', '--block-size', dest='block_sizes', action='store',
+                        default=[64], type=args_as_list,
+                        help='List of block sizes in bytes')
+    parser.add_argument('-s', '--cache-sizes', dest='cache_sizes', action='store',
+                        default=[[32000, 2000000]], type=args_as_grid,
+                        help='List of per level cache size lists in bytes, e.g. [[512,2048],[1024,4096]]')
+    parser.add_argument('-c', '--cache-cycles', dest='cache_cycles', action='store',
+                        default=[[1, 50]], type=args_as_grid,
+                        help='List of per level access latency lists')
+    parser.add_argument('-a', '--set-associativity', dest='set_associativity', action='store',
+                        default=[[4, 8]], type=args_as_grid,
+                        help='List of per level set associativity lists')
+    parser.add_argument('-p', '--write-policy', dest='write_policies', action='store',
+                        default=['wb+wa'], type=args_as_choices,
+                        help='Comma separated write/allocate policies. Options <wb+wa,wt+nwa>')
+    parser.add_argument('-m', '--max-misses', dest='max_misses', action='store',
+                        default=[0], type=args_as_list,
+                        help='List of maximum outstanding miss counts')
+    parser.add_argument('-j', '--jobs', dest='jobs', action='store',
+                        default=None, type=int,
+                        help='Number of worker processes, defaults to one per core')
+    parser.add_argument('-o', '--output', dest='out_file', default='', type=str,
+                        help='File for the results, JSON if it ends in .json and CSV otherwise. '
+                             'Defaults to CSV on stdout')
+    # Parse the arguments
+    args = parser.parse_args()
+
+    # Verify they are correct
+    verify_args(args)
+
+    configs = expand_grid(args.block_sizes, args.cache_sizes, args.cache_cycles, args.set_associativity,
+                          args.write_policies, args.max_misses)
+    if not configs:
+        show_error_and_exit("No configuration has matching --cache-sizes, --cache-cycles and "
+                            "--set-associativity lengths!")
+
+    try:
+        rows = run_sweep(args.trace_file, configs, args.jobs)
+    except ValueError as e:
+        show_error_and_exit(str(e) + "!")
+    write_rows(args.out_file, rows)
@@ -0,0 +1,70 @@
+import os
+import random
+import tempfile
+import unittest
+from memcomponents.access_sequence import AccessSequence
+from memcomponents.heirarchy import create_heirarchy
+
+# Fixtures shared by the test modules
+
+
+def write_trace(trace_file, count, seed=0, address_bits=14, max_gap=0, locality=False):
+    # count random accesses, 30% of them writes, to addresses below 1 << address_bits. Arrival
+    # times grow by up to max_gap per access, or are the access numbers with a max_gap of 0.
+    # With locality most accesses fall within 64 bytes of a base that now and then jumps
+    rand = random.Random(seed)
+    base = 0
+    time = 0
+    with open(trace_file, 'w') as w_file:
+        for num in range(count):
+            mode = 'w' if rand.random() < 0.3 else 'r'
+            if locality:
+                if rand.random() < 0.05:
+                    base = rand.randrange(0, (1 << address_bits) - 64)
+                address = base + rand.randrange(0, 64)
+            else:
+                address = rand.randrange(0, 1 << address_bits)
+            w_file.write(mode + " " + str(address) + " " + str(time if max_gap else num) + "\n")
+            if max_gap:
+                time += rand.randrange(0, max_gap + 1)
+
+
+def simulate(trace_file, heirarchy_args):
+    # The reference full run, returns the heirarchy and the finish time of the last access
+    heirarchy = create_heirarchy(**heirarchy_args)
+    total_cycles = 0
+    for mem_access in AccessSequence(trace_file):
+        heirarchy.access(mem_access)
+        total_cycles = max(total_cycles, mem_access.finish_time())
+    return heirarchy, total_cycles
+
+
+def basic_heirarchy_args(write_policy):
+    # Three small levels with 64 sets each, sized for traces/basic.trace
+    return dict(block_size=4, num_layers=3, sizes=[256, 512, 1024], cycles=[10, 20, 50],
+                associativity=[1, 2, 4], write_policy=write_policy, max_misses=2, cache_view=0)
+
+
+def full_counters(trace_file, heirarchy_args):
+    # (accesses, hits) of every level after a full run of the trace
+    heirarchy, total_cycles = simulate(trace_file, heirarchy_args)
+    return [(cache.num_accesses, cache.num_hits) for cache in heirarchy.cache_layers]
+
+
+class BasicTraceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.trace_file = os.path.join(os.getcwd(), "traces/basic.trace")
+
+
+class TempDirTest(unittest.TestCase):
+    # Every test gets a fresh directory for its traces and output files
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def tmp_path(self, name):
+        return os.path.join(self.tmp_dir.name, name)
@@ -0,0 +1,93 @@
+import os
+import gzip
+import lzma
+import shutil
+import tempfile
+import unittest
+from memcomponents.access_sequence import AccessSequence
+from memcomponents.trace_format import BinaryTrace, is_binary_trace, write_binary_trace, open_trace_stream
+
+
+class BinaryTraceTest(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.trace_file = tempfile.mkstemp(suffix='.btrace')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.trace_file)
+
+    def test_round_trip(self):
+        records = [('r', 2657855438, 0), ('W', (1 << 64) - 1, 1), ('w', 0, 2 ** 40)]
+        self.assertEqual(write_binary_trace(self.trace_file, records, chunk_len=2), 3)
+        self.assertTrue(is_binary_trace(self.trace_file))
+
+        accesses = [(a.mode, a.address, a.arrival_time) for a in AccessSequence(self.trace_file)]
+        self.assertEqual(accesses, [('r', 2657855438, 0), ('w', (1 << 64) - 1, 1), ('w', 0, 2 ** 40)])
+
+    def test_matches_text_trace(self):
+        text_file = os.path.join(os.getcwd(), "traces/basic.trace")
+        text_accesses = [(a.num, a.mode, a.address, a.arrival_time) for a in AccessSequence(text_file)]
+        write_binary_trace(self.trace_file, [(m, a, t) for _, m, a, t in text_accesses])
+
+        binary_sequence = AccessSequence(self.trace_file, retain=True)
+        binary_accesses = [(a.num, a.mode, a.address, a.arrival_time) for a in binary_sequence]
+        self.assertEqual(binary_accesses, text_accesses)
+        self.assertEqual(len(binary_sequence.mem_sequence), len(text_accesses))
+        self.assertFalse(is_binary_trace(text_file))
+
+    def test_empty_trace(self):
+        write_binary_trace(self.trace_file, [])
+        with BinaryTrace(self.trace_file) as trace:
+            self.assertEqual(len(trace), 0)
+        self.assertEqual(list(AccessSequence(self.trace_file)), [])
+
+    def test_truncated_trace(self):
+        write_binary_trace(self.trace_file, [('r', 1, 1), ('r', 2, 2)])
+        with open(self.trace_file, 'r+b') as t_file:
+            t_file.truncate(40)
+        self.assertRaises(ValueError, BinaryTrace, self.trace_file)
+
+
+class CompressedTraceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.text_file = os.path.join(os.getcwd(), "traces/basic.trace")
+        self.binary_file = os.path.join(self.tmp_dir.name, "basic.btrace")
+        self.accesses = [(a.num, a.mode, a.address, a.arrival_time) for a in AccessSequence(self.text_file)]
+        write_binary_trace(self.binary_file, [(m, a, t) for _, m, a, t in self.accesses])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def compress(self, trace_file, suffix):
+        out_file = os.path.join(self.tmp_dir.name, os.path.basename(trace_file) + suffix)
+        opener = gzip.open if suffix == '.gz' else lzma.open
+        with open(trace_file, 'rb') as r_file, opener(out_file, 'wb') as w_file:
+            shutil.copyfileobj(r_file, w_file)
+        return out_file
+
+    def test_compressed_traces(self):
+        for suffix in ['.gz', '.xz']:
+            for trace_file in [self.text_file, self.binary_file]:
+                compressed_file = self.compress(trace_file, suffix)
+                self.assertEqual(is_binary_trace(compressed_file), trace_file == self.binary_file)
+                accesses = [(a.num, a.mode, a.address, a.arrival_time) for a in AccessSequence(compressed_file)]
+                self.assertEqual(accesses, self.accesses)
+
+    def test_small_blocks(self):
+        # Blocks far smaller than a line still join up into the same stream
+        compressed_file = self.compress(self.text_file, '.gz')
+        with open_trace_stream(compressed_file, block_size=7) as t_file, open(self.text_file, 'rb') as r_file:
+            self.assertEqual(t_file.read(), r_file.read())
+
+    def test_early_close(self):
+        compressed_file = self.compress(self.text_file, '.xz')
+        sequence = iter(AccessSequence(compressed_file))
+        self.assertEqual(next(sequence).num, 0)
+        sequence.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from memcomponents.access_sequence import AccessSequence
+
+try:
+    import numpy
+    from memcomponents.trace_generator import TraceModel, generate_trace
+except ImportError:
+    numpy = None
+
+
+def read_accesses(trace_file):
+    return [(a.mode, a.address, a.arrival_time) for a in AccessSequence(trace_file)]
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TraceGeneratorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir.name, name)
+
+    def test_jobs_and_formats_agree(self):
+        model = TraceModel({"random": 1, "stride": 1, "zipf": 1, "phase": 1}, timing=1, seed=7, chunk_len=1000)
+        generate_trace(self.path("one.trace"), 4500, model)
+        generate_trace(self.path("two.trace"), 4500, model, jobs=2)
+        generate_trace(self.path("two.btrace"), 4500, model, "binary", jobs=2)
+        with open(self.path("one.trace")) as one_file, open(self.path("two.trace")) as two_file:
+            self.assertEqual(one_file.read(), two_file.read())
+
+        accesses = read_accesses(self.path("one.trace"))
+        self.assertEqual(accesses, read_accesses(self.path("two.btrace")))
+        self.assertEqual(len(accesses), 4500)
+        times = [time for mode, address, time in accesses]
+        self.assertEqual(times, sorted(times))
+
+    def test_seed(self):
+        first = TraceModel({"zipf": 1}, seed=1).chunk(0, 100)
+        self.assertTrue(numpy.array_equal(first[1], TraceModel({"zipf": 1}, seed=1).chunk(0, 100)[1]))
+        self.assertFalse(numpy.array_equal(first[1], TraceModel({"zipf": 1}, seed=2).chunk(0, 100)[1]))
+
+    def test_locality_models(self):
+        model = TraceModel({"stride": 1}, num_streams=1, stride=8, reuse_rate=0)
+        modes, addresses, times = model.chunk(0, 50)
+        self.assertEqual(set(numpy.diff(addresses).tolist()), {8})
+
+        model = TraceModel({"zipf": 1}, zipf_blocks=16)
+        modes, addresses, times = model.chunk(0, 500)
+        self.assertTrue(set(addresses.tolist()) <= set(model.hot_blocks.tolist()))
+
+        model = TraceModel({"phase": 1}, phase_length=100, phase_blocks=4, block_size=64, reuse_rate=0)
+        modes, addresses, times = model.chunk(0, 300)
+        for phase in range(3):
+            self.assertLessEqual(len(set(addresses[phase * 100:(phase + 1) * 100].tolist())), 4)
+
+    def test_reuse_window(self):
+        model = TraceModel({"random": 1}, reuse_rate=0.9, reuse_window=8, addr_size=64)
+        modes, addresses, times = model.chunk(0, 2000)
+        seen = {}
+        for position, address in enumerate(addresses.tolist()):
+            if address in seen:
+                self.assertLessEqual(position - seen[address], 8)
+            seen[address] = position
+
+
+if __name__ == '__main__':
+    unittest.main()
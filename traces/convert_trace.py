@@ -1,5 +1,10 @@
 import argparse
+import os
 import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from memcomponents.trace_format import write_binary_trace
 
 
 def convert_to_base(decimal_number, base, addr_size):
@@ -28,34 +33,44 @@ def coin_flip(prob=0.5):
     return random.randint(1, 100) <= prob * 100
 
 
-def convert_trace_file(out_file, convert_file, number_base):
-    wFile = open(out_file, 'w+')
+def read_trace_records(convert_file, number_base):
     rFile = open(convert_file, 'r')
 
     line_num = 1
-    for line in rFile.readlines():
+    for line in rFile:
         tokens = line.split()
+        if not tokens:
+            continue
+
         # Add a time if none available
         if len(tokens) < 3:
             tokens.append(str(line_num))
 
-        # Convert to int if neccessary
-        if number_base != 10:
-            tokens[1] = str(int(tokens[1], number_base))
+        # Convert to int and move to lower case
+        yield tokens[0].lower(), int(tokens[1], number_base), int(tokens[2])
 
-        # move to lower case
-        tokens[0] = tokens[0].lower()
+        line_num += 1
 
-        # Rejoin lines
-        new_line = ' '.join(tokens)
+    rFile.close()
 
-        wFile.write(new_line + "\n")
 
-        line_num += 1
+def convert_trace_file(out_file, convert_file, number_base, binary=False):
+    records = read_trace_records(convert_file, number_base)
 
-    rFile.close()
+    # Binary traces are loaded with mmap by cachesim.py
+    if binary:
+        return write_binary_trace(out_file, records)
+
+    wFile = open(out_file, 'w+')
+    num_accesses = 0
+    for mode, address, time in records:
+        # Rejoin lines
+        wFile.write(mode + " " + str(address) + " " + str(time) + "\n")
+        num_accesses += 1
     wFile.close()
 
+    return num_accesses
+
 
 if __name__ == "__main__":
     # Add our program arguments
@@ -67,11 +82,15 @@ if __name__ == "__main__":
 
     parser.add_argument('-b', '--base', dest='number_base', default=2, type=int,
                         help="Number base (e.g. decimal = 10, binary = 2, hex = 16)")
+    parser.add_argument('-F', '--format', dest='out_format', default='text', type=str,
+                        help="Output format for the tracefile. Options <text,binary>")
 
     # Parse the arguments
     args = parser.parse_args()
 
     # Verify they are correct
-    convert_trace_file(args.file_name, args.convert_file, args.number_base)
+    if args.out_format not in ['text', 'binary']:
+        parser.error("--format must be text or binary")
+    convert_trace_file(args.file_name, args.convert_file, args.number_base, args.out_format == 'binary')
 
     print("Done!")
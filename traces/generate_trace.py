@@ -1,66 +1,21 @@
 import argparse
-import random
+import os
+import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from memcomponents.trace_generator import LOCALITY_MODELS, TraceModel, generate_trace
 
-def convert_to_base(decimal_number, base, addr_size):
-    DIGITS = '0123456789abcdef'
-    remainder_stack = []
 
-    while decimal_number > 0:
-        remainder = decimal_number % base
-        remainder_stack.append(remainder)
-        decimal_number = decimal_number // base
-
-    new_digits = []
-    while remainder_stack:
-        new_digits.append(DIGITS[remainder_stack.pop()])
-
-    # Hack to make binary numbers addr_size bits
-    if base == 2:
-        while len(new_digits) < addr_size:
-            new_digits.insert(0, '0')
-
-    return ''.join(new_digits)
-
-
-def coin_flip(prob=0.5):
-    prob = min(1.0, max(0.0, prob))
-    return random.randint(1, 100) <= prob * 100
-
-
-def create_trace_file(filename, addr_size, num_accesses, reuse_rate, number_base,timing):
-    wFile = open(filename, 'w+')
-    maxAddr = 2 ** addr_size - 1
-    time = 0
-    used_addr = []
-    for i in range(num_accesses):
-        # Generate a new address
-        if i == 0 or not coin_flip(reuse_rate):
-            new_addr = random.randint(0, maxAddr)
-            used_addr.append(new_addr)
-        # Reuse address
-        else:
-            new_addr = used_addr[random.randint(0, len(used_addr) - 1)]
-
-        # Get the access mode
-        mode = 'w' if coin_flip() else 'r'
-
-        # Convert to appropriate number system
-        new_addr = convert_to_base(new_addr, number_base, addr_size)
-
-        # Write to the file
-        wFile.write(str(mode) + " " + str(new_addr) + " " + str(time) + "\n")
-
-        if timing == 0:
-            time_increment = 1
-        elif timing == 1:
-            time_increment = random.randint(1,5)
-        else:
-            time_increment = random.randint(0,4)
-        # Increment our time
-        time += time_increment
-
-    wFile.close()
+def args_as_mix(s):
+    # model:weight pairs, a model without a weight gets 1
+    mix = {}
+    for part in s.split(','):
+        model, _, weight = part.partition(':')
+        try:
+            mix[model] = float(weight) if weight else 1.0
+        except ValueError:
+            raise argparse.ArgumentTypeError("Argument \"%s\" is not a list of model:weight" % (s))
+    return mix
 
 
 if __name__ == "__main__":
@@ -72,15 +27,58 @@ if __name__ == "__main__":
     parser.add_argument('-a', '--num-accesses', dest='num_accesses', default=100, type=int,
                         help="How many accesses we want")
     parser.add_argument('-b', '--base', dest='number_base', default=10, type=int,
-                        help="Number base (e.g. decimal = 10, binary = 2, hex = 16)")
+                        help="Number base of text traces (e.g. decimal = 10, binary = 2, hex = 16)")
     parser.add_argument('-r', '--reuse-rate', dest='reuse_rate', default=0.3, type=float,
-                        help="How often we want to reuse an existing address, This will increase hit rate")
+                        help="How often we want to reuse a recent address, This will increase hit rate")
     parser.add_argument('-t', '--timing', dest='timing', default=0, type=int,
-                        help="Timing of each access(Sequential = 1, Random (No Collisions) = 2, Random (Collisions) = 3")
+                        help="Timing of each access(Sequential = 0, Random (No Collisions) = 1, "
+                             "Random (Collisions) = 2")
+    parser.add_argument('-F', '--format', dest='out_format', default='text', type=str,
+                        help="Output format for the tracefile. Options <text,binary>")
+    parser.add_argument('-m', '--mix', dest='mix', default={"random": 1.0}, type=args_as_mix,
+                        help="Locality models to draw addresses from as model:weight pairs, e.g. "
+                             "stride:2,zipf:1. Options <" + ",".join(LOCALITY_MODELS) + ">")
+    parser.add_argument('-w', '--reuse-window', dest='reuse_window', default=4096, type=int,
+                        help="How many of the latest accesses a reused address is picked from")
+    parser.add_argument('--write-rate', dest='write_rate', default=0.5, type=float,
+                        help="Fraction of accesses that are writes")
+    parser.add_argument('--block-size', dest='block_size', default=64, type=int,
+                        help="Block size the stride, zipf and phase models align their blocks to")
+    parser.add_argument('--streams', dest='num_streams', default=4, type=int,
+                        help="Number of strided streams")
+    parser.add_argument('--stride', dest='stride', default=64, type=int,
+                        help="Bytes between consecutive accesses of a strided stream")
+    parser.add_argument('--zipf-blocks', dest='zipf_blocks', default=4096, type=int,
+                        help="Number of blocks in the Zipfian hot set")
+    parser.add_argument('--zipf-alpha', dest='zipf_alpha', default=1.0, type=float,
+                        help="Zipf exponent, larger values concentrate accesses on fewer blocks")
+    parser.add_argument('--phase-length', dest='phase_length', default=100000, type=int,
+                        help="Accesses in each working set phase")
+    parser.add_argument('--phase-blocks', dest='phase_blocks', default=2048, type=int,
+                        help="Blocks in the working set of each phase")
+    parser.add_argument('--seed', dest='seed', default=0, type=int,
+                        help="Seed of the trace, the same seed and options always give the same trace")
+    parser.add_argument('-j', '--jobs', dest='jobs', default=1, type=int,
+                        help="Number of processes generating chunks of the trace")
     # Parse the arguments
     args = parser.parse_args()
 
     # Verify they are correct
-    create_trace_file(args.file_name, args.addr_size, args.num_accesses, args.reuse_rate, args.number_base,args.timing)
+    if args.out_format not in ['text', 'binary']:
+        parser.error("--format must be text or binary")
+    if args.number_base not in [2, 10, 16]:
+        parser.error("--base must be 2, 10 or 16")
+    if args.num_accesses < 0 or args.jobs < 1 or args.reuse_window < 1:
+        parser.error("--num-accesses must not be negative, --jobs and --reuse-window must be at least 1")
+    if min(args.block_size, args.num_streams, args.zipf_blocks, args.phase_length, args.phase_blocks) < 1:
+        parser.error("--block-size, --streams, --zipf-blocks, --phase-length and --phase-blocks must be at least 1")
+    try:
+        model = TraceModel(args.mix, args.addr_size, args.block_size, args.reuse_rate, args.reuse_window,
+                           args.write_rate, args.timing, args.num_streams, args.stride, args.zipf_blocks,
+                           args.zipf_alpha, args.phase_length, args.phase_blocks, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+
+    generate_trace(args.file_name, args.num_accesses, model, args.out_format, args.number_base, args.jobs)
 
     print("Done!")